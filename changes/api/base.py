@@ -5,12 +5,13 @@ from functools import wraps
 from urllib import quote
 import logging
 
-from flask import Response, request
+from flask import Response, current_app, request
 
 from flask.ext.sqlalchemy import get_debug_queries
 
 from flask.ext.restful import Resource
 
+from changes.api import response_cache
 from changes.api.serializer import serialize as serialize_func
 from changes.config import db
 from changes.config import statsreporter
@@ -91,6 +92,13 @@ class ParamError(APIError):
 
 
 class APIView(Resource):
+    # If set, successful GET responses are cached in redis for this many
+    # seconds (when API_RESPONSE_CACHE_ENABLED is on), and served with an
+    # ETag so clients can revalidate them.
+    cache_timeout = None
+
+    # Whether the response depends on who's signed in.
+    cache_vary_on_user = False
 
     def __init__(self, *args, **kwargs):
         super(APIView, self).__init__(*args, **kwargs)
@@ -102,7 +110,10 @@ class APIView(Resource):
         self.start_time = time()
 
         try:
-            response = super(APIView, self).dispatch_request(*args, **kwargs)
+            if self._should_cache_response():
+                response = self._dispatch_cached(*args, **kwargs)
+            else:
+                response = super(APIView, self).dispatch_request(*args, **kwargs)
         except Exception:
             db.session.rollback()
             raise
@@ -110,6 +121,50 @@ class APIView(Resource):
             db.session.commit()
         return response
 
+    def get_cache_scopes(self, **kwargs):
+        """
+        Returns the scopes (see changes.api.response_cache) whose invalidation
+        should drop a cached response for the given view arguments.
+        """
+        return ()
+
+    def _should_cache_response(self):
+        return (request.method == 'GET' and self.cache_timeout and
+                current_app.config['API_RESPONSE_CACHE_ENABLED'])
+
+    def _dispatch_cached(self, *args, **kwargs):
+        stats = statsreporter.stats()
+        class_name = self.__class__.__name__
+
+        cache_key = response_cache.get_cache_key(
+            class_name, self.get_cache_scopes(**kwargs), self.cache_vary_on_user)
+
+        cached = response_cache.get_response(cache_key)
+        if cached is not None:
+            stats.incr('api_response_cache_hit')
+            stats.incr('api_response_cache_hit_class_{}'.format(class_name))
+
+            data, status_code, headers, etag = cached
+            response = Response(data, mimetype='application/json',
+                                status=status_code, headers=headers)
+            response.headers['changes-api-class'] = class_name
+        else:
+            stats.incr('api_response_cache_miss')
+            stats.incr('api_response_cache_miss_class_{}'.format(class_name))
+
+            response = super(APIView, self).dispatch_request(*args, **kwargs)
+            if not isinstance(response, Response) or response.status_code != 200:
+                return response
+
+            data = response.get_data()
+            etag = response_cache.get_etag(data)
+            headers = [(k, v) for k, v in response.headers.items() if k == 'Link']
+            response_cache.set_response(cache_key, data, response.status_code,
+                                        headers, etag, self.cache_timeout)
+
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
     def paginate(self, queryset, max_per_page=100, **kwargs):
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 25) or 0)
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import joinedload
 
+from changes.api import response_cache
 from changes.api.base import APIView
 from changes.config import db
 from changes.constants import Result, Status
@@ -37,5 +38,8 @@ class BuildCancelAPIView(APIView):
         build.status = Status.finished
         build.result = Result.aborted
         db.session.add(build)
+        db.session.commit()
+
+        response_cache.invalidate_build(build)
 
         return self.respond(build)
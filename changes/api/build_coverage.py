@@ -1,6 +1,6 @@
 from changes.api.base import APIView
 
-from changes.lib.coverage import get_coverage_by_build_id, merged_coverage_data
+from changes.lib.coverage import get_merged_coverage_by_build
 
 from changes.models import Build
 
@@ -11,6 +11,6 @@ class BuildTestCoverageAPIView(APIView):
         if build is None:
             return '', 404
 
-        coverage = merged_coverage_data(get_coverage_by_build_id(build.id))
+        coverage = get_merged_coverage_by_build(build)
 
         return self.respond(coverage)
@@ -1,9 +1,11 @@
 from flask.ext.restful import reqparse
 
 from changes.api.base import APIView
-from changes.lib.coverage import get_coverage_by_build_id, merged_coverage_data, get_coverage_stats
+from changes.lib.coverage import (
+    get_coverage_by_build_id, get_coverage_stats, get_merged_coverage_by_build
+)
+from changes.lib.source_diff import get_lines_by_file
 from changes.models import Build
-from changes.utils.diff_parser import DiffParser
 
 
 class BuildTestCoverageStatsAPIView(APIView):
@@ -17,19 +19,12 @@ class BuildTestCoverageStatsAPIView(APIView):
 
         args = self.parser.parse_args()
 
-        results = get_coverage_by_build_id(build.id)
-
         if args.diff:
-            diff = build.source.generate_diff()
-            if not diff:
+            lines_by_file = get_lines_by_file(build.source)
+            if not lines_by_file:
                 return self.respond({})
 
-            diff_parser = DiffParser(diff)
-            lines_by_file = diff_parser.get_lines_by_file()
-
-            results = [r for r in results if r.filename in lines_by_file]
-
-            coverage_data = merged_coverage_data(results)
+            coverage_data = get_merged_coverage_by_build(build)
 
             coverage_stats = {}
             for filename in lines_by_file:
@@ -49,6 +44,7 @@ class BuildTestCoverageStatsAPIView(APIView):
             # For each file, we return the best metrics using
             # min()/max(); if you want more correct metrics, pass
             # diff=1.
+            results = get_coverage_by_build_id(build.id)
             coverage_stats = {}
             for r in results:
                 if r.filename not in coverage_stats:
@@ -6,10 +6,12 @@ from itertools import groupby
 from sqlalchemy.orm import contains_eager, joinedload, subqueryload_all
 from uuid import UUID
 
+from changes.api import response_cache
 from changes.api.base import APIView
 from changes.api.serializer.models.testcase import TestCaseWithOriginCrumbler
 from changes.config import db
 from changes.constants import Result, Status
+from changes.lib.test_changes import find_previous_build, get_test_changes
 from changes.models import (
     Build, BuildPriority, Source, Event, FailureReason, Job, JobStep, TestCase,
     BuildSeen, User
@@ -18,90 +20,37 @@ from changes.utils.originfinder import find_failure_origins
 
 
 def find_changed_tests(current_build, previous_build, limit=25):
-    current_job_ids = [j.id.hex for j in current_build.jobs]
-    previous_job_ids = [j.id.hex for j in previous_build.jobs]
-
-    if not (current_job_ids and previous_job_ids):
+    test_changes = get_test_changes(current_build, previous_build)
+    if test_changes is None:
         return []
 
-    current_job_clause = ', '.join(
-        ':c_job_id_%s' % i for i in range(len(current_job_ids))
-    )
-    previous_job_clause = ', '.join(
-        ':p_job_id_%s' % i for i in range(len(previous_job_ids))
-    )
-
-    params = {}
-    for idx, job_id in enumerate(current_job_ids):
-        params['c_job_id_%s' % idx] = job_id
-    for idx, job_id in enumerate(previous_job_ids):
-        params['p_job_id_%s' % idx] = job_id
-
-    # find all tests that have appeared in one job but not the other
-    # we have to build this query up manually as sqlalchemy doesnt support
-    # the FULL OUTER JOIN clause
-    query = """
-        SELECT c.id AS c_id,
-               p.id AS p_id
-        FROM (
-            SELECT label_sha, id
-            FROM test
-            WHERE job_id IN (%(current_job_clause)s)
-        ) as c
-        FULL OUTER JOIN (
-            SELECT label_sha, id
-            FROM test
-            WHERE job_id IN (%(previous_job_clause)s)
-        ) as p
-        ON c.label_sha = p.label_sha
-        WHERE (c.id IS NULL OR p.id IS NULL)
-    """ % {
-        'current_job_clause': current_job_clause,
-        'previous_job_clause': previous_job_clause
-    }
-
-    total = db.session.query(
-        'count'
-    ).from_statement(
-        'SELECT COUNT(*) FROM (%s) as a' % (query,)
-    ).params(**params).scalar()
-
-    if not total:
+    if not test_changes.total:
         return {
             'total': 0,
             'changes': [],
         }
 
-    results = db.session.query(
-        'c_id', 'p_id'
-    ).from_statement(
-        '%s LIMIT %d' % (query, limit)
-    ).params(**params)
-
-    all_test_ids = set()
-    for c_id, p_id in results:
-        if c_id:
-            all_test_ids.add(c_id)
-        else:
-            all_test_ids.add(p_id)
+    changes = [
+        (sign, UUID(test_id))
+        for sign, test_id in test_changes.changes['tests'][:limit]
+    ]
 
     test_map = dict(
         (t.id, t) for t in TestCase.query.filter(
-            TestCase.id.in_(all_test_ids),
+            TestCase.id.in_([test_id for _, test_id in changes]),
         ).options(
             joinedload('job', innerjoin=True),
         )
     )
 
-    diff = []
-    for c_id, p_id in results:
-        if p_id:
-            diff.append(('-', test_map[UUID(p_id)]))
-        else:
-            diff.append(('+', test_map[UUID(c_id)]))
+    diff = [
+        (sign, test_map[test_id])
+        for sign, test_id in changes
+        if test_id in test_map
+    ]
 
     return {
-        'total': total,
+        'total': test_changes.total,
         'changes': sorted(diff, key=lambda x: (x[1].package, x[1].name)),
     }
 
@@ -162,9 +111,14 @@ def get_parents_last_builds(build):
 
 
 class BuildDetailsAPIView(APIView):
+    cache_timeout = 15
+
     post_parser = RequestParser()
     post_parser.add_argument('priority', choices=BuildPriority._member_names_)
 
+    def get_cache_scopes(self, build_id):
+        return ('build:{0}'.format(build_id.hex),)
+
     def get(self, build_id):
         build = Build.query.options(
             joinedload('project', innerjoin=True),
@@ -175,21 +129,7 @@ class BuildDetailsAPIView(APIView):
         if build is None:
             return '', 404
 
-        try:
-            most_recent_run = Build.query.filter(
-                Build.project == build.project,
-                Build.date_created < build.date_created,
-                Build.status == Status.finished,
-                Build.id != build.id,
-                Source.patch_id == None,  # NOQA
-            ).join(
-                Source, Build.source_id == Source.id,
-            ).options(
-                contains_eager('source').joinedload('revision'),
-                joinedload('author'),
-            ).order_by(Build.date_created.desc())[0]
-        except IndexError:
-            most_recent_run = None
+        most_recent_run = find_previous_build(build)
 
         jobs = list(Job.query.filter(
             Job.build_id == build.id,
@@ -264,6 +204,9 @@ class BuildDetailsAPIView(APIView):
             build.priority = BuildPriority[args.priority]
 
         db.session.add(build)
+        db.session.commit()
+
+        response_cache.invalidate_build(build)
 
         context = self.serialize(build)
 
@@ -9,6 +9,7 @@ from flask.ext.restful import reqparse
 from sqlalchemy.orm import joinedload, subqueryload_all
 from werkzeug.datastructures import FileStorage
 
+from changes.api import response_cache
 from changes.api.base import APIView, error
 from changes.api.validators.author import AuthorValidator
 from changes.config import db, statsreporter
@@ -16,13 +17,13 @@ from changes.constants import Result, Status, ProjectStatus
 from changes.db.utils import get_or_create
 from changes.jobs.create_job import create_job
 from changes.jobs.sync_build import sync_build
+from changes.lib.source_diff import get_patch_changed_files
 from changes.utils.phabricator_utils import post_comment
 from changes.models import (
     Project, ProjectOptionsHelper, Build, Job, JobPlan, Repository,
     RepositoryStatus, Patch, ItemOption, Snapshot, SnapshotImage, SnapshotStatus,
     Source, PlanStatus, Revision, ProjectConfigError
 )
-from changes.utils.diff_parser import DiffParser
 from changes.utils.project_trigger import files_changed_should_trigger_project
 from changes.vcs.base import (
     CommandError, ConcurrentUpdateError, InvalidDiffError, UnknownRevision
@@ -237,6 +238,8 @@ def execute_build(build, snapshot_id, no_snapshot):
         task_id=build.id.hex,
     )
 
+    response_cache.invalidate_build(build)
+
     return build
 
 
@@ -591,6 +594,7 @@ class BuildIndexAPIView(APIView):
 
         if patch_file:
             patch = Patch(
+                id=uuid.uuid4(),
                 repository=repository,
                 parent_revision_sha=sha,
                 diff=patch_file.getvalue(),
@@ -618,8 +622,7 @@ class BuildIndexAPIView(APIView):
 
         if apply_project_files_trigger:
             if patch:
-                diff_parser = DiffParser(patch.diff)
-                files_changed = diff_parser.get_changed_files()
+                files_changed = get_patch_changed_files(patch.id, patch.diff)
             elif revision:
                 try:
                     files_changed = _get_revision_changed_files(repository, revision)
@@ -138,7 +138,8 @@ class CommandDetailsAPIView(APIView):
 
         results = []
         for future_jobstep in expander.expand(max_executors=jobstep.data['max_executors'],
-                                              test_stats_from=buildstep.get_test_stats_from()):
+                                              test_stats_from=buildstep.get_test_stats_from(),
+                                              sharding=buildstep.get_sharding_config()):
             new_jobstep = buildstep.create_expanded_jobstep(jobstep, new_jobphase, future_jobstep)
             results.append(new_jobstep)
 
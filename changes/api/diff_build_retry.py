@@ -6,11 +6,11 @@ from sqlalchemy.orm import joinedload, subqueryload_all
 from changes.api.base import APIView, error
 from changes.api.build_index import create_build, get_build_plans
 from changes.constants import Cause, Result, Status
+from changes.lib.source_diff import get_changed_files
 from changes.models import (
     Build, PhabricatorDiff, Project, ProjectConfigError, ProjectStatus,
     ProjectOptionsHelper
 )
-from changes.utils.diff_parser import DiffParser
 from changes.utils.project_trigger import files_changed_should_trigger_project
 from changes.vcs.base import InvalidDiffError
 
@@ -24,8 +24,7 @@ class DiffBuildRetryAPIView(APIView):
         diff = self._get_diff_by_id(diff_id)
         if not diff:
             return error("Diff with ID %s does not exist." % (diff_id,))
-        diff_parser = DiffParser(diff.source.patch.diff)
-        files_changed = diff_parser.get_changed_files()
+        files_changed = get_changed_files(diff.source)
         try:
             projects = self._get_projects_for_diff(diff, files_changed)
         except InvalidDiffError:
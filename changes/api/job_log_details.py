@@ -3,6 +3,7 @@ from __future__ import absolute_import, division, unicode_literals
 from flask import Response, request
 
 from changes.api.base import APIView
+from changes.lib.log_chunks import get_archived_chunks
 from changes.models import LogSource, LogChunk
 
 
@@ -31,18 +32,33 @@ class JobLogDetailsAPIView(APIView):
             LogChunk.source_id == source.id,
         ).order_by(LogChunk.offset.desc())
 
+        archive = source.archive
+
         if offset == -1:
             # starting from the end so we need to know total size
             tail = queryset.limit(1).first()
 
-            if tail is None:
+            if tail is not None:
+                size = tail.offset + tail.size
+            elif archive is not None:
+                size = archive.size
+            else:
+                size = None
+
+            if size is None:
                 logchunks = []
             else:
+                start = max(size - limit, 0) if limit else 0
                 if limit:
                     queryset = queryset.filter(
-                        (LogChunk.offset + LogChunk.size) >= max(tail.offset + tail.size - limit, 0),
+                        (LogChunk.offset + LogChunk.size) >= start,
                     )
                 logchunks = list(queryset)
+                if archive is not None:
+                    logchunks.extend(
+                        c for c in get_archived_chunks(archive, start)
+                        if c.offset + c.size >= start
+                    )
         else:
             queryset = queryset.filter(
                 LogChunk.offset > offset,
@@ -52,8 +68,14 @@ class JobLogDetailsAPIView(APIView):
                     LogChunk.offset <= offset + limit,
                 )
             logchunks = list(queryset)
+            if archive is not None:
+                end = offset + limit + 1 if limit else None
+                logchunks.extend(
+                    c for c in get_archived_chunks(archive, offset + 1, end)
+                    if c.offset > offset and (not limit or c.offset <= offset + limit)
+                )
 
-        logchunks.sort(key=lambda x: x.date_created)
+        logchunks.sort(key=lambda x: (x.date_created, x.offset))
 
         if logchunks:
             next_offset = logchunks[-1].offset + logchunks[-1].size + 1
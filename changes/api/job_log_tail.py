@@ -0,0 +1,135 @@
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+import time
+
+from flask import Response, current_app, stream_with_context
+from flask.ext.restful import reqparse
+
+from changes.api.base import APIView
+from changes.config import db, redis
+from changes.constants import Status
+from changes.lib.log_chunks import get_archived_chunks, get_tail_channel
+from changes.models import Job, LogArchive, LogSource, LogChunk
+
+
+# the most chunks we'll read from the database between waits
+TAIL_BATCH_SIZE = 100
+
+
+class JobLogTailAPIView(APIView):
+    get_parser = reqparse.RequestParser()
+    get_parser.add_argument('offset', type=int, location='args', default=0)
+    get_parser.add_argument('Last-Event-ID', type=int, location='headers',
+                            dest='last_event_id')
+    get_parser.add_argument('timeout', type=int, location='args')
+
+    def get(self, job_id, source_id):
+        """
+        Stream the text of a LogSource as server-sent events, starting at
+        ``offset`` (or the ``Last-Event-ID`` header, when reconnecting) and
+        following new chunks as they're appended.
+
+        Each ``message`` event carries a contiguous run of text as JSON
+        (``offset``, ``size`` and ``text``), and its id is the offset to
+        resume from. An ``end`` event is sent once the job has finished and
+        all of its text has been sent; otherwise the stream is closed after
+        ``timeout`` seconds and the client should reconnect.
+        """
+        source = LogSource.query.get(source_id)
+        if source is None or source.job_id != job_id:
+            return '', 404
+
+        args = self.get_parser.parse_args()
+        if args.last_event_id is not None:
+            offset = args.last_event_id
+        else:
+            offset = args.offset
+        timeout = current_app.config['LOG_TAIL_TIMEOUT']
+        if args.timeout is not None:
+            timeout = min(args.timeout, timeout)
+
+        stream = stream_with_context(self._stream(source, offset, timeout))
+        return Response(stream, mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            # stop nginx from buffering the stream
+            'X-Accel-Buffering': 'no',
+        })
+
+    def _stream(self, source, offset, timeout):
+        poll_interval = current_app.config['LOG_TAIL_POLL_INTERVAL']
+        deadline = time.time() + timeout
+
+        # Subscribe before the first read so nothing appended in between is
+        # missed.
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(get_tail_channel(source.id))
+        try:
+            while True:
+                # Check the status first: anything appended before the job
+                # finished is then guaranteed to be visible to the reads below.
+                status = db.session.query(Job.status).filter(
+                    Job.id == source.job_id,
+                ).scalar()
+                runs = self._get_text_after(source.id, offset)
+                # don't sit in a transaction while waiting on redis
+                db.session.commit()
+
+                for run_offset, text in runs:
+                    offset = run_offset + len(text)
+                    yield 'id: {0}\ndata: {1}\n\n'.format(offset, json.dumps({
+                        'offset': run_offset,
+                        'size': len(text),
+                        'text': text,
+                    }))
+
+                if runs:
+                    continue
+
+                if status == Status.finished:
+                    yield 'event: end\ndata: {}\n\n'
+                    return
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return
+
+                message = pubsub.get_message(timeout=min(poll_interval, remaining))
+                if message is None:
+                    yield ': keepalive\n\n'
+                # a single read will pick up everything we've been told about
+                while message is not None:
+                    message = pubsub.get_message()
+        finally:
+            pubsub.close()
+
+    def _get_text_after(self, source_id, offset):
+        """
+        Returns a list of (offset, text) for each contiguous run of text
+        following ``offset``.
+        """
+        chunks = list(LogChunk.query.filter(
+            LogChunk.source_id == source_id,
+            (LogChunk.offset + LogChunk.size) > offset,
+        ).order_by(LogChunk.offset.asc()).limit(TAIL_BATCH_SIZE))
+
+        # Chunks are only deleted once they've been compacted, so check for
+        # an archive after reading them.
+        if not chunks:
+            archive = LogArchive.query.get(source_id)
+            if archive is not None:
+                chunks = [
+                    c for c in get_archived_chunks(archive, offset)
+                    if c.offset + c.size > offset
+                ]
+
+        runs = []
+        for chunk in chunks:
+            # archived chunks needn't line up with the offsets we handed out
+            text = chunk.text[max(offset - chunk.offset, 0):]
+            start = max(chunk.offset, offset)
+            if runs and runs[-1][0] + len(runs[-1][1]) == start:
+                runs[-1][1] += text
+            else:
+                runs.append([start, text])
+        return [tuple(r) for r in runs]
@@ -3,89 +3,150 @@ from __future__ import absolute_import, division, unicode_literals
 import json
 import logging
 
+from contextlib import contextmanager
 from datetime import datetime
 
 from flask import request
-from sqlalchemy.sql import func
+from sqlalchemy.sql import text
 
 from changes.api.base import APIView, error
 from changes.constants import Status, Result
 from changes.config import db, redis, statsreporter
 from changes.ext.redis import UnableToGetLock
-from changes.models import Build, Job, JobPlan, JobStep
+from changes.models import JobPlan, JobStep
+
+
+# TODO(dcramer): this should be configurable and handle more cases than just
+# 'active job' as that can be 1 step or 100 steps
+MAX_ACTIVE_JOBS_PER_PROJECT = 10
+
+# How many more candidates than we can allocate to consider when packing
+# steps into the offered resources.
+CANDIDATE_MULTIPLIER = 5
+
+# Ranks pending steps in a single pass, in order of preference:
+#
+# - steps of jobs which have already started, then steps of any job in a
+#   project with fewer than MAX_ACTIVE_JOBS_PER_PROJECT active jobs, then
+#   (so we can burst) steps of every other project
+# - higher priority builds first
+# - round-robin between projects, so one project with lots of pending steps
+#   can't starve the rest
+# - oldest first
+#
+# Row locks can't be taken alongside window functions, so the ranking is
+# done in a subquery and only the outer jobstep rows are locked.
+NEXT_JOBSTEPS_SQL = """
+SELECT jobstep.*
+FROM jobstep
+JOIN (
+    SELECT jobstep.id,
+           CASE WHEN coalesce(active.num_jobs, 0) >= :max_active_jobs THEN 2
+                WHEN job.status IN (:allocated, :in_progress) THEN 0
+                ELSE 1
+           END AS tier,
+           build.priority,
+           row_number() OVER (
+               PARTITION BY jobstep.project_id
+               ORDER BY build.priority DESC, jobstep.date_created ASC
+           ) AS project_rank
+    FROM jobstep
+    JOIN job ON job.id = jobstep.job_id
+    JOIN build ON build.id = job.build_id
+    LEFT JOIN (
+        SELECT project_id, count(*) AS num_jobs
+        FROM job
+        WHERE status IN (:allocated, :in_progress)
+        GROUP BY project_id
+    ) active ON active.project_id = jobstep.project_id
+    WHERE jobstep.status = :pending_allocation
+) ranked ON ranked.id = jobstep.id
+WHERE jobstep.status = :pending_allocation
+ORDER BY ranked.tier, ranked.priority DESC, ranked.project_rank,
+         jobstep.date_created
+LIMIT :limit
+FOR UPDATE OF jobstep {skip_locked}
+"""
+
+
+def supports_skip_locked():
+    """
+    Whether the database can skip rows that other transactions have locked
+    (Postgres 9.5+), letting allocations run concurrently.
+    """
+    dialect = db.session.connection().dialect
+    return dialect.server_version_info >= (9, 5)
+
+
+def get_requested_resources(jobstep):
+    return jobstep.data.get('cpus', 4), jobstep.data.get('mem', 8 * 1024)
 
 
 class JobStepAllocateAPIView(APIView):
-    def find_next_jobsteps(self, limit=10):
-        # find projects with pending allocations
-        project_list = [p for p, in db.session.query(
-            JobStep.project_id,
-        ).filter(
-            JobStep.status == Status.pending_allocation,
-        ).group_by(
-            JobStep.project_id
-        )]
-        if not project_list:
-            return []
-
-        # TODO(dcramer): this should be configurably and handle more cases
-        # than just 'active job' as that can be 1 step or 100 steps
-        # find the total number of job steps in progress per project
-        # hard limit of 10 active jobs per project
-        unavail_projects = [
-            p for p, c in
-            db.session.query(
-                Job.project_id, func.count(Job.project_id),
-            ).filter(
-                Job.status.in_([Status.allocated, Status.in_progress]),
-                Job.project_id.in_(project_list),
-            ).group_by(
-                Job.project_id,
-            )
-            if c >= 10
-        ]
-
-        filters = [
-            JobStep.status == Status.pending_allocation,
-        ]
-        if unavail_projects:
-            filters.append(~JobStep.project_id.in_(unavail_projects))
-
-        base_queryset = JobStep.query.join(
-            Job, JobStep.job_id == Job.id,
-        ).join(
-            Build, Job.build_id == Build.id,
-        ).order_by(Build.priority.desc(), JobStep.date_created.asc())
-
-        # prioritize a job that's has already started
-        queryset = list(base_queryset.filter(
-            Job.status.in_([Status.allocated, Status.in_progress]),
-            *filters
-        )[:limit])
-        if len(queryset) == limit:
-            return queryset
-
-        results = queryset
-
-        # now allow any prioritized project, based on order
-        queryset = base_queryset.filter(
-            *filters
-        )
-        if results:
-            queryset = queryset.filter(~JobStep.id.in_(q.id for q in results))
-        results.extend(queryset[:limit - len(results)])
-        if len(results) >= limit:
-            return results[:limit]
-
-        # TODO(dcramer): we want to burst but not go too far. For now just
-        # let burst
-        queryset = base_queryset.filter(
-            JobStep.status == Status.pending_allocation,
-        )
-        if results:
-            queryset = queryset.filter(~JobStep.id.in_(q.id for q in results))
-        results.extend(queryset[:limit - len(results)])
-        return results[:limit]
+    def find_next_jobsteps(self, limit=10, skip_locked=False):
+        """
+        Returns up to ``limit`` pending job steps, best candidates first,
+        locking them until the end of the transaction.
+
+        If ``skip_locked`` is set, steps another allocation has locked are
+        passed over rather than waited on.
+        """
+        sql = NEXT_JOBSTEPS_SQL.format(
+            skip_locked='SKIP LOCKED' if skip_locked else '')
+        return list(JobStep.query.from_statement(text(sql)).params(
+            max_active_jobs=MAX_ACTIVE_JOBS_PER_PROJECT,
+            allocated=Status.allocated.value,
+            in_progress=Status.in_progress.value,
+            pending_allocation=Status.pending_allocation.value,
+            limit=limit,
+        ))
+
+    def allocate_jobsteps(self, total_cpus, total_mem, limit=10, skip_locked=False):
+        """
+        Marks as allocated up to ``limit`` of the best pending job steps that
+        fit in the given resources.
+
+        Candidates are packed first-fit in order of preference, so if the
+        best step is too big for what's left, smaller ones further down the
+        list can still fill the gap.
+        """
+        candidates = self.find_next_jobsteps(
+            limit=limit * CANDIDATE_MULTIPLIER, skip_locked=skip_locked)
+
+        to_allocate = []
+        for jobstep in candidates:
+            if len(to_allocate) >= limit:
+                break
+
+            req_cpus, req_mem = get_requested_resources(jobstep)
+
+            if total_cpus >= req_cpus and total_mem >= req_mem:
+                total_cpus -= req_cpus
+                total_mem -= req_mem
+
+                jobstep.status = Status.allocated
+                db.session.add(jobstep)
+
+                to_allocate.append(jobstep)
+                # The JobSteps returned are pending_allocation, and the initial state for a Mesos JobStep is
+                # pending_allocation, so we can determine how long it was pending by how long ago it was
+                # created.
+                pending_seconds = (datetime.utcnow() - jobstep.date_created).total_seconds()
+                statsreporter.stats().log_timing('duration_pending_allocation', pending_seconds * 1000)
+            else:
+                logging.info('Not allocating %s due to lack of offered resources', jobstep.id.hex)
+
+        return to_allocate
+
+    @contextmanager
+    def allocation_lock(self, skip_locked):
+        # Without SKIP LOCKED concurrent allocations would just queue up
+        # behind each other's row locks, so we serialize them up front.
+        if skip_locked:
+            yield
+        else:
+            with redis.lock('jobstep:allocate', nowait=True):
+                yield
 
     def post(self):
         args = json.loads(request.data)
@@ -100,30 +161,13 @@ class JobStepAllocateAPIView(APIView):
         total_cpus = int(resources.get('cpus', 0))
         total_mem = int(resources.get('mem', 0))  # MB
 
+        skip_locked = supports_skip_locked()
+
         with statsreporter.stats().timer('jobstep_allocate'):
             try:
-                with redis.lock('jobstep:allocate', nowait=True):
-                    available_allocations = self.find_next_jobsteps(limit=10)
-                    to_allocate = []
-                    for jobstep in available_allocations:
-                        req_cpus = jobstep.data.get('cpus', 4)
-                        req_mem = jobstep.data.get('mem', 8 * 1024)
-
-                        if total_cpus >= req_cpus and total_mem >= req_mem:
-                            total_cpus -= req_cpus
-                            total_mem -= req_mem
-
-                            jobstep.status = Status.allocated
-                            db.session.add(jobstep)
-
-                            to_allocate.append(jobstep)
-                            # The JobSteps returned are pending_allocation, and the initial state for a Mesos JobStep is
-                            # pending_allocation, so we can determine how long it was pending by how long ago it was
-                            # created.
-                            pending_seconds = (datetime.utcnow() - jobstep.date_created).total_seconds()
-                            statsreporter.stats().log_timing('duration_pending_allocation', pending_seconds * 1000)
-                        else:
-                            logging.info('Not allocating %s due to lack of offered resources', jobstep.id.hex)
+                with self.allocation_lock(skip_locked):
+                    to_allocate = self.allocate_jobsteps(
+                        total_cpus, total_mem, limit=10, skip_locked=skip_locked)
 
                     if not to_allocate:
                         # Should 204, but flask/werkzeug throws StopIteration (bug!) for tests
@@ -142,9 +186,10 @@ class JobStepAllocateAPIView(APIView):
                     assert jobplan and buildstep
 
                     jobstep_data['project'] = self.serialize(jobstep.project)
+                    cpus, mem = get_requested_resources(jobstep)
                     jobstep_data['resources'] = {
-                        'cpus': jobstep.data.get('cpus', 4),
-                        'mem': jobstep.data.get('mem', 8 * 1024),
+                        'cpus': cpus,
+                        'mem': mem,
                     }
                     jobstep_data['cmd'] = buildstep.get_allocation_command(jobstep)
                 except Exception:
@@ -13,6 +13,7 @@ from changes.config import db
 from changes.constants import Result, Status
 from changes.db.utils import get_or_create
 from changes.jobs.sync_job import sync_job
+from changes.lib.heartbeats import record_heartbeat
 from changes.models import (
     Command, FailureReason, JobPhase, JobPlan, JobStep, Node, SnapshotImage,
 )
@@ -121,6 +122,9 @@ class JobStepDetailsAPIView(APIView):
             elif jobstep.status == Status.queued and jobstep.date_started:
                 jobstep.date_started = None
 
+        if args.heartbeat:
+            record_heartbeat(jobstep, current_datetime)
+
         if args.node:
             node, _ = get_or_create(Node, where={
                 'label': args.node,
@@ -7,6 +7,7 @@ from changes.api.base import APIView
 from changes.api.validators.datetime import ISODatetime
 from changes.config import db
 from changes.constants import Result
+from changes.lib.heartbeats import is_write_behind, record_heartbeat
 from changes.models import JobStep
 
 
@@ -28,8 +29,9 @@ class JobStepHeartbeatAPIView(APIView):
 
         current_datetime = args.date or datetime.utcnow()
 
-        jobstep.last_heartbeat = current_datetime
-        db.session.add(jobstep)
-        db.session.commit()
+        record_heartbeat(jobstep, current_datetime)
+        if not is_write_behind():
+            db.session.add(jobstep)
+            db.session.commit()
 
         return self.serialize(jobstep), 200
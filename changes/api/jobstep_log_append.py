@@ -4,7 +4,8 @@ from flask_restful.reqparse import RequestParser
 
 from changes.api.base import APIView
 from changes.config import db
-from changes.db.utils import create_or_update, get_or_create
+from changes.db.utils import get_or_create
+from changes.lib.log_chunks import append_chunks, notify_append
 from changes.models import JobStep, LogSource, LogChunk, LOG_CHUNK_SIZE
 from changes.utils.text import chunked
 
@@ -41,16 +42,24 @@ class JobStepLogAppendAPIView(APIView):
             'job_id': step.job_id,
         })
 
+        # once a log has been compacted its chunks are gone, but the text
+        # they held is still taken
+        archive = logsource.archive
+        archived_size = archive.size if archive is not None else 0
+
         offset = args.offset
         if offset is not None:
             # ensure we haven't already recorded an offset that could be
             # in this range
-            existing_chunk = LogChunk.query.filter(
-                LogChunk.source_id == logsource.id,
-                offset >= LogChunk.offset,
-                offset <= LogChunk.offset + LogChunk.size - 1,
-            ).first()
-            if existing_chunk is not None:
+            if offset < archived_size:
+                already_recorded = True
+            else:
+                already_recorded = LogChunk.query.filter(
+                    LogChunk.source_id == logsource.id,
+                    offset >= LogChunk.offset,
+                    offset <= LogChunk.offset + LogChunk.size - 1,
+                ).first() is not None
+            if already_recorded:
                 # XXX(dcramer); this is more of an error but we make an assumption
                 # that this happens because it was already sent
                 existing_msg = {"error": "A chunk within the bounds of the given offset is already recorded."}
@@ -63,29 +72,15 @@ class JobStepLogAppendAPIView(APIView):
             ).order_by(
                 LogChunk.offset.desc(),
             ).limit(1).scalar() or 0
+            offset = max(offset, archived_size)
 
-        logchunks = []
-        for chunk in chunked(args.text, LOG_CHUNK_SIZE):
-            chunk_size = len(chunk)
-            chunk, _ = create_or_update(LogChunk, where={
-                'source': logsource,
-                'offset': offset,
-            }, values={
-                'job': step.job,
-                'project': step.project,
-                'size': chunk_size,
-                'text': chunk,
-            })
-            offset += chunk_size
-            logchunks.append(chunk)
+        logchunks = append_chunks(logsource, offset, chunked(args.text, LOG_CHUNK_SIZE))
+        if logchunks:
+            notify_append(logsource, logchunks[-1]['offset'] + logchunks[-1]['size'])
 
         context = self.serialize({
             'source': logsource,
-            'chunks': [{
-                'id': c.id,
-                'offset': c.offset,
-                'size': c.size,
-            } for c in logchunks]
+            'chunks': logchunks,
         })
 
         return self.respond(context, serialize=False)
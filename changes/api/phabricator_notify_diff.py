@@ -6,7 +6,6 @@ import uuid
 from flask_restful.reqparse import RequestParser
 
 from sqlalchemy.orm import subqueryload_all
-from changes.utils.diff_parser import DiffParser
 from werkzeug.datastructures import FileStorage
 from changes.api.base import APIView, error
 from changes.api.build_index import (
@@ -15,6 +14,7 @@ from changes.api.build_index import (
 from changes.api.validators.author import AuthorValidator
 from changes.config import db, statsreporter
 from changes.db.utils import try_create
+from changes.lib.source_diff import get_patch_changed_files
 from changes.models import (
     ItemOption, Patch, PhabricatorDiff, Project, ProjectOption, ProjectOptionsHelper, ProjectStatus,
     Repository, RepositoryStatus, Source, ProjectConfigError,
@@ -138,6 +138,7 @@ class PhabricatorNotifyDiffAPIView(APIView):
         }
 
         patch = Patch(
+            id=uuid.uuid4(),
             repository=repository,
             parent_revision_sha=sha,
             diff=''.join(line.decode('utf-8') for line in args.patch_file),
@@ -164,8 +165,7 @@ class PhabricatorNotifyDiffAPIView(APIView):
             return error("Diff already exists within Changes")
 
         project_options = ProjectOptionsHelper.get_options(projects, ['build.file-whitelist'])
-        diff_parser = DiffParser(patch.diff)
-        files_changed = diff_parser.get_changed_files()
+        files_changed = get_patch_changed_files(patch.id, patch.diff)
 
         collection_id = uuid.uuid4()
         builds = []
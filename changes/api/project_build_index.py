@@ -22,6 +22,10 @@ def validate_author(author_id):
 
 
 class ProjectBuildIndexAPIView(APIView):
+    cache_timeout = 30
+    # author=me
+    cache_vary_on_user = True
+
     get_parser = RequestParser()
     get_parser.add_argument('include_patches', type=lambda x: bool(int(x)), location='args',
                             default=True)
@@ -37,6 +41,12 @@ class ProjectBuildIndexAPIView(APIView):
                             choices=('unknown', 'manual', 'push', 'retry', 'snapshot', ''))
     get_parser.add_argument('tag', type=unicode, default='')
 
+    def get_cache_scopes(self, project_id):
+        project = Project.get(project_id)
+        if project is None:
+            return ()
+        return ('project:{0}'.format(project.id.hex),)
+
     def get(self, project_id):
         project = Project.get(project_id)
         if not project:
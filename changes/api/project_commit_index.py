@@ -1,6 +1,7 @@
 from __future__ import absolute_import, division, unicode_literals
 
 import itertools
+from base64 import urlsafe_b64decode
 from collections import defaultdict
 
 from flask.ext.restful import reqparse
@@ -10,6 +11,7 @@ from changes.api.base import APIView, error
 from changes.config import db
 from changes.constants import Cause, Status
 from changes.models import Build, Project, Revision, Source, ProjectOption
+from changes.vcs.base import FULL_SHA_RE
 
 
 class ProjectCommitIndexAPIView(APIView):
@@ -20,6 +22,8 @@ class ProjectCommitIndexAPIView(APIView):
                             default=50)
     get_parser.add_argument('parent', location='args')
     get_parser.add_argument('branch', location='args')
+    # a cursor (from the previous page's next link) to use instead of page
+    get_parser.add_argument('after', location='args')
     get_parser.add_argument('every_commit', location='args', default=0)
     get_parser.add_argument('all_builds', location='args', default=0)
 
@@ -36,20 +40,36 @@ class ProjectCommitIndexAPIView(APIView):
         if not args.every_commit:
             paths = self.get_whitelisted_paths(project)
 
+        after = None
+        if args.after:
+            try:
+                after = urlsafe_b64decode(str(args.after))
+            except TypeError:
+                return error('Invalid value for after')
+            # it ends up on the vcs command line, so it had better be a sha
+            if not FULL_SHA_RE.match(after):
+                return error('Invalid value for after')
+
         repo = project.repository
-        offset = (args.page - 1) * args.per_page
+        offset = (args.page - 1) * args.per_page if not after else 0
         limit = args.per_page + 1  # +1 to tell if there are more revs to get
 
         vcs = repo.get_vcs()
         if vcs:
             try:
                 commits = self.get_commits_from_vcs(
-                    repo, vcs, offset, limit, paths, args.parent, args.branch)
+                    repo, vcs, offset, limit, paths, args.parent, args.branch,
+                    after=after)
             except ValueError as err:
                 return error(err.message)
         else:
-            if args.parent or args.branch:
-                param = 'Branches' if args.branch else 'Parents'
+            if args.parent or args.branch or after:
+                if args.branch:
+                    param = 'Branches'
+                elif args.parent:
+                    param = 'Parents'
+                else:
+                    param = 'Cursors'
                 return error(
                     '{0} not supported for projects with no repository.'.format(param),
                     http_code=422)
@@ -58,10 +78,16 @@ class ProjectCommitIndexAPIView(APIView):
             # frontend about this (perhaps using a response header)
             commits = self.get_commits_from_db(repo, offset, limit)
 
-        page_links = self.make_links(
-            current_page=args.page,
-            has_next_page=len(commits) > args.per_page,
-        )
+        has_next_page = len(commits) > args.per_page
+        if after:
+            page_links = self.make_cursor_links(
+                after_id=commits[args.per_page - 1]['id'] if has_next_page else None,
+            )
+        else:
+            page_links = self.make_links(
+                current_page=args.page,
+                has_next_page=has_next_page,
+            )
         # we fetched one extra commit so that we'd know whether to create a
         # next link. Delete it
         commits = commits[:args.per_page]
@@ -93,13 +119,15 @@ class ProjectCommitIndexAPIView(APIView):
             return whitelist.value.strip().splitlines()
         return None
 
-    def get_commits_from_vcs(self, repo, vcs, offset, limit, paths, parent, branch):
+    def get_commits_from_vcs(self, repo, vcs, offset, limit, paths, parent, branch,
+                             after=None):
         vcs_log = list(vcs.log(
             offset=offset,
             limit=limit,
             parent=parent,
             branch=branch,
-            paths=paths
+            paths=paths,
+            after=after,
         ))
 
         if not vcs_log:
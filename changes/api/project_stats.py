@@ -60,6 +60,8 @@ def decr_day(dt):
 
 
 class ProjectStatsAPIView(APIView):
+    cache_timeout = 300
+
     parser = reqparse.RequestParser()
     parser.add_argument('resolution', type=unicode, location='args',
                         choices=RESOLUTION_CHOICES, default='1d')
@@ -71,6 +73,12 @@ class ProjectStatsAPIView(APIView):
     parser.add_argument('from', type=int, location='args',
                         dest='from_date')
 
+    def get_cache_scopes(self, project_id):
+        project = Project.get(project_id)
+        if project is None:
+            return ()
+        return ('project:{0}'.format(project.id.hex),)
+
     def get(self, project_id):
         project = Project.get(project_id)
         if not project:
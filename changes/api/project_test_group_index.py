@@ -5,7 +5,11 @@ from flask.ext.restful import reqparse
 from changes.api.base import APIView
 from changes.config import db
 from changes.constants import Result, Status
-from changes.models import Build, Project, ProjectOption, TestCase, Job, Source
+from changes.lib.test_snapshot import get_project_test_snapshot
+from changes.models import (
+    Build, Project, ProjectOption, ProjectTestSnapshotCase, TestCase, Job,
+    Source
+)
 from changes.utils.trees import build_tree
 
 
@@ -20,6 +24,10 @@ class ProjectTestGroupIndexAPIView(APIView):
 
         args = self.parser.parse_args()
 
+        snapshot = get_project_test_snapshot(project.id)
+        if snapshot is not None:
+            return self.get_from_snapshot(project, snapshot, args)
+
         latest_build = Build.query.join(
             Source, Source.id == Build.source_id,
         ).filter(
@@ -82,27 +90,12 @@ class ProjectTestGroupIndexAPIView(APIView):
                 results.append(data)
             results.sort(key=lambda x: x['totalDuration'], reverse=True)
 
-            trail = []
-            context = []
-            if args.parent:
-                for chunk in args.parent.split(sep):
-                    context.append(chunk)
-                    trail.append({
-                        'path': sep.join(context),
-                        'name': chunk,
-                    })
+            trail = self.get_trail(args.parent, sep)
         else:
             results = []
             trail = []
 
-        options = dict(
-            (o.name, o.value) for o in ProjectOption.query.filter(
-                ProjectOption.project_id == project.id,
-                ProjectOption.name == 'build.test-duration-warning',
-            )
-        )
-
-        over_threshold_duration = options.get('build.test-duration-warning')
+        over_threshold_duration = self.get_duration_warning(project)
         if over_threshold_duration:
             over_threshold_count = TestCase.query.filter(
                 TestCase.project_id == project_id,
@@ -122,3 +115,63 @@ class ProjectTestGroupIndexAPIView(APIView):
         }
 
         return self.respond(data, serialize=False)
+
+    def get_from_snapshot(self, project, snapshot, args):
+        sep = snapshot.sep
+        parent = args.parent or ''
+
+        results = []
+        for path, num_tests, total_duration in snapshot.groups.get(parent, []):
+            if parent:
+                name = path[len(parent) + len(sep):]
+            else:
+                name = path
+            results.append({
+                'name': name,
+                'path': path,
+                'totalDuration': total_duration,
+                'numTests': num_tests,
+            })
+
+        trail = self.get_trail(args.parent, sep)
+
+        over_threshold_duration = self.get_duration_warning(project)
+        if over_threshold_duration:
+            over_threshold_count = ProjectTestSnapshotCase.query.filter(
+                ProjectTestSnapshotCase.project_id == project.id,
+                ProjectTestSnapshotCase.duration >= over_threshold_duration,
+            ).count()
+        else:
+            over_threshold_count = 0
+
+        data = {
+            'groups': results,
+            'trail': trail,
+            'overThreshold': {
+                'count': over_threshold_count,
+                'duration': over_threshold_duration,
+            }
+        }
+
+        return self.respond(data, serialize=False)
+
+    def get_trail(self, parent, sep):
+        trail = []
+        context = []
+        if parent:
+            for chunk in parent.split(sep):
+                context.append(chunk)
+                trail.append({
+                    'path': sep.join(context),
+                    'name': chunk,
+                })
+        return trail
+
+    def get_duration_warning(self, project):
+        options = dict(
+            (o.name, o.value) for o in ProjectOption.query.filter(
+                ProjectOption.project_id == project.id,
+                ProjectOption.name == 'build.test-duration-warning',
+            )
+        )
+        return options.get('build.test-duration-warning')
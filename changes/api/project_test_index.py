@@ -6,7 +6,10 @@ from changes.api.base import APIView
 from changes.api.serializer.models.testcase import GeneralizedTestCase
 from changes.config import db
 from changes.constants import Result, Status
-from changes.models import Build, Project, TestCase, Job, Source
+from changes.lib.test_snapshot import get_project_test_snapshot
+from changes.models import (
+    Build, Project, ProjectTestSnapshotCase, TestCase, Job, Source
+)
 
 
 SORT_CHOICES = (
@@ -29,6 +32,9 @@ class ProjectTestIndexAPIView(APIView):
 
         args = self.parser.parse_args()
 
+        if get_project_test_snapshot(project.id) is not None:
+            return self.get_from_snapshot(project, args)
+
         latest_build = Build.query.join(
             Source, Source.id == Build.source_id,
         ).filter(
@@ -73,3 +79,29 @@ class ProjectTestIndexAPIView(APIView):
         return self.paginate(test_list, serializers={
             TestCase: GeneralizedTestCase(),
         })
+
+    def get_from_snapshot(self, project, args):
+        test_list = ProjectTestSnapshotCase.query.filter(
+            ProjectTestSnapshotCase.project_id == project.id,
+        )
+
+        if args.min_duration:
+            test_list = test_list.filter(
+                ProjectTestSnapshotCase.duration >= args.min_duration,
+            )
+
+        if args.query:
+            test_list = test_list.filter(
+                ProjectTestSnapshotCase.name.contains(args.query),
+            )
+
+        if args.sort == 'duration':
+            sort_by = ProjectTestSnapshotCase.duration.desc()
+        elif args.sort == 'name':
+            sort_by = ProjectTestSnapshotCase.name.asc()
+
+        test_list = test_list.order_by(sort_by)
+
+        return self.paginate(test_list, serializers={
+            ProjectTestSnapshotCase: GeneralizedTestCase(),
+        })
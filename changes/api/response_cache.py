@@ -0,0 +1,95 @@
+"""
+A redis cache for the JSON responses of hot, read-only API endpoints.
+
+Views opt in by setting ``cache_timeout`` (see APIView). A cached response
+is keyed by the request and by the current generation of every scope the
+view says it depends on (e.g. ``build:<id>`` or ``project:<id>``), so bumping
+a scope's generation with invalidate() makes everything cached under it
+unreachable. Anything left over just expires.
+"""
+
+from __future__ import absolute_import
+
+import json
+
+from flask import request, session
+from hashlib import md5
+
+from changes.config import redis
+
+# Generations outlive any cached response, so they can't be reset by
+# expiring while something cached under the old value is still around.
+SCOPE_GENERATION_TTL = 60 * 60 * 24 * 7
+
+
+def get_scope_key(scope):
+    return 'api:cache:scope:{0}'.format(scope)
+
+
+def invalidate(*scopes):
+    """
+    Drops every cached response that depends on any of ``scopes``.
+    """
+    pipe = redis.pipeline()
+    for scope in scopes:
+        key = get_scope_key(scope)
+        pipe.incr(key)
+        pipe.expire(key, SCOPE_GENERATION_TTL)
+    pipe.execute()
+
+
+def invalidate_build(build):
+    """
+    Drops every cached response that depends on ``build``. Call it once the
+    change to the build has been committed, or a concurrent request could
+    cache the old state under the new generation.
+    """
+    invalidate(
+        'build:{0}'.format(build.id.hex),
+        'project:{0}'.format(build.project_id.hex),
+        'system',
+    )
+
+
+def get_cache_key(view_name, scopes, vary_on_user=False):
+    """
+    Returns the key to cache the current request's response under.
+    """
+    if scopes:
+        generations = redis.mget([get_scope_key(s) for s in scopes])
+    else:
+        generations = []
+
+    parts = [
+        request.path,
+        sorted(request.args.iteritems(multi=True)),
+        zip(scopes, [g or '0' for g in generations]),
+    ]
+    if vary_on_user:
+        parts.append(session.get('uid'))
+
+    return 'api:cache:{0}:{1}'.format(
+        view_name, md5(json.dumps(parts)).hexdigest())
+
+
+def get_etag(data):
+    return md5(data).hexdigest()
+
+
+def get_response(cache_key):
+    """
+    Returns ``(data, status_code, headers, etag)`` for a cached response, or
+    None.
+    """
+    cached = redis.get(cache_key)
+    if cached is None:
+        return None
+
+    meta, _, data = cached.partition('\n')
+    status_code, headers, etag = json.loads(meta)
+    return data, status_code, headers, etag
+
+
+def set_response(cache_key, data, status_code, headers, etag, timeout):
+    meta = json.dumps([status_code, headers, etag])
+    redis.setex(cache_key, meta + '\n' + data, timeout)
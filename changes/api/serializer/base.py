@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from datetime import datetime
 from enum import Enum
 from uuid import UUID
@@ -20,56 +21,116 @@ def serialize(data, extended_registry=None, use_greedy=False):
 
     Its safe (but CPU-expensive) to rerun serialize on data multiple times
     """
-    if extended_registry is None:
-        extended_registry = {}
-
     if isinstance(data, _PASSTHROUGH):
         return data
 
-    if isinstance(data, dict):
-        for k, v in data.iteritems():
-            if not isinstance(v, _PASSTHROUGH) or not isinstance(k, _PASSTHROUGH):
-                # Gotta do it the hard way.
-                return dict(zip(serialize(data.keys(), extended_registry),
-                                serialize(data.values(), extended_registry)))
-        # All keys and values were passthrough, so the dict is already
-        # serialized.
-        return data
+    return _Serializer(extended_registry or {}).serialize(data)
 
-    if isinstance(data, (list, tuple, set, frozenset)):
-        if not data:
-            return []
 
-        # if every item in the list is the same, we want to batch fetch any
-        # necessary data from the db before serializing them all
-        if len(set(type(g) for g in data)) == 1:
-            # Make sure it is a list.
-            if not isinstance(data, list):
-                data = list(data)
+class _Serializer(object):
+    """
+    Walks a data structure breadth first, one level of crumbling at a time.
 
-            # If we have a list of passthrough, we're done.
-            if isinstance(data[0], _PASSTHROUGH):
-                return data
+    Every object that needs crumbling at a given depth is crumbled in the same
+    pass, so each crumbler fetches extra attributes from the db once per
+    level for all of its objects (e.g. the projects of every build in a list),
+    rather than once for every list or object it turns up in.
+    """
 
-            crumbler = get_crumbler(data[0], extended_registry)
+    def __init__(self, extended_registry):
+        self.extended_registry = extended_registry
 
-            if crumbler:
-                attrs = crumbler.get_extra_attrs_from_db(data)
-                data = [crumbler(o, attrs=attrs.get(o)) for o in data]
+    def serialize(self, data):
+        root = [None]
+        # Dicts have to be put back together once their keys have been
+        # serialized, so they're finished (innermost first) at the end.
+        self.finishers = []
 
-        return [serialize(j, extended_registry) for j in data]
+        level = [(root, 0, data)]
+        while level:
+            level = self._crumble_level(level)
 
-    # if we're here, we have a single object that we probably need to convert
-    # using a crumbler
-    crumbler = get_crumbler(data, extended_registry)
+        for finish in reversed(self.finishers):
+            finish()
 
-    if crumbler is None:
-        return data
+        return root[0]
 
-    attrs = crumbler.get_extra_attrs_from_db([data])
-    data = crumbler(data, attrs=attrs.get(data))
+    def _crumble_level(self, level):
+        """
+        Serializes everything in ``level`` that doesn't need crumbling, and
+        crumbles the rest.
 
-    return serialize(data, extended_registry)
+        ``level`` is a list of ``(container, key, value)``, meaning that the
+        serialized ``value`` goes in ``container[key]``. Returns the same for
+        the results of crumbling, which need to be serialized in turn.
+        """
+        pending = OrderedDict()
+
+        # containers add their contents to the end of the level as we go
+        i = 0
+        while i < len(level):
+            container, key, value = level[i]
+            i += 1
+
+            if isinstance(value, _PASSTHROUGH):
+                container[key] = value
+
+            elif isinstance(value, dict):
+                self._visit_dict(container, key, value, level)
+
+            elif isinstance(value, (list, tuple, set, frozenset)):
+                self._visit_list(container, key, value, level)
+
+            else:
+                crumbler = get_crumbler(value, self.extended_registry)
+                if crumbler is None:
+                    container[key] = value
+                else:
+                    pending.setdefault(crumbler, []).append((container, key, value))
+
+        next_level = []
+        for crumbler, items in pending.iteritems():
+            attrs = crumbler.get_extra_attrs_from_db([item for _, _, item in items])
+            for container, key, value in items:
+                next_level.append((container, key, crumbler(value, attrs=attrs.get(value))))
+        return next_level
+
+    def _visit_dict(self, container, key, value, level):
+        for k, v in value.iteritems():
+            if not isinstance(v, _PASSTHROUGH) or not isinstance(k, _PASSTHROUGH):
+                break
+        else:
+            # All keys and values were passthrough, so the dict is already
+            # serialized.
+            container[key] = value
+            return
+
+        keys = value.keys()
+        values = value.values()
+        for i in xrange(len(keys)):
+            level.append((keys, i, keys[i]))
+            level.append((values, i, values[i]))
+
+        def finish():
+            container[key] = dict(zip(keys, values))
+        self.finishers.append(finish)
+
+    def _visit_list(self, container, key, value, level):
+        if not value:
+            container[key] = []
+            return
+
+        if not isinstance(value, list):
+            value = list(value)
+
+        # If we have a list of passthrough, we're done.
+        if all(isinstance(v, _PASSTHROUGH) for v in value):
+            container[key] = value
+            return
+
+        result = list(value)
+        container[key] = result
+        level.extend((result, i, v) for i, v in enumerate(value))
 
 
 #
@@ -83,10 +144,15 @@ def serialize(data, extended_registry=None, use_greedy=False):
 
 _registry = {}
 
+# Maps every type we've looked up to the crumbler for it from _registry (or
+# None), so the MRO is only searched once per type.
+_crumblers_by_type = {}
+
 
 def register(type):
     def wrapped(cls):
         _registry[type] = cls()
+        _crumblers_by_type.clear()
         return cls
     return wrapped
 
@@ -94,14 +160,22 @@ def register(type):
 def get_crumbler(item, registry):
     item_type = type(item)
 
-    crumbler = registry.get(item_type, _registry.get(item_type))
+    crumbler = registry.get(item_type)
+    if crumbler is not None:
+        return crumbler
 
-    if crumbler is None:
-        for cls, _crumbler in _registry.iteritems():
-            if issubclass(item_type, cls):
-                crumbler = _crumbler
-                break
+    try:
+        return _crumblers_by_type[item_type]
+    except KeyError:
+        pass
+
+    crumbler = None
+    for cls in getattr(item_type, '__mro__', (item_type,)):
+        crumbler = _registry.get(cls)
+        if crumbler is not None:
+            break
 
+    _crumblers_by_type[item_type] = crumbler
     return crumbler
 
 
@@ -10,6 +10,8 @@ from changes.models import Build, Job, JobStep
 
 
 class SystemStatsAPIView(APIView):
+    cache_timeout = 60
+
     def _get_status_counts(self, cutoff):
         excluded = [Status.finished, Status.collecting_results, Status.unknown]
 
@@ -110,6 +112,9 @@ class SystemStatsAPIView(APIView):
 
         return context
 
+    def get_cache_scopes(self):
+        return ('system',)
+
     def get(self):
         cutoff = datetime.utcnow() - timedelta(hours=24)
 
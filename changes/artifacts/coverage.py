@@ -1,66 +1,126 @@
 from __future__ import absolute_import, division
 
-from collections import defaultdict
-from hashlib import md5
+from collections import OrderedDict, defaultdict
+from datetime import datetime
 from lxml import etree
 from sqlalchemy.exc import IntegrityError
 
 from changes.config import db, redis
-from changes.lib.coverage import merge_coverage, get_coverage_stats
+from changes.lib.coverage import (
+    get_coverage_stats, get_merged_coverage_cache_key, merge_coverage
+)
+from changes.lib.source_diff import get_lines_by_file
 from changes.models.filecoverage import FileCoverage
-from changes.utils.diff_parser import DiffParser
 
 from .base import ArtifactHandler
 
+# How many files' existing coverage to look up per query.
+EXISTING_COVERAGE_BATCH_SIZE = 1000
+
 
 class CoverageHandler(ArtifactHandler):
     FILENAMES = ('coverage.xml', '*.coverage.xml')
 
     def process(self, fp):
-        results = self.get_coverage(fp)
+        results = self.merge_results(self.get_coverage(fp))
 
-        for result in results:
-            try:
-                with db.session.begin_nested():
-                    db.session.add(result)
-            except IntegrityError:
-                lock_key = 'coverage:{job_id}:{file_hash}'.format(
-                    job_id=result.job_id.hex,
-                    file_hash=md5(result.filename).hexdigest(),
-                )
-                with redis.lock(lock_key):
-                    result = self.merge_coverage(result)
-                    db.session.add(result)
-            db.session.commit()
+        if results:
+            self.save_coverage(results)
+            redis.delete(get_merged_coverage_cache_key(self.step.job.build_id))
 
         return results
 
-    def merge_coverage(self, new):
-        existing = FileCoverage.query.filter(
-            FileCoverage.job_id == new.job_id,
-            FileCoverage.filename == new.filename,
-        ).first()
+    def merge_results(self, results):
+        """
+        Merges results for files which are reported more than once.
+        """
+        results_by_file = OrderedDict()
+        for result in results:
+            existing = results_by_file.get(result.filename)
+            if existing is None:
+                results_by_file[result.filename] = result
+            else:
+                existing.data = merge_coverage(existing.data, result.data)
+                self.add_file_stats(existing)
+        return results_by_file.values()
+
+    def save_coverage(self, results):
+        """
+        Stores the (already merged) results for a whole report in one
+        transaction.
 
-        existing.data = merge_coverage(existing.data, new.data)
+        Coverage a job already has for any of the files is locked and merged
+        with the new results, and everything else is inserted in bulk.
+        """
+        job_id = results[0].job_id
+        filenames = [r.filename for r in results]
+
+        existing = {}
+        for i in xrange(0, len(filenames), EXISTING_COVERAGE_BATCH_SIZE):
+            existing.update((c.filename, c) for c in FileCoverage.query.filter(
+                FileCoverage.job_id == job_id,
+                FileCoverage.filename.in_(filenames[i:i + EXISTING_COVERAGE_BATCH_SIZE]),
+            ).with_for_update().populate_existing())
+
+        date_created = datetime.utcnow()
+        new_rows = []
+        for result in results:
+            current = existing.get(result.filename)
+            if current is None:
+                new_rows.append(self._get_row(result, date_created))
+            else:
+                self._merge_into(current, result.data)
 
+        if new_rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(FileCoverage.__table__.insert(), new_rows)
+            except IntegrityError:
+                # Another artifact for this job stored some of these files
+                # since we looked, so go through them one at a time.
+                for row in new_rows:
+                    self._save_row(row)
+
+        db.session.commit()
+
+    def _get_row(self, result, date_created):
+        return {
+            'id': result.id,
+            'step_id': result.step_id,
+            'job_id': result.job_id,
+            'project_id': result.project_id,
+            'filename': result.filename,
+            'data': result.data,
+            'date_created': date_created,
+            'lines_covered': result.lines_covered,
+            'lines_uncovered': result.lines_uncovered,
+            'diff_lines_covered': result.diff_lines_covered,
+            'diff_lines_uncovered': result.diff_lines_uncovered,
+        }
+
+    def _save_row(self, row):
+        try:
+            with db.session.begin_nested():
+                db.session.execute(FileCoverage.__table__.insert(), [row])
+        except IntegrityError:
+            current = FileCoverage.query.filter(
+                FileCoverage.job_id == row['job_id'],
+                FileCoverage.filename == row['filename'],
+            ).with_for_update().populate_existing().one()
+            self._merge_into(current, row['data'])
+
+    def _merge_into(self, existing, data):
+        existing.data = merge_coverage(existing.data, data)
         self.add_file_stats(existing)
-
-        return existing
+        db.session.add(existing)
 
     def process_diff(self):
-        lines_by_file = defaultdict(set)
         try:
             source = self.step.job.build.source
         except AttributeError:
-            return lines_by_file
-
-        diff = source.generate_diff()
-
-        if not diff:
-            return lines_by_file
+            return defaultdict(set)
 
-        diff_parser = DiffParser(diff)
-        return diff_parser.get_lines_by_file()
+        return get_lines_by_file(source)
 
     def get_processed_diff(self):
         if not hasattr(self, '_processed_diff'):
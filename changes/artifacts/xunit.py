@@ -22,9 +22,14 @@ class XunitHandler(ArtifactHandler):
     logger = logging.getLogger('xunit')
 
     def process(self, fp):
-        test_list = self.get_tests(fp)
-
         manager = TestResultManager(self.step)
+
+        batch_size = current_app.config.get('XUNIT_STREAMING_BATCH_SIZE')
+        if batch_size:
+            manager.save_batches(self.iter_test_batches(fp, batch_size))
+            return
+
+        test_list = self.get_tests(fp)
         manager.save(test_list)
 
         return test_list
@@ -39,128 +44,184 @@ class XunitHandler(ArtifactHandler):
             parser = etree.XMLParser(huge_tree=True)
             root = etree.fromstring(fp.read(), parser=parser)
         except Exception:
-            uri = build_uri('/find_build/{0}/'.format(self.step.job.build_id.hex))
-            self.logger.warning('Failed to parse XML; (step=%s, build=%s)', self.step.id.hex, uri, exc_info=True)
-            try_create(FailureReason, {
-                'step_id': self.step.id,
-                'job_id': self.step.job_id,
-                'build_id': self.step.job.build_id,
-                'project_id': self.step.project_id,
-                'reason': 'malformed_artifact'
-            })
-            db.session.commit()
+            self._record_malformed_artifact()
             return []
 
         if root.tag == 'unittest-results':
             return self.get_bitten_tests(root)
         return self.get_xunit_tests(root)
 
-    def get_bitten_tests(self, root):
-        step = self.step
+    @statsreporter.timer('xunithandler_iter_test_batches')
+    def iter_test_batches(self, fp, batch_size):
+        """
+        Parses the report incrementally, yielding lists of at most
+        ``batch_size`` TestResults.
+
+        Each <testcase> is discarded as soon as it has been converted, so
+        memory use is bounded by the batch size rather than by the size of
+        the report. Multiple cases for the same test are combined as long as
+        they're reported back to back (as py.test does for a failure plus a
+        tear-down error): the last test of each batch is held back for the
+        next one in case more of its cases follow. Cases of a test which are
+        further apart than a batch are saved as duplicates.
+        """
+        message_limit = current_app.config.get('TEST_MESSAGE_MAX_LEN')
 
+        root_tag = None
         results = []
+        try:
+            # See get_tests() for why we need huge_tree.
+            for event, node in etree.iterparse(fp, events=('start', 'end'), huge_tree=True):
+                if root_tag is None:
+                    root_tag = node.tag
+                if event != 'end':
+                    continue
+
+                if root_tag == 'unittest-results':
+                    if node.tag != 'test':
+                        continue
+                    results.append(self._get_bitten_test(node, message_limit))
+                elif node.tag == 'testcase':
+                    results.append(self._get_xunit_test(node, message_limit))
+                else:
+                    continue
+
+                # Free the element and any siblings we've already handled so
+                # the partially built tree doesn't grow with the report.
+                node.clear()
+                while node.getprevious() is not None:
+                    del node.getparent()[0]
+
+                if len(results) >= batch_size:
+                    results = _deduplicate_testresults(results)
+                    if len(results) > 1:
+                        yield results[:-1]
+                        results = results[-1:]
+        except etree.XMLSyntaxError:
+            self._record_malformed_artifact()
+
+        if results:
+            yield _deduplicate_testresults(results)
+
+    def _record_malformed_artifact(self):
+        uri = build_uri('/find_build/{0}/'.format(self.step.job.build_id.hex))
+        self.logger.warning('Failed to parse XML; (step=%s, build=%s)', self.step.id.hex, uri, exc_info=True)
+        try_create(FailureReason, {
+            'step_id': self.step.id,
+            'job_id': self.step.job_id,
+            'build_id': self.step.job.build_id,
+            'project_id': self.step.project_id,
+            'reason': 'malformed_artifact'
+        })
+        db.session.commit()
 
+    def get_bitten_tests(self, root):
         message_limit = current_app.config.get('TEST_MESSAGE_MAX_LEN')
         # XXX(dcramer): bitten xml syntax, no clue what this
-        for node in root.iter('test'):
-            # classname, name, time
-            attrs = dict(node.items())
-            # AFAIK the spec says only one tag can be present
-            # http://windyroad.com.au/dl/Open%20Source/JUnit.xsd
-            if attrs['status'] == 'success':
-                result = Result.passed
-            elif attrs['status'] == 'skipped':
-                result = Result.skipped
-            elif attrs['status'] in ('error', 'failure'):
-                result = Result.failed
-            else:
-                result = None
-
-            try:
-                message = list(node.iter('traceback'))[0].text
-            except IndexError:
-                message = ''
-
-            # no matching status tags were found
-            if result is None:
-                result = Result.passed
-
-            results.append(TestResult(
-                step=step,
-                name=attrs['name'],
-                package=attrs.get('fixture') or None,
-                duration=float(attrs['duration']) * 1000,
-                result=result,
-                message=_truncate_message(message, message_limit),
-            ))
+        return [
+            self._get_bitten_test(node, message_limit)
+            for node in root.iter('test')
+        ]
+
+    def _get_bitten_test(self, node, message_limit):
+        # classname, name, time
+        attrs = dict(node.items())
+        # AFAIK the spec says only one tag can be present
+        # http://windyroad.com.au/dl/Open%20Source/JUnit.xsd
+        if attrs['status'] == 'success':
+            result = Result.passed
+        elif attrs['status'] == 'skipped':
+            result = Result.skipped
+        elif attrs['status'] in ('error', 'failure'):
+            result = Result.failed
+        else:
+            result = None
 
-        return results
+        try:
+            message = list(node.iter('traceback'))[0].text
+        except IndexError:
+            message = ''
+
+        # no matching status tags were found
+        if result is None:
+            result = Result.passed
+
+        return TestResult(
+            step=self.step,
+            name=attrs['name'],
+            package=attrs.get('fixture') or None,
+            duration=float(attrs['duration']) * 1000,
+            result=result,
+            message=_truncate_message(message, message_limit),
+        )
 
     def get_xunit_tests(self, root):
-        step = self.step
-
         message_limit = current_app.config.get('TEST_MESSAGE_MAX_LEN')
-        results = []
-        for node in root.iter('testcase'):
-            # classname, name, time
-            attrs = dict(node.items())
-            # AFAIK the spec says only one tag can be present
-            # http://windyroad.com.au/dl/Open%20Source/JUnit.xsd
-            try:
-                r_node = list(node.iterchildren())[0]
-            except IndexError:
-                result = Result.passed
-                message = ''
-            else:
-                # TODO(cramer): whitelist tags that are not statuses
-                if r_node.tag == 'failure':
-                    result = Result.failed
-                elif r_node.tag == 'skipped':
-                    result = Result.skipped
-                elif r_node.tag == 'error':
-                    result = Result.failed
-                else:
-                    result = None
-
-                message = r_node.text
-
-            # If there's a previous failure in addition to stdout or stderr,
-            # prioritize showing the previous failure because that's what's
-            # useful for debugging flakiness.
-            message = attrs.get("last_failure_output") or message
-            # no matching status tags were found
-            if result is None:
-                result = Result.passed
-
-            if attrs.get('quarantined'):
-                if result == Result.passed:
-                    result = Result.quarantined_passed
-                elif result == Result.failed:
-                    result = Result.quarantined_failed
-                elif result == Result.skipped:
-                    result = Result.quarantined_skipped
-
-            if attrs.get('time'):
-                duration = float(attrs['time']) * 1000
-            else:
-                duration = None
-
-            results.append(TestResult(
-                step=step,
-                name=attrs['name'],
-                package=attrs.get('classname') or None,
-                duration=duration,
-                result=result,
-                # We truncate before deduplication; this gives us a weaker guarantee on maximum size,
-                # but ensures that we have at least some message from each test.
-                message=_truncate_message(message, message_limit),
-                reruns=int(attrs.get('rerun')) if attrs.get('rerun') else None,
-                artifacts=self._get_testartifacts(node)
-            ))
+        results = [
+            self._get_xunit_test(node, message_limit)
+            for node in root.iter('testcase')
+        ]
 
         results = _deduplicate_testresults(results)
         return results
 
+    def _get_xunit_test(self, node, message_limit):
+        # classname, name, time
+        attrs = dict(node.items())
+        # AFAIK the spec says only one tag can be present
+        # http://windyroad.com.au/dl/Open%20Source/JUnit.xsd
+        try:
+            r_node = list(node.iterchildren())[0]
+        except IndexError:
+            result = Result.passed
+            message = ''
+        else:
+            # TODO(cramer): whitelist tags that are not statuses
+            if r_node.tag == 'failure':
+                result = Result.failed
+            elif r_node.tag == 'skipped':
+                result = Result.skipped
+            elif r_node.tag == 'error':
+                result = Result.failed
+            else:
+                result = None
+
+            message = r_node.text
+
+        # If there's a previous failure in addition to stdout or stderr,
+        # prioritize showing the previous failure because that's what's
+        # useful for debugging flakiness.
+        message = attrs.get("last_failure_output") or message
+        # no matching status tags were found
+        if result is None:
+            result = Result.passed
+
+        if attrs.get('quarantined'):
+            if result == Result.passed:
+                result = Result.quarantined_passed
+            elif result == Result.failed:
+                result = Result.quarantined_failed
+            elif result == Result.skipped:
+                result = Result.quarantined_skipped
+
+        if attrs.get('time'):
+            duration = float(attrs['time']) * 1000
+        else:
+            duration = None
+
+        return TestResult(
+            step=self.step,
+            name=attrs['name'],
+            package=attrs.get('classname') or None,
+            duration=duration,
+            result=result,
+            # We truncate before deduplication; this gives us a weaker guarantee on maximum size,
+            # but ensures that we have at least some message from each test.
+            message=_truncate_message(message, message_limit),
+            reruns=int(attrs.get('rerun')) if attrs.get('rerun') else None,
+            artifacts=self._get_testartifacts(node)
+        )
+
     def _get_testartifacts(self, node):
         test_artifacts_node = node.find('test-artifacts')
         if test_artifacts_node is None:
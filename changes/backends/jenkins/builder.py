@@ -4,7 +4,6 @@ import json
 import logging
 import random
 import re
-import requests
 import sys
 import time
 import uuid
@@ -20,14 +19,18 @@ from changes.artifacts.manager import Manager
 from changes.artifacts.manifest_json import ManifestJsonHandler
 from changes.artifacts.xunit import XunitHandler
 from changes.backends.base import BaseBackend, UnrecoverableException
+from changes.backends.jenkins import master_state
+from changes.backends.jenkins.client import get_client
 from changes.buildsteps.base import BuildStep
 from changes.config import db, redis, statsreporter
 from changes.constants import Result, Status
-from changes.db.utils import create_or_update, get_or_create
+from changes.db.utils import get_or_create
 from changes.jobs.sync_job_step import sync_job_step
+from changes.jobs.sync_log import sync_log
+from changes.lib.log_chunks import append_chunks, notify_append
 from changes.models import (
     Artifact, Cluster, ClusterNode, FailureReason, LogSource,
-    LogChunk, Node, JobPhase, JobStep, TestResult, LOG_CHUNK_SIZE
+    Node, JobPhase, JobStep, TestResult, LOG_CHUNK_SIZE
 )
 from changes.utils.http import build_uri
 from changes.utils.text import chunked
@@ -49,11 +52,24 @@ ID_XML_RE = re.compile(r'<id>(\d+)</id>')
 
 LOG_SYNC_TIMEOUT_SECS = 30
 
+# How many log chunks are inserted at once.
+LOG_SYNC_BATCH_SIZE = 100
+
 # Redis key for storing the master blacklist set
 # The blacklist is used to temporarily remove jenkins masters from the pool of available masters.
 MASTER_BLACKLIST_KEY = 'jenkins_master_blacklist'
 
 
+def _skip_bytes(iterator, count):
+    for data in iterator:
+        if count:
+            skipped = min(count, len(data))
+            data, count = data[skipped:], count - skipped
+            if not data:
+                continue
+        yield data
+
+
 class NotFound(Exception):
     """Indicates a 404 response from the Jenkins API."""
     pass
@@ -73,16 +89,11 @@ class JenkinsBuilder(BaseBackend):
 
         self.logger = logging.getLogger('jenkins')
         self.job_name = job_name
-        self.http_session = requests.Session()
+        self.client = get_client()
         self.auth = self.app.config[auth_keyname] if auth_keyname else None
         self.verify = verify
         self.debug_config = debug_config or {}
 
-        def report_response_status(r, *args, **kwargs):
-            statsreporter.stats().incr('jenkins_api_response_{}'.format(r.status_code))
-
-        self.http_session.hooks['response'].append(report_response_status)
-
     def _get_text_response(self, master_base_url, path, method='GET',
                            params=None, data=None):
         """Make an HTTP request and return a text response.
@@ -105,12 +116,12 @@ class JenkinsBuilder(BaseBackend):
             params = {}
 
         self.logger.info('Fetching %r', url)
-        resp = getattr(self.http_session, method.lower())(url, params=params,
-                                                          data=data,
-                                                          allow_redirects=False,
-                                                          timeout=30,
-                                                          auth=self.auth,
-                                                          verify=self.verify)
+        resp = self.client.request(method, url, params=params,
+                                   data=data,
+                                   allow_redirects=False,
+                                   timeout=30,
+                                   auth=self.auth,
+                                   verify=self.verify)
 
         if resp.status_code == 404:
             raise NotFound
@@ -229,7 +240,22 @@ class JenkinsBuilder(BaseBackend):
             self.logger.exception(
                 'Failed to sync test results for job step %s', jobstep.id)
 
-    def _sync_log(self, jobstep, name, job_name, build_no):
+    def _sync_log(self, jobstep, name, job_name, build_no, deadline=None):
+        """
+        Syncs the next part of a build's console log.
+
+        Chunks are inserted LOG_SYNC_BATCH_SIZE at a time, and each batch is
+        committed along with how far through the log we've got. If we run
+        past ``deadline`` (by default LOG_SYNC_TIMEOUT_SECS from now) we stop
+        after the chunks we've got so far, to be picked up from there next
+        time.
+
+        Returns True if there's more to sync, either because the build is
+        still running or because we ran out of time.
+        """
+        if deadline is None:
+            deadline = time.time() + LOG_SYNC_TIMEOUT_SECS
+
         job = jobstep.job
         logsource, created = get_or_create(LogSource, where={
             'name': name,
@@ -240,9 +266,10 @@ class JenkinsBuilder(BaseBackend):
             'date_created': jobstep.date_started,
         })
         if created:
-            offset = 0
+            offset, skip = 0, 0
         else:
             offset = jobstep.data.get('log_offset', 0)
+            skip = jobstep.data.get('log_skip', 0)
 
         url = '{base}/job/{job}/{build}/logText/progressiveText/'.format(
             base=jobstep.data['master'],
@@ -250,8 +277,6 @@ class JenkinsBuilder(BaseBackend):
             build=build_no,
         )
 
-        start_time = time.time()
-
         with closing(self._streaming_get(url, params={'start': offset})) as resp:
             log_length = int(resp.headers['X-Text-Size'])
 
@@ -261,52 +286,94 @@ class JenkinsBuilder(BaseBackend):
             if offset > log_length:
                 return
 
+            # We can only ask Jenkins for the log from the start of a response
+            # (see below), so a response we stopped partway through last time
+            # is downloaded again and the text we already stored is skipped.
+            iterator = _skip_bytes(resp.iter_content(chunk_size=LOG_CHUNK_SIZE), skip)
+
+            batch = []
+            timed_out = False
             # XXX: requests doesnt seem to guarantee chunk_size, so we force it
             # with our own helper
-            iterator = resp.iter_content()
             for chunk in chunked(iterator, LOG_CHUNK_SIZE):
-                chunk_size = len(chunk)
-                chunk, _ = create_or_update(LogChunk, where={
-                    'source': logsource,
-                    'offset': offset,
-                }, values={
-                    'job': job,
-                    'project': job.project,
-                    'size': chunk_size,
-                    'text': chunk,
-                })
-                offset += chunk_size
-
-                if time.time() > start_time + LOG_SYNC_TIMEOUT_SECS:
-                    warning = ("\nTRUNCATED LOG: TOOK TOO LONG TO DOWNLOAD FROM JENKINS. SEE FULL LOG AT "
-                               "{base}/job/{job}/{build}/consoleText\n").format(
-                                   base=jobstep.data['master'],
-                                   job=job_name,
-                                   build=build_no)
-                    create_or_update(LogChunk, where={
-                        'source': logsource,
-                        'offset': offset,
-                    }, values={
-                        'job': job,
-                        'project': job.project,
-                        'size': len(warning),
-                        'text': warning,
-                    })
-                    offset += chunk_size
-                    self.logger.warning('log download took too long: %s', logsource.get_url())
+                batch.append(chunk)
+                if time.time() > deadline:
+                    timed_out = True
                     break
+                if len(batch) >= LOG_SYNC_BATCH_SIZE:
+                    size = sum(len(c) for c in batch)
+                    self._save_log_chunks(jobstep, logsource, offset + skip, batch,
+                                          log_offset=offset, log_skip=skip + size)
+                    skip += size
+                    batch = []
 
             # Jenkins will suggest to us that there is more data when the job has
             # yet to complete
             has_more = resp.headers.get('X-More-Data') == 'true'
 
+        if timed_out:
+            size = sum(len(c) for c in batch)
+            self._save_log_chunks(jobstep, logsource, offset + skip, batch,
+                                  log_offset=offset, log_skip=skip + size)
+            self.logger.info('Log sync ran out of time, will resume: %s', logsource.get_url())
+            return True
+
         # We **must** track the log offset externally as Jenkins embeds encoded
         # links and we cant accurately predict the next `start` param.
-        jobstep.data['log_offset'] = log_length
-        db.session.add(jobstep)
+        self._save_log_chunks(jobstep, logsource, offset + skip, batch,
+                              log_offset=log_length, log_skip=0)
 
         return True if has_more else None
 
+    def _save_log_chunks(self, jobstep, logsource, text_offset, chunks,
+                         log_offset, log_skip):
+        """
+        Stores ``chunks``, the first of which begins at ``text_offset``, and
+        commits them along with where the next sync should start: the
+        response starting at ``log_offset``, minus its first ``log_skip``
+        bytes.
+        """
+        append_chunks(logsource, text_offset, chunks)
+
+        jobstep.data['log_offset'] = log_offset
+        if log_skip:
+            jobstep.data['log_skip'] = log_skip
+        else:
+            jobstep.data.pop('log_skip', None)
+        db.session.add(jobstep)
+        db.session.commit()
+
+        if chunks:
+            notify_append(logsource, text_offset + sum(len(c) for c in chunks))
+
+    def sync_log(self, step):
+        """
+        Syncs as much of a step's console log as we can in
+        LOG_SYNC_TIMEOUT_SECS.
+
+        Returns True if it's all synced.
+        """
+        deadline = time.time() + LOG_SYNC_TIMEOUT_SECS
+        while self._sync_log(
+                jobstep=step,
+                name=step.label,
+                job_name=step.data['job_name'],
+                build_no=step.data['build_no'],
+                deadline=deadline):
+            if time.time() > deadline:
+                return False
+        return True
+
+    def _sync_console_log(self, step):
+        if not self.sync_log(step):
+            # carry on from where we got to in the background, rather than
+            # cutting the log short or holding up the step
+            sync_log.delay_if_needed(
+                step_id=step.id.hex,
+                task_id=uuid.uuid5(step.id, 'sync_log').hex,
+                parent_task_id=step.id.hex,
+            )
+
     def _process_test_report(self, step, test_report):
         test_list = []
 
@@ -367,12 +434,19 @@ class JenkinsBuilder(BaseBackend):
 
         random.shuffle(master_urls)
 
-        best_match = (sys.maxint, None)
-        for url in master_urls:
+        def count_queued_jobs(url):
             try:
-                queued_jobs = self._count_queued_jobs(url, job_name)
+                return self._count_queued_jobs(url, job_name)
             except:
                 self.logger.exception("Couldn't count queued jobs on master %s", url)
+                return None
+
+        # ask every master at once, rather than waiting on each in turn
+        queue_sizes = self.client.map(count_queued_jobs, master_urls)
+
+        best_match = (sys.maxint, None)
+        for url, queued_jobs in zip(master_urls, queue_sizes):
+            if queued_jobs is None:
                 continue
 
             if queued_jobs == 0:
@@ -387,6 +461,10 @@ class JenkinsBuilder(BaseBackend):
         return best
 
     def _count_queued_jobs(self, master_base_url, job_name):
+        queued = master_state.get_queued_count(master_base_url, job_name)
+        if queued is not None:
+            return queued
+
         response = self._get_json_response(
             master_base_url=master_base_url,
             path='/queue/',
@@ -444,6 +522,10 @@ class JenkinsBuilder(BaseBackend):
         Returns:
             str: Queue item id if found, otherwise None.
         """
+        item_id = master_state.get_queue_item_id(master_base_url, changes_bid)
+        if item_id is not None:
+            return item_id
+
         xpath = QUEUE_ID_XPATH.format(job_id=changes_bid)
         try:
             response = self._get_text_response(
@@ -476,6 +558,10 @@ class JenkinsBuilder(BaseBackend):
         Returns:
             str: build number of the build if found, otherwise None.
         """
+        build_no = master_state.get_build_no(master_base_url, job_name, changes_bid)
+        if build_no is not None:
+            return build_no
+
         xpath = BUILD_ID_XPATH.format(job_id=changes_bid)
         try:
             response = self._get_text_response(
@@ -614,9 +700,6 @@ class JenkinsBuilder(BaseBackend):
             db.session.commit()
 
     def _sync_results(self, step, item):
-        job_name = step.data['job_name']
-        build_no = step.data['build_no']
-
         artifacts = item.get('artifacts', ())
 
         # Detect and warn if there are duplicate artifact file names as we were relying on
@@ -632,15 +715,7 @@ class JenkinsBuilder(BaseBackend):
         # sync console log
         self.logger.info('Syncing console log for %s', step.id)
         try:
-            result = True
-            while result:
-                result = self._sync_log(
-                    jobstep=step,
-                    name=step.label,
-                    job_name=job_name,
-                    build_no=build_no,
-                )
-
+            self._sync_console_log(step)
         except Exception:
             db.session.rollback()
             current_app.logger.exception(
@@ -737,14 +812,7 @@ class JenkinsBuilder(BaseBackend):
         # try to grab the logs.
         if not step.data.get('queued') and step.data.get('timed_out', False):
             try:
-                job_name = step.data['job_name']
-                build_no = step.data['build_no']
-                self._sync_log(
-                    jobstep=step,
-                    name=step.label,
-                    job_name=job_name,
-                    build_no=build_no,
-                )
+                self._sync_console_log(step)
             except Exception:
                 self.logger.exception(
                     'Unable to fully sync console log for job step %r',
@@ -954,8 +1022,8 @@ class JenkinsBuilder(BaseBackend):
             HTTPError: if the response code didn't indicate success.
             Timeout: if the server took too long to respond.
         """
-        resp = self.http_session.get(url, stream=True, timeout=15,
-                                     params=params, auth=self.auth,
-                                     verify=self.verify)
+        resp = self.client.request('GET', url, stream=True, timeout=15,
+                                   params=params, auth=self.auth,
+                                   verify=self.verify)
         resp.raise_for_status()
         return resp
@@ -160,6 +160,14 @@ class JenkinsBuildStep(BuildStep):
         builder = self.get_builder()
         builder.sync_artifact(artifact)
 
+    def sync_log(self, step):
+        """
+        Syncs as much of the step's console log as we can in one go.
+        Returns True if it's all synced.
+        """
+        builder = self.get_builder()
+        return builder.sync_log(step)
+
     def can_snapshot(self):
         """
         Since we do most of our build_type logic in the builder rather than
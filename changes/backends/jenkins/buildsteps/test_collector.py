@@ -16,6 +16,7 @@ from changes.buildsteps.base import BuildStep
 from changes.config import db
 from changes.constants import Result, Status
 from changes.db.utils import get_or_create, try_create
+from changes.expanders.sharding import parse_sharding_config
 from changes.expanders.tests import TestsExpander
 from changes.jobs.sync_job_step import sync_job_step
 from changes.models.failurereason import FailureReason
@@ -158,7 +159,7 @@ class JenkinsTestCollectorBuildStep(JenkinsGenericBuildStep):
     def __init__(self, shards=None, max_shards=10, collection_build_type=None,
                  build_type=None, setup_script='', teardown_script='',
                  collection_setup_script='', collection_teardown_script='',
-                 test_stats_from=None,
+                 test_stats_from=None, sharding=None,
                  **kwargs):
         """
         Arguments:
@@ -175,6 +176,8 @@ class JenkinsTestCollectorBuildStep(JenkinsGenericBuildStep):
               None (the default) to use this project.  Useful if the
               project runs a different subset of tests each time, so
               test timing stats from the parent are not reliable.
+            sharding = how to split tests into shards; see
+              changes.expanders.sharding.parse_sharding_config
 
         """
         # TODO(josiah): migrate existing step configs to use "shards" and remove max_shards
@@ -201,6 +204,7 @@ class JenkinsTestCollectorBuildStep(JenkinsGenericBuildStep):
         self.shard_setup_script = setup_script
         self.shard_teardown_script = teardown_script
         self.test_stats_from = test_stats_from
+        self.sharding = sharding
 
     def get_builder_options(self):
         options = super(JenkinsTestCollectorBuildStep, self).get_builder_options()
@@ -217,6 +221,9 @@ class JenkinsTestCollectorBuildStep(JenkinsGenericBuildStep):
     def get_test_stats_from(self):
         return self.test_stats_from
 
+    def get_sharding_config(self):
+        return self.sharding
+
     def _validate_shards(self, phase_steps):
         """This returns passed/unknown based on whether the correct number of
         shards were run."""
@@ -300,8 +307,11 @@ class JenkinsTestCollectorBuildStep(JenkinsGenericBuildStep):
             assert len(steps) == step_shard_counts[0]
         else:
             # Create all of the job steps and commit them together.
+            strategy, target_duration = parse_sharding_config(self.get_sharding_config())
             groups = TestsExpander.shard_tests(phase_config['tests'], self.max_shards,
-                                       test_stats, avg_test_time)
+                                               test_stats, avg_test_time,
+                                               strategy=strategy,
+                                               target_duration=target_duration)
             steps = [
                 self._create_jobstep(phase, phase_config['cmd'], phase_config.get('path', ''),
                                      weight, test_list, len(groups))
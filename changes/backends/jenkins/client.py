@@ -0,0 +1,135 @@
+"""
+HTTP plumbing shared by the Jenkins builders of a process.
+
+Every builder goes through the same requests session, so connections to each
+master are kept alive between requests (and tasks) rather than set up for
+every call. Requests which don't depend on each other, like counting the
+queues of several masters, can be fanned out over a small thread pool.
+
+Each request's latency is reported per master, as are requests which fail
+outright or get a 5xx response.
+"""
+
+from __future__ import absolute_import
+
+import os
+import re
+import requests
+import time
+
+from flask import current_app
+from multiprocessing.pool import ThreadPool
+from requests.adapters import HTTPAdapter
+from threading import Lock
+from urlparse import urlparse
+
+from changes.config import statsreporter
+
+# How many masters' connection pools are kept around.
+MAX_MASTERS = 50
+
+STAT_KEY_RE = re.compile(r'[^A-Za-z0-9_-]')
+
+
+def _get_stat_suffix(url):
+    return STAT_KEY_RE.sub('_', urlparse(url).netloc)
+
+
+def _report_response_status(r, *args, **kwargs):
+    statsreporter.stats().incr('jenkins_api_response_{}'.format(r.status_code))
+
+
+class JenkinsClient(object):
+    """
+    A requests session which keeps up to ``pool_size`` connections alive to
+    each master, and runs at most ``concurrency`` requests at once when
+    fanning out.
+    """
+
+    def __init__(self, pool_size=10, concurrency=8):
+        self.pool_size = pool_size
+        self.concurrency = concurrency
+        self.pid = os.getpid()
+        self.lock = Lock()
+        self.thread_pool = None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=MAX_MASTERS, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.hooks['response'].append(_report_response_status)
+
+    def request(self, method, url, **kwargs):
+        """
+        Makes a request like ``requests.request``, reporting how it went.
+        """
+        stats = statsreporter.stats()
+        suffix = _get_stat_suffix(url)
+
+        start_time = time.time()
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            stats.incr('jenkins_api_errors_{}'.format(suffix))
+            raise
+        finally:
+            stats.log_timing('jenkins_api_latency_{}'.format(suffix),
+                             int(1000 * (time.time() - start_time)))
+
+        if resp.status_code >= 500:
+            stats.incr('jenkins_api_errors_{}'.format(suffix))
+        return resp
+
+    def map(self, func, items):
+        """
+        Returns ``[func(item) for item in items]``, calling ``func`` on up to
+        ``concurrency`` items at once.
+
+        ``func`` is called within an app context, as it would be if it were
+        called directly. If any call raises, so does map (once they've all
+        finished), so ``func`` should handle anything it can.
+        """
+        items = list(items)
+        if len(items) <= 1 or self.concurrency <= 1:
+            return map(func, items)
+
+        app = current_app._get_current_object()
+
+        def call(item):
+            with app.app_context():
+                return func(item)
+
+        return self._get_thread_pool().map(call, items)
+
+    def _get_thread_pool(self):
+        with self.lock:
+            if self.thread_pool is None:
+                self.thread_pool = ThreadPool(self.concurrency)
+            return self.thread_pool
+
+    def close(self):
+        with self.lock:
+            thread_pool, self.thread_pool = self.thread_pool, None
+        if thread_pool is not None:
+            thread_pool.terminate()
+        self.session.close()
+
+
+_client = None
+_client_lock = Lock()
+
+
+def get_client():
+    """
+    Returns the JenkinsClient of the current process.
+    """
+    global _client
+
+    with _client_lock:
+        # neither the connections nor the threads survive a fork
+        if _client is None or _client.pid != os.getpid():
+            _client = JenkinsClient(
+                pool_size=current_app.config['JENKINS_HTTP_POOL_SIZE'],
+                concurrency=current_app.config['JENKINS_HTTP_CONCURRENCY'],
+            )
+        return _client
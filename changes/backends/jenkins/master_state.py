@@ -0,0 +1,165 @@
+"""
+Snapshots of what Jenkins masters are doing, shared by every builder.
+
+Rather than each sync task downloading a master's queue (or searching its
+builds) for itself, the periodic sync_jenkins_masters task takes a snapshot
+of each master in JENKINS_MASTER_STATE_URLS and stores it in redis. Builders
+look things up in the snapshot first and only ask the master when it isn't
+there: a snapshot can say that a build was queued or running a few seconds
+ago, but not that one which was just created doesn't exist.
+
+Snapshots expire after JENKINS_MASTER_STATE_MAX_AGE seconds, so if the poller
+stops (or can't reach a master) builders go back to asking the master.
+"""
+
+from __future__ import absolute_import
+
+import json
+import re
+import requests
+
+from flask import current_app
+from urllib import unquote
+
+from changes.config import redis
+
+MASTER_STATE_KEY = 'jenkins:master-state:{}'
+
+QUEUE_TREE = 'items[id,task[name],actions[parameters[name,value]]]'
+EXECUTABLE_TREE = 'currentExecutable[number,url,actions[parameters[name,value]]]'
+COMPUTER_TREE = 'computer[executors[{0}],oneOffExecutors[{0}]]'.format(EXECUTABLE_TREE)
+
+BUILD_URL_RE = re.compile(r'/job/([^/]+)/(\d+)/?$')
+
+
+def _get_changes_bid(item):
+    for action in item.get('actions') or ():
+        if not action:
+            continue
+        for param in action.get('parameters', ()):
+            if param.get('name') == 'CHANGES_BID':
+                return param.get('value')
+    return None
+
+
+def _get_json(session, master_base_url, path, tree):
+    url = '{}/{}/api/json/'.format(master_base_url, path.strip('/'))
+    resp = session.get(
+        url, params={'tree': tree}, allow_redirects=False, timeout=30,
+        auth=current_app.config['JENKINS_MASTER_STATE_AUTH'],
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def fetch_master_state(master_base_url, session=None):
+    """
+    Takes a snapshot of the given master, in the form:
+
+    - queued: the number of queued items of each job, by job name
+    - queue: the queue item ID of each queued build, by CHANGES_BID
+    - builds: the job name and build number of each running build,
+      by CHANGES_BID
+    """
+    if session is None:
+        session = requests.Session()
+
+    queue = _get_json(session, master_base_url, '/queue/', QUEUE_TREE)
+    queued = {}
+    queue_items = {}
+    for item in queue['items']:
+        job_name = item['task']['name']
+        queued[job_name] = queued.get(job_name, 0) + 1
+        changes_bid = _get_changes_bid(item)
+        # the queue is newest first, and we want the newest one
+        if changes_bid and changes_bid not in queue_items:
+            queue_items[changes_bid] = str(item['id'])
+
+    computers = _get_json(session, master_base_url, '/computer/', COMPUTER_TREE)
+    builds = {}
+    for computer in computers['computer']:
+        executors = computer.get('executors', []) + computer.get('oneOffExecutors', [])
+        for executor in executors:
+            executable = executor.get('currentExecutable')
+            if not executable:
+                continue
+            changes_bid = _get_changes_bid(executable)
+            match = BUILD_URL_RE.search(executable.get('url') or '')
+            if not (changes_bid and match):
+                continue
+            # keep the newest if there are several
+            number = str(executable['number'])
+            if changes_bid in builds and int(builds[changes_bid]['build_no']) > int(number):
+                continue
+            builds[changes_bid] = {
+                'job_name': unquote(match.group(1)),
+                'build_no': number,
+            }
+
+    return {
+        'queued': queued,
+        'queue': queue_items,
+        'builds': builds,
+    }
+
+
+def save_master_state(master_base_url, state):
+    redis.setex(
+        MASTER_STATE_KEY.format(master_base_url),
+        current_app.config['JENKINS_MASTER_STATE_MAX_AGE'],
+        json.dumps(state),
+    )
+
+
+def clear_master_state(master_base_url):
+    redis.delete(MASTER_STATE_KEY.format(master_base_url))
+
+
+def get_master_state(master_base_url):
+    """
+    Returns the latest snapshot of the given master, or None if there isn't a
+    recent one.
+    """
+    if master_base_url not in current_app.config['JENKINS_MASTER_STATE_URLS']:
+        return None
+
+    value = redis.get(MASTER_STATE_KEY.format(master_base_url))
+    if value is None:
+        return None
+    return json.loads(value)
+
+
+def get_queued_count(master_base_url, job_name):
+    """
+    Returns how many items of ``job_name`` are queued on the master, or None
+    if we don't know.
+    """
+    state = get_master_state(master_base_url)
+    if state is None:
+        return None
+    return state['queued'].get(job_name, 0)
+
+
+def get_queue_item_id(master_base_url, changes_bid):
+    """
+    Returns the queue item ID of the build with the given CHANGES_BID, or None
+    if it isn't in the snapshot.
+    """
+    state = get_master_state(master_base_url)
+    if state is None:
+        return None
+    return state['queue'].get(changes_bid)
+
+
+def get_build_no(master_base_url, job_name, changes_bid):
+    """
+    Returns the build number of the running ``job_name`` build with the given
+    CHANGES_BID, or None if it isn't in the snapshot.
+    """
+    state = get_master_state(master_base_url)
+    if state is None:
+        return None
+    build = state['builds'].get(changes_bid)
+    if build is None or build['job_name'] != job_name:
+        return None
+    return build['build_no']
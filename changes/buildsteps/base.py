@@ -34,6 +34,14 @@ class BuildStep(object):
         """
         return None
 
+    def get_sharding_config(self):
+        """
+        Returns the options controlling how tests are split into shards (see
+        changes.expanders.sharding.parse_sharding_config), or None for the
+        defaults.
+        """
+        return None
+
     def execute(self, job):
         """
         Given a new job, execute it (either sync or async), and report the
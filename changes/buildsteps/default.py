@@ -63,7 +63,7 @@ class DefaultBuildStep(BuildStep):
                  artifacts=DEFAULT_ARTIFACTS, release=DEFAULT_RELEASE,
                  max_executors=10, cpus=4, memory=8 * 1024, clean=True,
                  compression=None, debug_config=None, test_stats_from=None,
-                 **kwargs):
+                 sharding=None, **kwargs):
         """
         Constructor for DefaultBuildStep.
 
@@ -90,6 +90,11 @@ class DefaultBuildStep(BuildStep):
                 None (the default) to use this project.  Useful if the
                 project runs a different subset of tests each time, so
                 test timing stats from the parent are not reliable.
+            sharding: How to split tests into shards, e.g.
+                {"strategy": "setup_cost", "setup_cost": 2000, "target_duration": 600000}
+                to account for 2s of setup per test module and use as few
+                executors as should finish in 10 minutes. Durations are in
+                milliseconds. Defaults to spreading tests over max_executors.
         """
         if commands is None:
             raise ValueError("Missing required config: need commands")
@@ -129,6 +134,7 @@ class DefaultBuildStep(BuildStep):
         self.clean = clean
         self.debug_config = debug_config or {}
         self.test_stats_from = test_stats_from
+        self.sharding = sharding
 
         super(DefaultBuildStep, self).__init__(**kwargs)
 
@@ -138,6 +144,9 @@ class DefaultBuildStep(BuildStep):
     def get_test_stats_from(self):
         return self.test_stats_from
 
+    def get_sharding_config(self):
+        return self.sharding
+
     def iter_all_commands(self, job):
         source = job.source
         repo = source.repository
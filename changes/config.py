@@ -178,6 +178,10 @@ def create_app(_read_config=True, **config):
             'queue': 'job.sync',
             'routing_key': 'job.sync',
         },
+        'sync_job_steps': {
+            'queue': 'job.sync',
+            'routing_key': 'job.sync',
+        },
         'sync_build': {
             'queue': 'job.sync',
             'routing_key': 'job.sync',
@@ -211,7 +215,13 @@ def create_app(_read_config=True, **config):
         ('changes.listeners.phabricator_listener.build_finished_handler', 'build.finished'),
         ('changes.listeners.analytics_notifier.build_finished_handler', 'build.finished'),
         ('changes.listeners.analytics_notifier.job_finished_handler', 'job.finished'),
+        ('changes.listeners.log_compaction.job_finished_handler', 'job.finished'),
         ('changes.listeners.snapshot_build.build_finished_handler', 'build.finished'),
+        ('changes.listeners.test_duration_index.build_finished_handler', 'build.finished'),
+        ('changes.listeners.test_snapshot.build_finished_handler', 'build.finished'),
+        ('changes.listeners.build_test_changes.build_finished_handler', 'build.finished'),
+        ('changes.listeners.response_cache.build_finished_handler', 'build.finished'),
+        ('changes.listeners.response_cache.job_finished_handler', 'job.finished'),
     )
 
     # restrict outbound notifications to the given domains
@@ -230,6 +240,10 @@ def create_app(_read_config=True, **config):
             'task': 'check_repos',
             'schedule': timedelta(minutes=2),
         },
+        'rollup-daily-stats': {
+            'task': 'rollup_daily_stats',
+            'schedule': timedelta(hours=1),
+        },
         'aggregate-flaky-tests': {
             'task': 'aggregate_flaky_tests',
             # Hour 7 GMT is midnight PST, hopefully a time of low load
@@ -238,7 +252,22 @@ def create_app(_read_config=True, **config):
         'update-local-repos': {
             'task': 'update_local_repos',
             'schedule': timedelta(minutes=5),
-        }
+        },
+        # a no-op unless JOBSTEP_SYNC_BATCH_SIZE is set
+        'sync-job-steps': {
+            'task': 'sync_job_steps',
+            'schedule': timedelta(seconds=5),
+        },
+        # only has anything to do if JOBSTEP_HEARTBEAT_WRITE_BEHIND is set
+        'flush-heartbeats': {
+            'task': 'flush_heartbeats',
+            'schedule': timedelta(seconds=10),
+        },
+        # a no-op unless JENKINS_MASTER_STATE_URLS is set
+        'sync-jenkins-masters': {
+            'task': 'sync_jenkins_masters',
+            'schedule': timedelta(seconds=5),
+        },
     }
     app.config['CELERY_TIMEZONE'] = 'UTC'
 
@@ -306,6 +335,31 @@ def create_app(_read_config=True, **config):
     # Maximum number of jobsteps to retry for a given job
     app.config['JOBSTEP_RETRY_MAX'] = 2
 
+    # If set, running jobsteps are polled in batches of (at most) this many by
+    # the periodic sync_job_steps task, instead of each sync_job_step task
+    # re-queueing itself until its step finishes.
+    app.config['JOBSTEP_SYNC_BATCH_SIZE'] = None
+
+    # If set, jobstep heartbeats are recorded in redis and written to the
+    # database in bulk by the periodic flush_heartbeats task, instead of each
+    # heartbeat being its own transaction.
+    app.config['JOBSTEP_HEARTBEAT_WRITE_BEHIND'] = False
+
+    # Jenkins masters whose queue and running builds are snapshotted into
+    # redis by the periodic sync_jenkins_masters task, so that Jenkins
+    # builders can look their builds up there instead of each asking the
+    # master. Snapshots older than JENKINS_MASTER_STATE_MAX_AGE seconds are
+    # ignored.
+    app.config['JENKINS_MASTER_STATE_URLS'] = []
+    app.config['JENKINS_MASTER_STATE_MAX_AGE'] = 30
+    # (username, password) to snapshot the masters with, if they need one
+    app.config['JENKINS_MASTER_STATE_AUTH'] = None
+
+    # How many connections each process keeps alive to each Jenkins master,
+    # and how many requests it makes at once when asking several masters.
+    app.config['JENKINS_HTTP_POOL_SIZE'] = 10
+    app.config['JENKINS_HTTP_CONCURRENCY'] = 8
+
     # we opt these users into the new ui...redirecting them if they
     # hit the homepage
     app.config['NEW_UI_OPTIN_USERS'] = set([])
@@ -318,6 +372,21 @@ def create_app(_read_config=True, **config):
     # be truncated.
     app.config['TEST_MESSAGE_MAX_LEN'] = 64 * 1024
 
+    # If set, xunit artifacts are parsed incrementally and their test cases
+    # are written in multi-row inserts of (at most) this many rows, so memory
+    # use stays bounded for huge reports.
+    app.config['XUNIT_STREAMING_BATCH_SIZE'] = None
+
+    # In seconds, how long a log tail stream is held open before the client
+    # has to reconnect, and how often it rechecks for new chunks when it
+    # hasn't been notified of any.
+    app.config['LOG_TAIL_TIMEOUT'] = 300
+    app.config['LOG_TAIL_POLL_INTERVAL'] = 5
+
+    # If set, the responses of API views with a cache_timeout are cached in
+    # redis, and dropped when a build or job they depend on finishes.
+    app.config['API_RESPONSE_CACHE_ENABLED'] = False
+
     app.config['USE_OLD_UI'] = False
 
     app.config.update(config)
@@ -467,6 +536,7 @@ def configure_api_routes(app):
     from changes.api.job_artifact_index import JobArtifactIndexAPIView
     from changes.api.job_details import JobDetailsAPIView
     from changes.api.job_log_details import JobLogDetailsAPIView
+    from changes.api.job_log_tail import JobLogTailAPIView
     from changes.api.jobphase_index import JobPhaseIndexAPIView
     from changes.api.jobstep_allocate import JobStepAllocateAPIView
     from changes.api.jobstep_artifacts import JobStepArtifactsAPIView
@@ -555,6 +625,7 @@ def configure_api_routes(app):
     api.add_resource(InitialIndexAPIView, '/initial/')
     api.add_resource(JobDetailsAPIView, '/jobs/<uuid:job_id>/')
     api.add_resource(JobLogDetailsAPIView, '/jobs/<uuid:job_id>/logs/<uuid:source_id>/')
+    api.add_resource(JobLogTailAPIView, '/jobs/<uuid:job_id>/logs/<uuid:source_id>/tail/')
     api.add_resource(JobPhaseIndexAPIView, '/jobs/<uuid:job_id>/phases/')
     api.add_resource(JobArtifactIndexAPIView, '/jobs/<uuid:job_id>/artifacts/')
     api.add_resource(JobStepAllocateAPIView, '/jobsteps/allocate/')
@@ -728,34 +799,49 @@ def configure_debug_routes(app):
 
 
 def configure_jobs(app):
-    from changes.jobs.flaky_tests import aggregate_flaky_tests
+    from changes.jobs.flaky_tests import (
+        aggregate_flaky_tests, backfill_flaky_tests, send_flaky_test_metrics)
     from changes.jobs.check_repos import check_repos
     from changes.jobs.cleanup_tasks import cleanup_tasks
     from changes.jobs.create_job import create_job
+    from changes.jobs.daily_stats import (
+        backfill_daily_stats, rollup_daily_stats)
+    from changes.jobs.flush_heartbeats import flush_heartbeats
     from changes.jobs.import_repo import import_repo
     from changes.jobs.signals import (
         fire_signal, run_event_listener
     )
     from changes.jobs.sync_artifact import sync_artifact
     from changes.jobs.sync_build import sync_build
+    from changes.jobs.sync_jenkins_masters import sync_jenkins_masters
     from changes.jobs.sync_job import sync_job
     from changes.jobs.sync_job_step import sync_job_step
+    from changes.jobs.sync_job_steps import sync_job_steps
+    from changes.jobs.sync_log import sync_log
     from changes.jobs.sync_repo import sync_repo
     from changes.jobs.update_project_stats import (
         update_project_stats, update_project_plan_stats)
     from changes.jobs.update_local_repos import update_local_repos
 
     queue.register('aggregate_flaky_tests', aggregate_flaky_tests)
+    queue.register('backfill_daily_stats', backfill_daily_stats)
+    queue.register('backfill_flaky_tests', backfill_flaky_tests)
     queue.register('check_repos', check_repos)
     queue.register('cleanup_tasks', cleanup_tasks)
     queue.register('create_job', create_job)
     queue.register('fire_signal', fire_signal)
+    queue.register('flush_heartbeats', flush_heartbeats)
     queue.register('import_repo', import_repo)
+    queue.register('rollup_daily_stats', rollup_daily_stats)
     queue.register('run_event_listener', run_event_listener)
+    queue.register('send_flaky_test_metrics', send_flaky_test_metrics)
     queue.register('sync_artifact', sync_artifact)
     queue.register('sync_build', sync_build)
+    queue.register('sync_jenkins_masters', sync_jenkins_masters)
     queue.register('sync_job', sync_job)
     queue.register('sync_job_step', sync_job_step)
+    queue.register('sync_job_steps', sync_job_steps)
+    queue.register('sync_log', sync_log)
     queue.register('sync_repo', sync_repo)
     queue.register('update_project_stats', update_project_stats)
     queue.register('update_project_plan_stats', update_project_plan_stats)
@@ -6,6 +6,7 @@ from jinja2 import Markup
 
 from changes.models import Project
 from changes.reports.build import BuildReport
+from changes.utils.times import parse_day
 
 
 class BuildReportMailView(MethodView):
@@ -14,7 +15,16 @@ class BuildReportMailView(MethodView):
 
         report = BuildReport(projects)
 
-        context = report.generate(days=int(request.args.get('days', 7)))
+        try:
+            end_date = parse_day(request.args.get('end') or None)
+            days = int(request.args.get('days', 7))
+        except ValueError:
+            return 'end must be a YYYY-MM-DD date and days a number', 400
+
+        context = report.generate(
+            days=days,
+            end_date=end_date,
+        )
 
         html_content = Markup(toronado.from_string(
             render_template('email/build_report.html', **context)
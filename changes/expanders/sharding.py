@@ -0,0 +1,185 @@
+from __future__ import absolute_import, division
+
+import heapq
+
+from collections import defaultdict
+
+from changes.lib.test_durations import normalize_test_segments
+
+
+class ShardingStrategy(object):
+    """
+    Splits a list of tests into a given number of shards.
+
+    Durations (and so shard weights) are in milliseconds.
+    """
+    def shard(self, tests, num_shards, get_duration):
+        """
+        Args:
+            tests (list): A list of test names.
+            num_shards (int): How many shards to split the tests into.
+            get_duration (callable): Returns the expected duration of a test.
+
+        Returns:
+            list: Shards. Each element is a pair containing the weight for that
+                shard and the test names assigned to that shard.
+        """
+        raise NotImplementedError
+
+
+class LPTStrategy(ShardingStrategy):
+    """
+    Longest processing time first: hands out tests from longest to shortest,
+    each to whichever shard is currently lightest.
+    """
+    def shard(self, tests, num_shards, get_duration):
+        # Each element is a pair (weight, tests).
+        groups = [(0, []) for _ in range(num_shards)]
+        # Groups is already a proper heap, but we'll call this to guarantee it.
+        heapq.heapify(groups)
+        weighted_tests = [(get_duration(t), t) for t in tests]
+        for weight, test in sorted(weighted_tests, reverse=True):
+            group_weight, group_tests = heapq.heappop(groups)
+            group_weight += 1 + weight
+            group_tests.append(test)
+            heapq.heappush(groups, (group_weight, group_tests))
+
+        return groups
+
+
+def get_setup_group(test_name):
+    """
+    Returns the file or module a test belongs to, which is what the test
+    runner has to set up (import, collect, build fixtures for) before it can
+    run the test.
+    """
+    segments = normalize_test_segments(test_name)
+    # paths are already files, whereas dotted names end with the test itself
+    if '/' in test_name or len(segments) == 1:
+        return segments
+    return segments[:-1]
+
+
+class SetupCostStrategy(ShardingStrategy):
+    """
+    Like LPTStrategy, but accounts for the fixed cost of setting up each
+    file or module a shard touches.
+
+    Tests from the same file or module are kept on one shard unless that
+    would make the shard heavier than an even share of the total, and every
+    group of tests pays ``setup_cost`` once per shard it lands on.
+    """
+    def __init__(self, setup_cost=0):
+        self.setup_cost = setup_cost
+
+    def shard(self, tests, num_shards, get_duration):
+        if not num_shards:
+            return []
+
+        setup_groups = defaultdict(list)
+        for test in tests:
+            setup_groups[get_setup_group(test)].append((get_duration(test), test))
+
+        total = sum(
+            self.setup_cost + sum(1 + d for d, _ in group)
+            for group in setup_groups.itervalues()
+        )
+        even_share = total / num_shards
+
+        items = []
+        for group in setup_groups.itervalues():
+            weight = self.setup_cost + sum(1 + d for d, _ in group)
+            if weight <= even_share:
+                items.append((weight, sorted(t for _, t in group)))
+            else:
+                items.extend(
+                    (self.setup_cost + 1 + d, [t]) for d, t in group
+                )
+
+        # a shard with no tests would run whatever its command runs without
+        # any test names, so there are never more shards than items
+        groups = [(0, []) for _ in range(min(num_shards, len(items)))]
+        heapq.heapify(groups)
+        for weight, item_tests in sorted(items, reverse=True):
+            group_weight, group_tests = heapq.heappop(groups)
+            group_tests.extend(item_tests)
+            heapq.heappush(groups, (group_weight + weight, group_tests))
+
+        return groups
+
+
+STRATEGIES = {
+    'lpt': LPTStrategy,
+    'setup_cost': SetupCostStrategy,
+}
+
+
+def get_strategy(name='lpt', **options):
+    try:
+        strategy_cls = STRATEGIES[name]
+    except KeyError:
+        raise ValueError('Unknown sharding strategy: %r' % (name,))
+    return strategy_cls(**options)
+
+
+def parse_sharding_config(config):
+    """
+    Returns the strategy and target duration (or None) described by a build
+    step's ``sharding`` option, e.g.::
+
+        {"strategy": "setup_cost", "setup_cost": 2000, "target_duration": 600000}
+    """
+    options = dict(config or {})
+    target_duration = options.pop('target_duration', None)
+    strategy = get_strategy(options.pop('strategy', 'lpt'), **options)
+    return strategy, target_duration
+
+
+def get_makespan(groups):
+    """
+    Returns the weight of the heaviest shard, i.e. how long we expect the
+    whole phase to take.
+    """
+    return max(weight for weight, _ in groups) if groups else 0
+
+
+def get_imbalance(groups):
+    """
+    Returns how much heavier the heaviest shard is than the average shard,
+    as a fraction of the average (0 is perfectly balanced).
+    """
+    if not groups:
+        return 0
+    mean = sum(weight for weight, _ in groups) / len(groups)
+    if not mean:
+        return 0
+    return get_makespan(groups) / mean - 1
+
+
+def choose_shard_count(strategy, tests, max_shards, get_duration, target_duration):
+    """
+    Returns the fewest shards (up to ``max_shards``) for which ``strategy``
+    expects the tests to finish within ``target_duration``, or
+    ``max_shards`` if no number of shards will.
+    """
+    hi = min(len(tests), max_shards)
+    if hi <= 1:
+        return hi
+
+    def fits(num_shards):
+        groups = strategy.shard(tests, num_shards, get_duration)
+        return get_makespan(groups) <= target_duration
+
+    if not fits(hi):
+        return hi
+
+    # More shards can't make the heaviest shard meaningfully heavier, so
+    # binary search for the first count that fits.
+    lo = 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if fits(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
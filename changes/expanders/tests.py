@@ -2,13 +2,20 @@ from __future__ import absolute_import
 
 from flask import current_app
 
-import heapq
-
 from changes.api.client import api_client
 from changes.config import db
 from changes.expanders.base import Expander
-from changes.models import FutureCommand, FutureJobStep, Job, TestCase
-from changes.utils.trees import build_flat_tree
+from changes.expanders.sharding import (
+    LPTStrategy, choose_shard_count, parse_sharding_config
+)
+from changes.lib.test_durations import (
+    get_build_test_stats, get_test_stats_from_durations, normalize_test_segments
+)
+from changes.lib.test_snapshot import get_project_test_snapshot
+from changes.models import (
+    FutureCommand, FutureJobStep, Project, ProjectTestSnapshotCase,
+    TestDurationIndex
+)
 
 
 class TestsExpander(Expander):
@@ -31,11 +38,14 @@ class TestsExpander(Expander):
         assert 'cmd' in self.data, 'Missing ``cmd`` attribute'
         assert '{test_names}' in self.data['cmd'], 'Missing ``{test_names}`` in command'
 
-    def expand(self, max_executors, test_stats_from=None):
+    def expand(self, max_executors, test_stats_from=None, sharding=None):
         test_stats, avg_test_time = self.get_test_stats(test_stats_from or self.project.slug)
 
+        strategy, target_duration = parse_sharding_config(sharding)
         groups = self.shard_tests(self.data['tests'], max_executors,
-                                  test_stats, avg_test_time)
+                                  test_stats, avg_test_time,
+                                  strategy=strategy,
+                                  target_duration=target_duration)
 
         for weight, test_list in groups:
             future_command = FutureCommand(
@@ -54,6 +64,20 @@ class TestsExpander(Expander):
 
     @classmethod
     def get_test_stats(cls, project_slug):
+        project = Project.get(project_slug)
+        if project is not None:
+            index = TestDurationIndex.query.get(project.id)
+            if index is not None:
+                return index.get_test_stats()
+
+            if get_project_test_snapshot(project.id) is not None:
+                return get_test_stats_from_durations(dict(db.session.query(
+                    ProjectTestSnapshotCase.name, ProjectTestSnapshotCase.duration,
+                ).filter(
+                    ProjectTestSnapshotCase.project_id == project.id,
+                )))
+
+        # nothing indexed yet, so fall back to the last green build
         response = api_client.get('/projects/{project}/'.format(
             project=project_slug))
         last_build = response['lastPassingBuild']
@@ -61,53 +85,15 @@ class TestsExpander(Expander):
         if not last_build:
             return {}, 0
 
-        # XXX(dcramer): ideally this would be abstractied via an API
-        job_list = db.session.query(Job.id).filter(
-            Job.build_id == last_build['id'],
-        )
-
-        test_durations = dict(db.session.query(
-            TestCase.name, TestCase.duration
-        ).filter(
-            TestCase.job_id.in_(job_list),
-        ))
-        test_names = []
-        total_count, total_duration = 0, 0
-        for test in test_durations:
-            test_names.append(test)
-            total_duration += test_durations[test]
-            total_count += 1
-
-        test_stats = {}
-        if test_names:
-            sep = TestCase(name=test_names[0]).sep
-            tree = build_flat_tree(test_names, sep=sep)
-            for group_name, group_tests in tree.iteritems():
-                segments = cls._normalize_test_segments(group_name)
-                test_stats[segments] = sum(test_durations[t] for t in group_tests)
-
-        # the build report can contain different test suites so this isnt the
-        # most accurate
-        if total_duration > 0:
-            avg_test_time = int(total_duration / total_count)
-        else:
-            avg_test_time = 0
-
-        return test_stats, avg_test_time
+        return get_build_test_stats(last_build['id'])
 
     @classmethod
     def _normalize_test_segments(cls, test_name):
-        sep = TestCase(name=test_name).sep
-        segments = test_name.split(sep)
-
-        # kill the file extension
-        if sep is '/' and '.' in segments[-1]:
-            segments[-1] = segments[-1].rsplit('.', 1)[0]
-
-        return tuple(segments)
+        return normalize_test_segments(test_name)
 
     @classmethod
-    def shard_tests(cls, tests, max_shards, test_stats, avg_test_time):
+    def shard_tests(cls, tests, max_shards, test_stats, avg_test_time,
+                    strategy=None, target_duration=None):
         """
         Breaks a set of tests into shards.
 
@@ -116,6 +102,11 @@ class TestsExpander(Expander):
             max_shards (int): Maximum amount of shards over which to distribute the tests.
             test_stats (dict): A mapping from normalized test name to duration.
             avg_test_time (int): Average duration of a single test.
+            strategy (ShardingStrategy): How to split up the tests. Defaults
+                to LPTStrategy.
+            target_duration (int): If given, use as few shards as are expected
+                to finish within this many milliseconds, rather than always
+                using max_shards.
 
         Returns:
             list: Shards. Each element is a pair containing the weight for that
@@ -131,17 +122,16 @@ class TestsExpander(Expander):
                 result = avg_test_time
             return result
 
+        if strategy is None:
+            strategy = LPTStrategy()
+
+        # strategies may look at each test several times
+        durations = dict((t, get_test_duration(t)) for t in tests)
+
         # don't use more shards than there are tests
         num_shards = min(len(tests), max_shards)
-        # Each element is a pair (weight, tests).
-        groups = [(0, []) for _ in range(num_shards)]
-        # Groups is already a proper heap, but we'll call this to guarantee it.
-        heapq.heapify(groups)
-        weighted_tests = [(get_test_duration(t), t) for t in tests]
-        for weight, test in sorted(weighted_tests, reverse=True):
-            group_weight, group_tests = heapq.heappop(groups)
-            group_weight += 1 + weight
-            group_tests.append(test)
-            heapq.heappush(groups, (group_weight, group_tests))
-
-        return groups
+        if target_duration:
+            num_shards = choose_shard_count(strategy, tests, num_shards,
+                                            durations.__getitem__, target_duration)
+
+        return strategy.shard(tests, num_shards, durations.__getitem__)
@@ -1,8 +1,20 @@
 """Tools for tagging test outputs based on regexp based rules."""
 
 import ast
+import os
 import re
 
+# How much of the end of a log categorize_stream looks at, at most.
+MAX_STREAM_SIZE = 16 * 1024 * 1024
+
+# How much text categorize_stream matches rules against at a time.
+SEGMENT_SIZE = 1024 * 1024
+
+# How far a match may extend past the end of a segment and still be found.
+SEGMENT_OVERLAP = 64 * 1024
+
+_FLAGS = re.MULTILINE | re.DOTALL
+
 
 class ParseError(Exception):
     """Raised on syntax error in a rule."""
@@ -77,6 +89,32 @@ def _parse_regexp(regexp):
     return regexp
 
 
+def compile_rules(rules):
+    """Compile the regular expressions of a list of (tag, project, regexp) rules."""
+    return [(tag, project, re.compile(regexp, _FLAGS)) for tag, project, regexp in rules]
+
+
+class RuleCache(object):
+    """Compiled rules loaded from a file, reloaded whenever the file's mtime changes."""
+
+    def __init__(self):
+        self._key = None
+        self._rules = None
+
+    def get(self, path):
+        key = (path, os.stat(path).st_mtime)
+        if key != self._key:
+            self._rules = compile_rules(load_rules(path))
+            self._key = key
+        return self._rules
+
+
+def _compile(regexp):
+    if isinstance(regexp, basestring):
+        return re.compile(regexp, _FLAGS)
+    return regexp
+
+
 def categorize(project, rules, output):
     """Categorize test output based on rules.
 
@@ -96,6 +134,99 @@ def categorize(project, rules, output):
     for tag, rule_project, regexp in rules:
         if not rule_project or rule_project == project:
             applicable.add(tag)
-            if re.search(regexp, output, re.MULTILINE | re.DOTALL):
+            if _compile(regexp).search(output):
                 matched.add(tag)
     return (matched, applicable)
+
+
+def categorize_stream(project, rules, chunks, max_size=MAX_STREAM_SIZE):
+    """Categorize the end of a test output based on rules.
+
+    Like categorize(), but ``chunks`` is the output as an iterable of strings
+    starting from the *end* (i.e. the last chunk first). Only the last
+    ``max_size`` characters are looked at, a segment at a time, and reading
+    stops as soon as every applicable rule has matched. Failures are
+    usually reported at the end of a log, so this rarely needs much of it.
+
+    As in categorize(), CRLF line endings are matched as plain newlines.
+    Segments are split after a newline, so a CRLF is never split up.
+    A match spanning more than SEGMENT_OVERLAP characters past the end of a
+    segment may be missed.
+
+    Returns the same as categorize().
+    """
+    matched, applicable = set(), set()
+    pending = []
+    for tag, rule_project, regexp in rules:
+        if not rule_project or rule_project == project:
+            applicable.add(tag)
+            pending.append((tag, _compile(regexp)))
+
+    if not pending:
+        return (matched, applicable)
+
+    for text in _iter_segments(chunks, max_size):
+        text = text.replace('\r\n', '\n')
+        remaining = []
+        for tag, regexp in pending:
+            if tag in matched:
+                continue
+            if regexp.search(text):
+                matched.add(tag)
+            else:
+                remaining.append((tag, regexp))
+        pending = remaining
+        if not pending:
+            break
+    return (matched, applicable)
+
+
+def _iter_segments(chunks, max_size):
+    """Yield segments of text from the end of a log backwards.
+
+    Each segment starts at the beginning of a line (unless it's the last
+    one, which starts wherever max_size ran out), and has the start of the
+    segment after it (in log order) appended so matches can span the two.
+    """
+    chunks = iter(chunks)
+    remaining = max_size
+    exhausted = False
+    # the earliest line we've read, which may continue in earlier chunks
+    partial = ''
+    overlap = ''
+    while not exhausted:
+        pieces = []
+        size = 0
+        while size < SEGMENT_SIZE:
+            try:
+                text = next(chunks)
+            except StopIteration:
+                exhausted = True
+                break
+            if len(text) >= remaining:
+                text = text[len(text) - remaining:]
+                exhausted = True
+            pieces.append(text)
+            size += len(text)
+            remaining -= len(text)
+            if exhausted:
+                break
+
+        pieces.reverse()
+        segment = ''.join(pieces) + partial
+        partial = ''
+        if not exhausted:
+            newline = segment.find('\n')
+            if newline == -1:
+                partial = segment
+                continue
+            partial, segment = segment[:newline + 1], segment[newline + 1:]
+
+        if not segment:
+            continue
+        yield segment + overlap
+
+        overlap = segment[:SEGMENT_OVERLAP]
+        newline = overlap.rfind('\n')
+        if newline != -1:
+            overlap = overlap[:newline + 1]
@@ -0,0 +1,39 @@
+from __future__ import absolute_import
+
+from datetime import datetime, timedelta
+
+from changes.config import queue
+from changes.lib.daily_stats import update_daily_stats
+from changes.utils.times import parse_day
+
+
+def rollup_daily_stats(day=None):
+    """
+    Rolls up the stats for ``day``, or for today and yesterday if no day is
+    given (yesterday's builds may have finished since it was last rolled up).
+    """
+    if day is None:
+        today = datetime.utcnow().date()
+        days = [today - timedelta(days=1), today]
+    else:
+        days = [parse_day(day)]
+
+    for day in days:
+        update_daily_stats(day)
+
+
+def backfill_daily_stats(start_day, end_day):
+    """
+    Queues rollup_daily_stats for every day from ``start_day`` up to (but not
+    including) ``end_day``, so the days are rolled up in parallel.
+
+    The hourly rollup only covers today and yesterday, so this is what fills
+    in the days before it was deployed (see bin/backfill).
+    """
+    day = parse_day(start_day)
+    end_day = parse_day(end_day)
+    while day < end_day:
+        queue.delay('rollup_daily_stats', kwargs={
+            'day': day.isoformat(),
+        })
+        day += timedelta(days=1)
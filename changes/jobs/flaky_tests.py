@@ -5,13 +5,23 @@ from __future__ import absolute_import, print_function
 import logging
 
 from datetime import datetime, timedelta
+from uuid import uuid4
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func, tuple_
 
-from changes.config import db
+from changes.config import db, queue
 from changes.db.utils import try_create
-from changes.lib.flaky_tests import get_flaky_tests
-from changes.models import FlakyTestStat, Project, TestCase
+from changes.lib.flaky_tests import get_flaky_test_stats
+from changes.models import FlakyTestStat, TestCase
+from changes.utils.times import parse_day
 import urllib2
 
+# How many metrics each send_flaky_test_metrics task reports.
+METRICS_BATCH_SIZE = 100
+
+# How many tests to look up the first run of per query.
+FIRST_RUN_BATCH_SIZE = 500
+
 
 def log_metrics(key, **kws):
     try:
@@ -30,44 +40,147 @@ def log_metrics(key, **kws):
         pass
 
 
+def send_flaky_test_metrics(metrics):
+    """
+    Reports a batch of flaky test metrics, off the aggregation's critical
+    path.
+    """
+    for kws in metrics:
+        log_metrics("flaky_test_reruns", **kws)
+
+
+def _chunks(items, size):
+    for i in xrange(0, len(items), size):
+        yield items[i:i + size]
+
+
+def get_first_runs(stats):
+    """
+    Returns the date each flaky test first ran, keyed by
+    ``(project_id, name_sha)``.
+
+    Tests which were flaky before already have it recorded in
+    FlakyTestStat, so only tests which are newly flaky need the (large)
+    test table.
+    """
+    names = dict(((s.project_id, s.name), s.name_sha) for s in stats)
+
+    first_runs = {}
+    for chunk in _chunks(names.keys(), FIRST_RUN_BATCH_SIZE):
+        first_runs.update(
+            ((project_id, names[project_id, name]), first_run)
+            for project_id, name, first_run in db.session.query(
+                FlakyTestStat.project_id,
+                FlakyTestStat.name,
+                func.min(FlakyTestStat.first_run),
+            ).filter(
+                tuple_(FlakyTestStat.project_id, FlakyTestStat.name).in_(chunk),
+            ).group_by(
+                FlakyTestStat.project_id,
+                FlakyTestStat.name,
+            )
+        )
+
+    missing = [k for k in names.itervalues() if k not in first_runs]
+    for chunk in _chunks(missing, FIRST_RUN_BATCH_SIZE):
+        first_runs.update(
+            ((project_id, name_sha), first_run.date())
+            for project_id, name_sha, first_run in db.session.query(
+                TestCase.project_id,
+                TestCase.name_sha,
+                func.min(TestCase.date_created),
+            ).filter(
+                tuple_(TestCase.project_id, TestCase.name_sha).in_(chunk),
+            ).group_by(
+                TestCase.project_id,
+                TestCase.name_sha,
+            )
+        )
+
+    return first_runs
+
+
+def save_flaky_test_stats(day, stats):
+    """
+    Stores FlakyTestStats for ``day``, leaving any already stored alone.
+
+    Returns the rows which were stored.
+    """
+    existing = set(db.session.query(
+        FlakyTestStat.project_id, FlakyTestStat.name,
+    ).filter(
+        FlakyTestStat.date == day,
+    ))
+    stats = [s for s in stats if (s.project_id, s.name) not in existing]
+    if not stats:
+        return []
+
+    first_runs = get_first_runs(stats)
+
+    rows = [{
+        'id': uuid4(),
+        'name': s.name,
+        'project_id': s.project_id,
+        'date': day,
+        'last_flaky_run_id': s.id,
+        'flaky_runs': s.flaky_runs,
+        'double_reruns': s.double_reruns,
+        'passing_runs': s.passing_runs,
+        'first_run': first_runs[s.project_id, s.name_sha],
+    } for s in stats]
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(FlakyTestStat.__table__.insert(), rows)
+    except IntegrityError:
+        # someone else is aggregating the same day
+        rows = [r for r in rows if try_create(FlakyTestStat, r)]
+
+    return rows
+
+
 def aggregate_flaky_tests(day=None, max_flaky_tests=200):
+    """
+    Records the flaky tests of every project for a day (yesterday by
+    default) as FlakyTestStats.
+    """
     if day is None:
         day = datetime.utcnow().date() - timedelta(days=1)
+    else:
+        day = parse_day(day)
 
     try:
-        projects = Project.query.all()
-
-        for project in projects:
-            tests = get_flaky_tests(day, day + timedelta(days=1), [project], max_flaky_tests)
-
-            for test in tests:
-                first_run = db.session.query(
-                    TestCase.date_created
-                ).filter(
-                    TestCase.project_id == test['project_id'],
-                    TestCase.name_sha == test['hash']
-                ).order_by(
-                    TestCase.date_created
-                ).limit(1).scalar()
-
-                log_metrics(
-                    "flaky_test_reruns",
-                    flaky_test_reruns_name=test['name'],
-                    flaky_test_reruns_project_id=test['project_id'],
-                    flaky_test_reruns_flaky_runs=test['flaky_runs'],
-                    flaky_test_reruns_passing_runs=test['passing_runs'],
-                )
-                try_create(FlakyTestStat, {
-                    'name': test['name'],
-                    'project_id': test['project_id'],
-                    'date': day,
-                    'last_flaky_run_id': test['id'],
-                    'flaky_runs': test['flaky_runs'],
-                    'double_reruns': test['double_reruns'],
-                    'passing_runs': test['passing_runs'],
-                    'first_run': first_run
-                })
+        stats = list(get_flaky_test_stats(
+            day, day + timedelta(days=1), max_flaky_tests))
 
+        rows = save_flaky_test_stats(day, stats)
         db.session.commit()
+
+        metrics = [{
+            'flaky_test_reruns_name': r['name'],
+            'flaky_test_reruns_project_id': str(r['project_id']),
+            'flaky_test_reruns_flaky_runs': r['flaky_runs'],
+            'flaky_test_reruns_passing_runs': r['passing_runs'],
+        } for r in rows]
+        for chunk in _chunks(metrics, METRICS_BATCH_SIZE):
+            queue.delay('send_flaky_test_metrics', kwargs={
+                'metrics': chunk,
+            })
     except Exception as err:
         logging.exception(unicode(err))
+
+
+def backfill_flaky_tests(start_day, end_day, max_flaky_tests=200):
+    """
+    Queues aggregate_flaky_tests for every day from ``start_day`` up to (but
+    not including) ``end_day``, so the days are aggregated in parallel by
+    however many workers are around (see bin/backfill).
+    """
+    day = parse_day(start_day)
+    end_day = parse_day(end_day)
+    while day < end_day:
+        queue.delay('aggregate_flaky_tests', kwargs={
+            'day': day.isoformat(),
+            'max_flaky_tests': max_flaky_tests,
+        })
+        day += timedelta(days=1)
@@ -0,0 +1,23 @@
+from __future__ import absolute_import
+
+import logging
+
+from changes.config import statsreporter
+from changes.lib.heartbeats import flush_heartbeats as _flush_heartbeats
+
+logger = logging.getLogger('jobs.flush_heartbeats')
+
+
+def flush_heartbeats():
+    """
+    Writes the jobstep heartbeats recorded in redis to the database.
+
+    There's only anything to do when JOBSTEP_HEARTBEAT_WRITE_BEHIND is set
+    (or was recently), but it's cheap to check either way.
+    """
+    stats = statsreporter.stats()
+    with stats.timer('flush_heartbeats_duration'):
+        num_flushed = _flush_heartbeats()
+    if num_flushed:
+        logger.info('Flushed %d heartbeats', num_flushed)
+    stats.incr('flush_heartbeats_flushed', num_flushed)
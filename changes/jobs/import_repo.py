@@ -3,13 +3,30 @@ from __future__ import absolute_import, print_function
 import logging
 
 from datetime import datetime
+from itertools import islice
 
 from changes.config import db
 from changes.models import Repository, RepositoryStatus
 from changes.queue.task import tracked_task
+from changes.vcs.base import save_revisions
 
 logger = logging.getLogger('repo.sync')
 
+# How many commits each import_repo task imports before queueing the next.
+IMPORT_LIMIT = 10000
+
+# How many commits are saved (and committed) at a time.
+SAVE_BATCH_SIZE = 500
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
 
 @tracked_task(max_retries=None)
 def import_repo(repo_id, parent=None):
@@ -39,10 +56,11 @@ def import_repo(repo_id, parent=None):
     else:
         vcs.clone()
 
-    for commit in vcs.log(parent=parent):
-        revision, created, _ = commit.save(repo)
+    start = parent
+    for commits in _batches(vcs.log(parent=parent, limit=IMPORT_LIMIT), SAVE_BATCH_SIZE):
+        save_revisions(repo, commits, vcs.get_branches_for_revisions(commits))
         db.session.commit()
-        parent = commit.id
+        parent = commits[-1].id
 
     Repository.query.filter(
         Repository.id == repo.id,
@@ -52,7 +70,9 @@ def import_repo(repo_id, parent=None):
     }, synchronize_session=False)
     db.session.commit()
 
-    if parent:
+    # the log starts at (and so includes) the parent, so we're done once it's
+    # the only commit left
+    if parent and parent != start:
         import_repo.delay(
             repo_id=repo.id.hex,
             task_id=repo.id.hex,
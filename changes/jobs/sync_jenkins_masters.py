@@ -0,0 +1,35 @@
+from __future__ import absolute_import
+
+import logging
+import requests
+
+from flask import current_app
+
+from changes.backends.jenkins.master_state import (
+    clear_master_state, fetch_master_state, save_master_state
+)
+from changes.config import statsreporter
+
+logger = logging.getLogger('jobs.sync_jenkins_masters')
+
+
+def sync_jenkins_masters():
+    """
+    Snapshots the queue and running builds of each of
+    JENKINS_MASTER_STATE_URLS, for builders to look things up in.
+
+    A master we can't reach has its snapshot dropped, so that builders ask
+    it directly rather than trusting stale state.
+    """
+    stats = statsreporter.stats()
+    session = requests.Session()
+    for master_base_url in current_app.config['JENKINS_MASTER_STATE_URLS']:
+        try:
+            with stats.timer('sync_jenkins_master_duration'):
+                state = fetch_master_state(master_base_url, session=session)
+        except Exception:
+            logger.exception('Unable to snapshot Jenkins master %s', master_base_url)
+            stats.incr('sync_jenkins_master_failed')
+            clear_master_state(master_base_url)
+            continue
+        save_master_state(master_base_url, state)
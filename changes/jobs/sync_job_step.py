@@ -130,12 +130,13 @@ def has_test_failures(step):
 _SNAPSHOT_TIMEOUT_BONUS_MINUTES = 40
 
 
-def has_timed_out(step, jobplan, default_timeout):
+def has_timed_out(step, jobplan, default_timeout, is_snapshot=None):
     """
     Args:
         default_timeout (int): Timeout in minutes to be used when
             no timeout is specified for this build. Required because
             nothing is expected to run forever.
+        is_snapshot (bool): Whether this is a snapshot job, if already known.
     """
     if step.status != Status.in_progress:
         # HACK: We don't really want to timeout jobsteps that are
@@ -157,8 +158,11 @@ def has_timed_out(step, jobplan, default_timeout):
     # timeout is in minutes
     timeout = timeout * 60
 
+    if is_snapshot is None:
+        is_snapshot = _is_snapshot_job(jobplan)
+
     # Snapshots don't time out.
-    if _is_snapshot_job(jobplan):
+    if is_snapshot:
         timeout += 60 * _SNAPSHOT_TIMEOUT_BONUS_MINUTES
 
     delta = datetime.utcnow() - start_time
@@ -395,7 +399,11 @@ def sync_job_step(step_id):
             retry_after = QUEUED_RETRY_DELAY
         else:
             retry_after = None
-        raise sync_job_step.NotFinished(retry_after=retry_after)
+        # When batched syncing is enabled, sync_job_steps polls running
+        # steps for us.
+        raise sync_job_step.NotFinished(
+            retry_after=retry_after,
+            requeue=not current_app.config['JOBSTEP_SYNC_BATCH_SIZE'])
 
     # Ignore any 'failures' if the build did not finish properly.
     # NOTE(josiah): we might want to include "unknown" and "skipped" here as
@@ -0,0 +1,165 @@
+from __future__ import absolute_import
+
+import logging
+
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+
+from changes.config import db, redis, statsreporter
+from changes.constants import Status
+from changes.ext.redis import UnableToGetLock
+from changes.jobs.sync_job_step import (
+    QUEUED_RETRY_DELAY, has_timed_out, sync_job_step, _sync_from_artifact_store
+)
+from changes.models import JobPlan, JobStep, SnapshotImage, Task
+from changes.queue.task import CONTINUE_COUNTDOWN
+from changes.utils.locking import get_lock_key
+
+logger = logging.getLogger('jobs.sync_job_steps')
+
+
+def sync_job_steps():
+    """
+    Polls a batch of running job steps that are due to be synced.
+
+    This is only used when JOBSTEP_SYNC_BATCH_SIZE is set, in which case
+    sync_job_step stops re-queueing itself while its step is running and
+    leaves the polling to us. Everything the polls need is loaded up front
+    for the whole batch, and any step that has finished (or timed out, or
+    failed to sync) is handed back to sync_job_step to be wrapped up.
+    """
+    batch_size = current_app.config['JOBSTEP_SYNC_BATCH_SIZE']
+    if not batch_size:
+        return
+
+    stats = statsreporter.stats()
+    with stats.timer('sync_job_steps_duration'):
+        num_polled = _sync_batch(batch_size)
+    stats.incr('sync_job_steps_polled', num_polled)
+
+
+def _get_due_tasks(batch_size):
+    now = datetime.utcnow()
+    return list(db.session.query(Task, JobStep).join(
+        JobStep, JobStep.id == Task.task_id,
+    ).options(
+        joinedload(JobStep.job),
+    ).filter(
+        Task.task_name == 'sync_job_step',
+        Task.status == Status.in_progress,
+        Task.date_modified < now - timedelta(seconds=CONTINUE_COUNTDOWN),
+        # steps that haven't started yet are polled less often
+        or_(
+            JobStep.status == Status.in_progress,
+            Task.date_modified < now - timedelta(seconds=QUEUED_RETRY_DELAY),
+        ),
+    ).order_by(
+        Task.date_modified.asc(),
+    ).limit(batch_size))
+
+
+def _sync_batch(batch_size):
+    rows = _get_due_tasks(batch_size)
+    if not rows:
+        return 0
+
+    job_ids = set(step.job_id for _, step in rows)
+    jobplans = dict(
+        (jobplan.job_id, jobplan) for jobplan in JobPlan.query.filter(
+            JobPlan.job_id.in_(job_ids),
+        )
+    )
+    snapshot_job_ids = set(job_id for job_id, in db.session.query(
+        SnapshotImage.job_id,
+    ).filter(
+        SnapshotImage.job_id.in_(job_ids),
+    ))
+
+    default_timeout = current_app.config['DEFAULT_JOB_TIMEOUT_MIN']
+    implementations = {}
+    num_polled = 0
+
+    # Implementations commit as they go, and we don't want every commit to
+    # throw away what we loaded for the rest of the batch.
+    session = db.session()
+    expire_on_commit = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        for task, step in rows:
+            jobplan = jobplans.get(step.job_id)
+            if jobplan is None:
+                _hand_off(task, step)
+                continue
+
+            if jobplan.id not in implementations:
+                implementations[jobplan.id] = jobplan.get_steps()[0].get_implementation()
+
+            # Share sync_job_step's lock so we never sync a step at the same
+            # time as it. Its kwargs come back from the queue as unicode, which
+            # is part of the key.
+            lock_key = get_lock_key(sync_job_step.func, {'step_id': unicode(step.id.hex)})
+            try:
+                with redis.lock(lock_key, expire=300, nowait=True):
+                    is_running = _poll_step(
+                        step, jobplan, implementations[jobplan.id],
+                        is_snapshot=step.job_id in snapshot_job_ids,
+                        default_timeout=default_timeout,
+                    )
+            except UnableToGetLock:
+                continue
+            except Exception:
+                db.session.rollback()
+                logger.exception('Failed to sync job step %s', step.id)
+                is_running = False
+
+            num_polled += 1
+            if is_running:
+                task.date_modified = datetime.utcnow()
+                db.session.add(task)
+                db.session.commit()
+            else:
+                _hand_off(task, step)
+    finally:
+        session.expire_on_commit = expire_on_commit
+
+    return num_polled
+
+
+def _poll_step(step, jobplan, implementation, is_snapshot, default_timeout):
+    """
+    Does the part of sync_job_step that's repeated while a step is running.
+
+    Returns:
+        bool: Whether the step is still running.
+    """
+    if step.status != Status.finished:
+        implementation.update_step(step=step)
+
+    db.session.flush()
+
+    _sync_from_artifact_store(step)
+
+    if step.status == Status.finished:
+        return False
+
+    if has_timed_out(step, jobplan, default_timeout, is_snapshot=is_snapshot):
+        return False
+
+    return True
+
+
+def _hand_off(task, step):
+    # Mark it queued so it isn't polled again while waiting to be run.
+    task.status = Status.queued
+    db.session.add(task)
+    db.session.commit()
+
+    statsreporter.stats().incr('sync_job_steps_handed_off')
+
+    sync_job_step.delay(
+        step_id=step.id.hex,
+        task_id=task.task_id.hex,
+        parent_task_id=task.parent_id.hex if task.parent_id else None,
+    )
@@ -0,0 +1,18 @@
+from changes.models import JobPlan, JobStep
+from changes.queue.task import tracked_task
+
+
+@tracked_task
+def sync_log(step_id=None, **kwargs):
+    """
+    Carries on syncing the log of a finished step, for logs which took too
+    long to sync in one go.
+    """
+    step = JobStep.query.get(step_id)
+    if step is None:
+        return
+
+    _, implementation = JobPlan.get_build_step_for_job(job_id=step.job_id)
+
+    if not implementation.sync_log(step=step):
+        raise sync_log.NotFinished
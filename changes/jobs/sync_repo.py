@@ -8,7 +8,7 @@ from changes.config import db
 from changes.jobs.signals import fire_signal
 from changes.models import Repository, RepositoryStatus, Revision
 from changes.queue.task import tracked_task
-from changes.vcs.base import ConcurrentUpdateError
+from changes.vcs.base import ConcurrentUpdateError, save_revisions
 
 logger = logging.getLogger('repo.sync')
 
@@ -55,44 +55,50 @@ def sync(repo):
     else:
         vcs.clone()
 
-    # The loop below do two things:
+    # The code below does two things:
     # 1) adds new revisions to the database
     # 2) fire off revision created signals for recent revisions
     #
     # TODO(dcramer): this doesnt scrape everything, and really we wouldn't
     # want to do this all in a single job so we should split this into a
     # backfill task
-    for commit in vcs.log(parent=None, limit=NUM_RECENT_COMMITS):
-        known_revision = Revision.query.filter(
+    commits = list(vcs.log(parent=None, limit=NUM_RECENT_COMMITS))
+    if commits:
+        # Lock the revisions we know about, and skip any which were already
+        # signalled.
+        signalled = set(sha for sha, date_created_signal in db.session.query(
+            Revision.sha, Revision.date_created_signal,
+        ).filter(
             Revision.repository_id == repo.id,
-            Revision.sha == commit.id
-        ).with_for_update().scalar()
+            Revision.sha.in_([c.id for c in commits]),
+        ).with_for_update() if date_created_signal)
 
-        if known_revision and known_revision.date_created_signal:
-            db.session.commit()
-            continue
-
-        revision, created, _ = commit.save(repo)
+        commits = [c for c in commits if c.id not in signalled]
+        save_revisions(repo, commits, vcs.get_branches_for_revisions(commits))
         db.session.commit()
 
-        # Lock the revision.
-        revision = Revision.query.filter(
+    if commits:
+        revisions = dict((r.sha, r) for r in Revision.query.filter(
             Revision.repository_id == repo.id,
-            Revision.sha == commit.id
-        ).with_for_update().scalar()
+            Revision.sha.in_([c.id for c in commits]),
+            Revision.date_created_signal == None,  # NOQA
+        ).with_for_update())
 
         # Fire the signal if the revision was created or its branches were discovered.
         #
         # The `revision.branches` check is a hack right now to prevent builds from
         # triggering on branchless commits.
-        if revision.branches and not revision.date_created_signal:
+        to_signal = [
+            revisions[c.id] for c in commits
+            if c.id in revisions and revisions[c.id].branches
+        ]
+        for revision in to_signal:
             revision.date_created_signal = datetime.utcnow()
             fire_signal.delay(
                 signal='revision.created',
                 kwargs={'repository_id': repo.id.hex,
                         'revision_sha': revision.sha},
             )
-            db.session.commit()
         db.session.commit()
 
     Repository.query.filter(
@@ -4,6 +4,7 @@ from flask import current_app
 
 from changes.api.build_details import get_parents_last_builds
 from changes.constants import Result
+from changes.lib.log_chunks import get_archived_chunks
 from changes.models.job import Job
 from changes.models.jobstep import JobStep
 from changes.models.log import LogSource, LogChunk
@@ -220,14 +221,18 @@ def _get_log_clipping(logsource, max_size=5000, max_lines=25):
         LogChunk.source_id == logsource.id,
     )
     tail = queryset.order_by(LogChunk.offset.desc()).limit(1).first()
+    archive = logsource.archive
     # in case logsource has no LogChunks
-    if tail is None:
+    if tail is None and archive is None:
         current_app.logger.warning('LogSource (id=%s) had no LogChunks', logsource.id.hex)
         return ""
 
-    chunks = list(queryset.filter(
-        (LogChunk.offset + LogChunk.size) >= max(tail.offset - max_size, 0),
-    ).order_by(LogChunk.offset.asc()))
+    if tail is not None:
+        chunks = list(queryset.filter(
+            (LogChunk.offset + LogChunk.size) >= max(tail.offset - max_size, 0),
+        ).order_by(LogChunk.offset.asc()))
+    else:
+        chunks = get_archived_chunks(archive, max(archive.size - max_size, 0))
 
     clipping = ''.join(l.text for l in chunks).strip()[-max_size:]
     # only return the last 25 lines
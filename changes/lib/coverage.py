@@ -1,6 +1,10 @@
-from collections import namedtuple
+import json
+import zlib
 
-from changes.config import db
+from binascii import hexlify, unhexlify
+from collections import defaultdict, namedtuple
+
+from changes.config import db, redis
 from changes.constants import Status
 from changes.models import Build, FileCoverage, Job, Project, Source
 
@@ -68,6 +72,31 @@ def get_coverage_by_job_ids(job_ids):
     )
 
 
+# Coverage strings are merged in bulk by turning them into big integers with
+# one byte per line, where 'N' is 0, 'U' is 1 and 'C' is 3. OR-ing two of
+# these then picks the stronger of every pair of lines at once.
+_ENCODE = ''.join(
+    {'U': '\x01', 'C': '\x03'}.get(chr(i), '\x00') for i in range(256))
+_DECODE = ''.join(
+    {1: 'U', 3: 'C'}.get(i, 'N') for i in range(256))
+
+# Merged coverage of a finished build doesn't change, so it's cached.
+MERGED_COVERAGE_CACHE_SECONDS = 60 * 60 * 24
+
+
+def _merge_all(datas):
+    length = max(len(d) for d in datas)
+    if not length:
+        return ''
+
+    bits = 0
+    for data in datas:
+        if isinstance(data, unicode):
+            data = data.encode('ascii', 'replace')
+        bits |= int(hexlify(data.translate(_ENCODE).ljust(length, '\x00')), 16)
+    return unhexlify('%0*x' % (length * 2, bits)).translate(_DECODE)
+
+
 def merge_coverage(old, new):
     """Merge two coverage strings.
 
@@ -77,25 +106,7 @@ def merge_coverage(old, new):
     The merged string contains the 'stronger' or the two corresponding
     characters, where 'C' defeats 'U' and both defeat 'N'.
     """
-    cov_data = []
-    for lineno in range(max(len(old), len(new))):
-        try:
-            old_cov = old[lineno]
-        except IndexError:
-            old_cov = 'N'
-
-        try:
-            new_cov = new[lineno]
-        except IndexError:
-            new_cov = 'N'
-
-        if old_cov == 'C' or new_cov == 'C':
-            cov_data.append('C')
-        elif old_cov == 'U' or new_cov == 'U':
-            cov_data.append('U')
-        else:
-            cov_data.append('N')
-    return ''.join(cov_data)
+    return _merge_all([old, new])
 
 
 def merged_coverage_data(coverages):
@@ -105,14 +116,39 @@ def merged_coverage_data(coverages):
     value is a dict mapping filenames to the merged coverage data in
     the form as described for get_coverage_by_job_ids().
     """
-    coverage = {}
+    datas_by_file = defaultdict(list)
     for c in coverages:
-        data = coverage.get(c.filename)
-        if data:
-            data = merge_coverage(data, c.data)
+        datas_by_file[c.filename].append(c.data)
+
+    coverage = {}
+    for filename, datas in datas_by_file.iteritems():
+        if len(datas) == 1:
+            coverage[filename] = datas[0]
         else:
-            data = c.data
-        coverage[c.filename] = data
+            coverage[filename] = _merge_all(datas)
+    return coverage
+
+
+def get_merged_coverage_cache_key(build_id):
+    return 'coverage:merged:{0}'.format(build_id.hex)
+
+
+def get_merged_coverage_by_build(build):
+    """
+    Returns merged_coverage_data() for all of a build's coverage, from the
+    cache if the build has finished.
+    """
+    if build.status != Status.finished:
+        return merged_coverage_data(get_coverage_by_build_id(build.id))
+
+    cache_key = get_merged_coverage_cache_key(build.id)
+    cached = redis.get(cache_key)
+    if cached:
+        return json.loads(zlib.decompress(cached))
+
+    coverage = merged_coverage_data(get_coverage_by_build_id(build.id))
+    redis.setex(cache_key, zlib.compress(json.dumps(coverage)),
+                MERGED_COVERAGE_CACHE_SECONDS)
     return coverage
 
 
@@ -124,21 +160,20 @@ CoverageStats = namedtuple(
 def get_coverage_stats(diff_lines, data):
     """Return a tuple of coverage stats."""
 
-    lines_covered = 0
-    lines_uncovered = 0
+    lines_covered = data.count('C')
+    lines_uncovered = data.count('U')
     diff_lines_covered = 0
     diff_lines_uncovered = 0
 
-    for lineno, code in enumerate(data):
+    num_lines = len(data)
+    for lineno in set(diff_lines):
         # lineno is 1-based in diff
-        line_in_diff = bool((lineno + 1) in diff_lines)
+        if not 0 < lineno <= num_lines:
+            continue
+        code = data[lineno - 1]
         if code == 'C':
-            lines_covered += 1
-            if line_in_diff:
-                diff_lines_covered += 1
+            diff_lines_covered += 1
         elif code == 'U':
-            lines_uncovered += 1
-            if line_in_diff:
-                diff_lines_uncovered += 1
+            diff_lines_uncovered += 1
 
     return CoverageStats(lines_covered, lines_uncovered, diff_lines_covered, diff_lines_uncovered)
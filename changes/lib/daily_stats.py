@@ -0,0 +1,276 @@
+"""
+Daily per-project rollups of build results, failure reasons and slow tests.
+
+Everything is keyed by the day a (commit) build was created, so a range of
+days can be read back by summing rows rather than scanning builds.
+"""
+
+from __future__ import absolute_import, division
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from sqlalchemy.sql import case, func
+from uuid import uuid4
+
+from changes.config import db, redis
+from changes.constants import Result, Status
+from changes.models import (
+    Build, FailureReason, Job, JobStep, ProjectDailyFailureStat,
+    ProjectDailySlowTest, ProjectDailyStat, Source, TestCase
+)
+
+# How many of the slowest tests to keep from each day.
+SLOW_TESTS_PER_DAY = 10
+
+# How long (in seconds) a rollup may hold, or wait for, its day's lock.
+LOCK_TIMEOUT = 600
+
+
+def _get_bounds(day):
+    start = datetime.combine(day, time())
+    return start, start + timedelta(days=1)
+
+
+def _get_build_stats(start, end):
+    passed = Build.result == Result.passed
+    return db.session.query(
+        Build.project_id,
+        func.count(Build.id),
+        func.sum(case([(passed, 1)], else_=0)),
+        func.coalesce(func.sum(case([(passed, Build.duration)])), 0),
+        func.count(case([(passed, Build.duration)])),
+    ).join(
+        Source, Source.id == Build.source_id,
+    ).filter(
+        Source.patch_id == None,  # NOQA
+        Build.status == Status.finished,
+        Build.result.in_([Result.failed, Result.passed]),
+        Build.date_created >= start,
+        Build.date_created < end,
+    ).group_by(
+        Build.project_id,
+    )
+
+
+def _get_failure_stats(start, end):
+    # a build counts once per reason, however many of its steps failed
+    base_query = db.session.query(
+        Build.project_id, FailureReason.reason, FailureReason.build_id,
+    ).join(
+        Build, Build.id == FailureReason.build_id,
+    ).join(
+        Source, Source.id == Build.source_id,
+    ).join(
+        JobStep, JobStep.id == FailureReason.step_id,
+    ).filter(
+        Source.patch_id == None,  # NOQA
+        Build.date_created >= start,
+        Build.date_created < end,
+        JobStep.replacement_id.is_(None),
+    ).group_by(
+        Build.project_id, FailureReason.reason, FailureReason.build_id,
+    ).subquery()
+
+    return db.session.query(
+        base_query.c.project_id,
+        base_query.c.reason,
+        func.count(),
+    ).group_by(
+        base_query.c.project_id,
+        base_query.c.reason,
+    )
+
+
+def _get_slow_tests(start, end):
+    latest_builds = db.session.query(
+        Build.id.label('build_id'),
+        Build.project_id,
+        func.row_number().over(
+            partition_by=Build.project_id,
+            order_by=Build.date_created.desc(),
+        ).label('build_rank'),
+    ).join(
+        Source, Source.id == Build.source_id,
+    ).filter(
+        Source.patch_id == None,  # NOQA
+        Build.status == Status.finished,
+        Build.result == Result.passed,
+        Build.date_created >= start,
+        Build.date_created < end,
+    ).subquery()
+
+    tests = db.session.query(
+        latest_builds.c.project_id,
+        latest_builds.c.build_id,
+        TestCase.name_sha.label('name_sha'),
+        TestCase.name,
+        TestCase._package.label('package'),
+        TestCase.duration,
+        func.row_number().over(
+            partition_by=latest_builds.c.project_id,
+            order_by=TestCase.duration.desc(),
+        ).label('test_rank'),
+    ).select_from(
+        latest_builds,
+    ).join(
+        Job, Job.build_id == latest_builds.c.build_id,
+    ).join(
+        TestCase, TestCase.job_id == Job.id,
+    ).filter(
+        latest_builds.c.build_rank == 1,
+        TestCase.result == Result.passed,
+        TestCase.duration != None,  # NOQA
+    ).subquery()
+
+    return db.session.query(
+        tests.c.project_id,
+        tests.c.build_id,
+        tests.c.name_sha,
+        tests.c.name,
+        tests.c.package,
+        tests.c.duration,
+    ).filter(
+        tests.c.test_rank <= SLOW_TESTS_PER_DAY,
+    )
+
+
+def update_daily_stats(day):
+    """
+    (Re)computes every project's rollups for ``day``.
+
+    Builds can finish long after the day they were created on, so it's
+    safe (and expected) to run this several times for the same day. Runs
+    for the same day (say the hourly rollup and a backfill) take turns, as
+    they'd otherwise both delete the day's rows and then both insert theirs.
+    """
+    lock_key = 'daily_stats:{0}'.format(day.isoformat())
+    with redis.lock(lock_key, expire=LOCK_TIMEOUT, blocking_timeout=LOCK_TIMEOUT):
+        _update_daily_stats(day)
+
+
+def _update_daily_stats(day):
+    start, end = _get_bounds(day)
+
+    stat_rows = [{
+        'id': uuid4(),
+        'project_id': project_id,
+        'date': day,
+        'total_builds': total_builds,
+        'green_builds': green_builds,
+        'green_duration_total': int(green_duration_total),
+        'green_duration_count': green_duration_count,
+    } for (project_id, total_builds, green_builds, green_duration_total,
+           green_duration_count) in _get_build_stats(start, end)]
+
+    failure_rows = [{
+        'id': uuid4(),
+        'project_id': project_id,
+        'date': day,
+        'reason': reason,
+        'num_builds': num_builds,
+    } for project_id, reason, num_builds in _get_failure_stats(start, end)]
+
+    slow_test_rows = [{
+        'id': uuid4(),
+        'project_id': project_id,
+        'date': day,
+        'build_id': build_id,
+        'label_sha': name_sha,
+        'name': name,
+        'package': TestCase(name=name, package=package).package,
+        'duration': duration,
+    } for (project_id, build_id, name_sha, name, package,
+           duration) in _get_slow_tests(start, end)]
+
+    for model, rows in ((ProjectDailyStat, stat_rows),
+                        (ProjectDailyFailureStat, failure_rows),
+                        (ProjectDailySlowTest, slow_test_rows)):
+        model.query.filter(
+            model.date == day,
+        ).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+
+    db.session.commit()
+
+
+def get_project_stats(project_ids, start_day, end_day):
+    """
+    Returns the build counts and average green build duration of each
+    project between ``start_day`` and ``end_day`` (exclusive), keyed by
+    project ID.
+    """
+    query = db.session.query(
+        ProjectDailyStat.project_id,
+        func.sum(ProjectDailyStat.total_builds),
+        func.sum(ProjectDailyStat.green_builds),
+        func.sum(ProjectDailyStat.green_duration_total),
+        func.sum(ProjectDailyStat.green_duration_count),
+    ).filter(
+        ProjectDailyStat.project_id.in_(project_ids),
+        ProjectDailyStat.date >= start_day,
+        ProjectDailyStat.date < end_day,
+    ).group_by(
+        ProjectDailyStat.project_id,
+    )
+
+    results = {}
+    for project_id, total_builds, green_builds, duration_total, duration_count in query:
+        if duration_count:
+            avg_duration = int(duration_total) / int(duration_count)
+        else:
+            avg_duration = 0
+        results[project_id] = {
+            'total_builds': int(total_builds),
+            'green_builds': int(green_builds),
+            'avg_duration': avg_duration,
+        }
+    return results
+
+
+def get_failure_counts(project_ids, start_day, end_day):
+    """
+    Returns how many builds failed for each reason between ``start_day`` and
+    ``end_day`` (exclusive).
+    """
+    query = db.session.query(
+        ProjectDailyFailureStat.reason,
+        func.sum(ProjectDailyFailureStat.num_builds),
+    ).filter(
+        ProjectDailyFailureStat.project_id.in_(project_ids),
+        ProjectDailyFailureStat.date >= start_day,
+        ProjectDailyFailureStat.date < end_day,
+    ).group_by(
+        ProjectDailyFailureStat.reason,
+    )
+
+    counts = defaultdict(int)
+    for reason, num_builds in query:
+        counts[reason] = int(num_builds)
+    return counts
+
+
+def get_slow_tests(project_ids, start_day, end_day, limit):
+    """
+    Returns the slowest tests of each project's last green build between
+    ``start_day`` and ``end_day`` (exclusive), slowest first.
+    """
+    last_days = db.session.query(
+        ProjectDailySlowTest.project_id,
+        func.max(ProjectDailySlowTest.date).label('date'),
+    ).filter(
+        ProjectDailySlowTest.project_id.in_(project_ids),
+        ProjectDailySlowTest.date >= start_day,
+        ProjectDailySlowTest.date < end_day,
+    ).group_by(
+        ProjectDailySlowTest.project_id,
+    ).subquery()
+
+    return list(ProjectDailySlowTest.query.join(
+        last_days, (
+            (last_days.c.project_id == ProjectDailySlowTest.project_id) &
+            (last_days.c.date == ProjectDailySlowTest.date)
+        ),
+    ).order_by(
+        ProjectDailySlowTest.duration.desc(),
+    ).limit(limit))
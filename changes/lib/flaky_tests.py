@@ -2,6 +2,7 @@ from __future__ import absolute_import, division
 
 from sqlalchemy.sql import func, case
 
+from changes.config import db
 from changes.constants import Result
 from changes.models import Build, TestCase, Source, Job
 from changes.utils.http import build_uri
@@ -70,3 +71,75 @@ def get_flaky_tests(start_period, end_period, projects, maxFlakyTests):
         })
 
     return flaky_list
+
+
+def get_flaky_test_stats(start_period, end_period, max_flaky_tests, project_ids=None):
+    """
+    Returns the flaky tests of every project (or of ``project_ids``) for a
+    period, in a single query.
+
+    Each row is the latest flaky run of a test (``id``, ``project_id``,
+    ``name_sha``, ``name``) along with how many of the test's passing runs
+    in the period were flaky (``flaky_runs``), needed more than one retry
+    (``double_reruns``) and passed at all (``passing_runs``). Only the
+    ``max_flaky_tests`` tests with the most retries in each project are
+    returned.
+    """
+    flaky = case([(TestCase.reruns > 0, 1)], else_=0)
+    double_flaky = case([(TestCase.reruns > 1, 1)], else_=0)
+    per_test = (TestCase.project_id, TestCase.name_sha)
+
+    runs = db.session.query(
+        TestCase.id,
+        TestCase.project_id,
+        TestCase.name_sha,
+        TestCase.name,
+        func.sum(flaky).over(partition_by=per_test).label('flaky_runs'),
+        func.sum(double_flaky).over(partition_by=per_test).label('double_reruns'),
+        func.count('*').over(partition_by=per_test).label('passing_runs'),
+        func.coalesce(
+            func.sum(TestCase.reruns).over(partition_by=per_test), 0,
+        ).label('total_reruns'),
+        # 1 for the most recent flaky run of each test
+        func.row_number().over(
+            partition_by=per_test,
+            order_by=(flaky.desc(), TestCase.date_created.desc()),
+        ).label('run_rank'),
+    ).join(
+        Job, Job.id == TestCase.job_id,
+    ).join(
+        Build, Build.id == Job.build_id,
+    ).join(
+        Source, Source.id == Build.source_id,
+    ).filter(
+        TestCase.result == Result.passed,
+        TestCase.date_created >= start_period,
+        TestCase.date_created < end_period,
+        Source.patch_id == None,  # NOQA
+    )
+    if project_ids is not None:
+        runs = runs.filter(TestCase.project_id.in_(project_ids))
+    runs = runs.subquery()
+
+    ranked = db.session.query(
+        runs,
+        func.row_number().over(
+            partition_by=runs.c.project_id,
+            order_by=(runs.c.total_reruns.desc(), runs.c.name_sha),
+        ).label('test_rank'),
+    ).filter(
+        runs.c.run_rank == 1,
+        runs.c.flaky_runs > 0,
+    ).subquery()
+
+    return db.session.query(
+        ranked.c.id,
+        ranked.c.project_id,
+        ranked.c.name_sha,
+        ranked.c.name,
+        ranked.c.flaky_runs,
+        ranked.c.double_reruns,
+        ranked.c.passing_runs,
+    ).filter(
+        ranked.c.test_rank <= max_flaky_tests,
+    )
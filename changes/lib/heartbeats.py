@@ -0,0 +1,122 @@
+"""
+JobStep heartbeats, optionally written behind through redis.
+
+With JOBSTEP_HEARTBEAT_WRITE_BEHIND set, heartbeats are recorded in a redis
+sorted set (step ID -> timestamp) and periodically flushed to
+``jobstep.last_heartbeat`` in bulk by flush_heartbeats, rather than each
+being its own transaction. Anything reading heartbeats should go through
+get_last_heartbeat(s), which looks at redis first.
+"""
+
+from __future__ import absolute_import
+
+from calendar import timegm
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.sql import text
+
+from changes.config import db, redis
+
+HEARTBEAT_KEY = 'jobstep:heartbeats'
+
+# How many heartbeats are written per UPDATE.
+FLUSH_BATCH_SIZE = 1000
+
+
+def _to_timestamp(date):
+    return timegm(date.utctimetuple()) + date.microsecond / 1e6
+
+
+def _from_timestamp(timestamp):
+    return datetime.utcfromtimestamp(timestamp)
+
+
+def is_write_behind():
+    return bool(current_app.config['JOBSTEP_HEARTBEAT_WRITE_BEHIND'])
+
+
+def record_heartbeat(jobstep, date):
+    """
+    Records that ``jobstep`` was alive at ``date``.
+
+    Without write-behind this just sets ``last_heartbeat``, and it's up to
+    the caller to commit it.
+    """
+    if not is_write_behind():
+        jobstep.last_heartbeat = date
+        return
+
+    redis.zadd(HEARTBEAT_KEY, **{jobstep.id.hex: _to_timestamp(date)})
+
+
+def get_last_heartbeats(jobsteps):
+    """
+    Returns the last heartbeat (or None) of each of ``jobsteps``, keyed by ID,
+    including any not yet flushed from redis.
+    """
+    results = dict((s.id, s.last_heartbeat) for s in jobsteps)
+    if not results or not is_write_behind():
+        return results
+
+    pipe = redis.pipeline()
+    for jobstep_id in results:
+        pipe.zscore(HEARTBEAT_KEY, jobstep_id.hex)
+
+    for jobstep_id, timestamp in zip(results.keys(), pipe.execute()):
+        if timestamp is None:
+            continue
+        date = _from_timestamp(timestamp)
+        if results[jobstep_id] is None or date > results[jobstep_id]:
+            results[jobstep_id] = date
+    return results
+
+
+def get_last_heartbeat(jobstep):
+    return get_last_heartbeats([jobstep])[jobstep.id]
+
+
+def _write_heartbeats(heartbeats):
+    params = {}
+    values = []
+    for idx, (jobstep_id, date) in enumerate(heartbeats):
+        params['id_%d' % idx] = jobstep_id
+        params['date_%d' % idx] = date
+        values.append('(CAST(:id_{0} AS uuid), CAST(:date_{0} AS timestamp))'.format(idx))
+
+    # never move a heartbeat backwards, e.g. if one was written directly
+    # while write-behind was being switched on
+    db.session.execute(text("""
+        UPDATE jobstep
+        SET last_heartbeat = heartbeat.date
+        FROM (VALUES {values}) AS heartbeat (id, date)
+        WHERE jobstep.id = heartbeat.id
+        AND (jobstep.last_heartbeat IS NULL OR jobstep.last_heartbeat < heartbeat.date)
+    """.format(values=', '.join(values))), params)
+
+
+def flush_heartbeats():
+    """
+    Writes the heartbeats recorded in redis to the database, and returns how
+    many there were.
+
+    Heartbeats which arrive while we're flushing have a later timestamp than
+    the ones we read, so they're left in redis for next time (short of a
+    client sending an explicit date from the past at just that moment).
+    """
+    cutoff = _to_timestamp(datetime.utcnow())
+
+    heartbeats = [
+        (jobstep_id, _from_timestamp(timestamp))
+        for jobstep_id, timestamp in redis.zrangebyscore(
+            HEARTBEAT_KEY, '-inf', cutoff, withscores=True)
+    ]
+    if not heartbeats:
+        return 0
+
+    for i in xrange(0, len(heartbeats), FLUSH_BATCH_SIZE):
+        _write_heartbeats(heartbeats[i:i + FLUSH_BATCH_SIZE])
+    db.session.commit()
+
+    redis.zremrangebyscore(HEARTBEAT_KEY, '-inf', cutoff)
+
+    return len(heartbeats)
@@ -0,0 +1,252 @@
+from __future__ import absolute_import, division
+
+import logging
+import uuid
+import zlib
+
+from datetime import datetime
+from redis.exceptions import RedisError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func
+
+from changes.config import db, redis
+from changes.db.utils import create_or_get
+from changes.models import LogArchive, LogChunk, LOG_CHUNK_SIZE
+from changes.utils.text import chunked
+
+# The uncompressed size we aim for when grouping chunks into archive blocks.
+# Bigger blocks compress better, smaller ones make range reads cheaper.
+ARCHIVE_BLOCK_SIZE = LOG_CHUNK_SIZE * 16
+
+logger = logging.getLogger('changes.log_chunks')
+
+
+def append_chunks(logsource, offset, chunks):
+    """
+    Stores consecutive chunks of text for a LogSource, the first of which
+    begins at ``offset``, using a single multi-row INSERT.
+
+    Any chunk whose offset is already recorded is left alone, so resending
+    text we've already stored is harmless. If another writer races us to one
+    of the offsets we fall back to storing the chunks one at a time.
+
+    Returns a list of dicts with the ``id``, ``offset`` and ``size`` of the
+    chunk stored at each offset.
+    """
+    date_created = datetime.utcnow()
+
+    rows = []
+    for text in chunks:
+        rows.append({
+            'id': uuid.uuid4(),
+            'job_id': logsource.job_id,
+            'project_id': logsource.project_id,
+            'source_id': logsource.id,
+            'offset': offset,
+            'size': len(text),
+            'text': text,
+            'date_created': date_created,
+        })
+        offset += len(text)
+
+    if not rows:
+        return []
+
+    existing = dict(
+        (c.offset, c) for c in db.session.query(
+            LogChunk.id, LogChunk.offset, LogChunk.size,
+        ).filter(
+            LogChunk.source_id == logsource.id,
+            LogChunk.offset >= rows[0]['offset'],
+            LogChunk.offset < offset,
+        )
+    )
+
+    new_rows = [r for r in rows if r['offset'] not in existing]
+    if new_rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(LogChunk.__table__.insert().values(new_rows))
+        except IntegrityError:
+            for row in new_rows:
+                chunk, _ = create_or_get(LogChunk, where={
+                    'source_id': row['source_id'],
+                    'offset': row['offset'],
+                }, values={
+                    'job_id': row['job_id'],
+                    'project_id': row['project_id'],
+                    'size': row['size'],
+                    'text': row['text'],
+                })
+                existing[chunk.offset] = chunk
+
+    result = []
+    for row in rows:
+        chunk = existing.get(row['offset'])
+        if chunk is None:
+            result.append({'id': row['id'], 'offset': row['offset'], 'size': row['size']})
+        else:
+            result.append({'id': chunk.id, 'offset': chunk.offset, 'size': chunk.size})
+    return result
+
+
+def get_tail_channel(source_id):
+    """
+    Returns the redis pub/sub channel on which appends to a LogSource are
+    announced.
+    """
+    return 'logsource:{0}:tail'.format(source_id.hex)
+
+
+def notify_append(logsource, offset):
+    """
+    Tells anyone tailing ``logsource`` that its text now extends to
+    ``offset``.
+
+    This is only a hint to go and look: it may be delivered before the
+    appending transaction commits, so listeners must still read chunks from
+    the database and should poll occasionally in case a notice was missed.
+    """
+    try:
+        redis.publish(get_tail_channel(logsource.id), offset)
+    except RedisError:
+        logger.warning('Unable to publish append for log source %s',
+                       logsource.id, exc_info=True)
+
+
+def compact_logsource(source):
+    """
+    Merges every LogChunk of ``source`` into a compressed LogArchive and
+    deletes the chunks.
+
+    Returns the LogArchive, or None if there was nothing to compact.
+    """
+    if source.in_artifact_store:
+        return None
+
+    archive = LogArchive.query.get(source.id)
+    if archive is not None:
+        return archive
+
+    queryset = db.session.query(
+        LogChunk.offset, LogChunk.size, LogChunk.text,
+    ).filter(
+        LogChunk.source_id == source.id,
+    ).order_by(LogChunk.offset.asc()).yield_per(100)
+
+    blocks = []
+    data = []
+    data_size = 0
+
+    def flush(offset, size, texts):
+        compressed = zlib.compress(u''.join(texts).encode('utf-8'))
+        blocks.append([offset, size, data_size, len(compressed)])
+        data.append(compressed)
+        return len(compressed)
+
+    block_offset, block_size, block_texts = 0, 0, []
+    for chunk in queryset:
+        # Offsets are only softly enforced on append, so start a new block
+        # wherever the chunks aren't contiguous to keep block offsets exact.
+        if block_texts and (chunk.offset != block_offset + block_size or
+                            block_size >= ARCHIVE_BLOCK_SIZE):
+            data_size += flush(block_offset, block_size, block_texts)
+            block_texts = []
+        if not block_texts:
+            block_offset, block_size = chunk.offset, 0
+        block_texts.append(chunk.text)
+        block_size += chunk.size
+    if block_texts:
+        data_size += flush(block_offset, block_size, block_texts)
+
+    if not blocks:
+        return None
+
+    archive = LogArchive(
+        source_id=source.id,
+        job_id=source.job_id,
+        project_id=source.project_id,
+        size=blocks[-1][0] + blocks[-1][1],
+        block_index={'blocks': blocks},
+        data=b''.join(data),
+    )
+    db.session.add(archive)
+    LogChunk.query.filter(
+        LogChunk.source_id == source.id,
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+    return archive
+
+
+def get_archived_chunks(archive, start=0, end=None):
+    """
+    Returns transient LogChunks covering every archive block which overlaps
+    [``start``, ``end``), where an ``end`` of None means the end of the log.
+
+    Only the overlapping blocks are fetched from the database and
+    decompressed. Their text is split back up into chunks of roughly
+    LOG_CHUNK_SIZE so callers can treat them like stored LogChunks.
+    """
+    blocks = [
+        b for b in archive.block_index['blocks']
+        if b[0] + b[1] > start and (end is None or b[0] < end)
+    ]
+    if not blocks:
+        return []
+
+    data_start = blocks[0][2]
+    data_end = blocks[-1][2] + blocks[-1][3]
+    # substring() is 1-indexed
+    data = db.session.query(
+        func.substring(LogArchive.data, data_start + 1, data_end - data_start),
+    ).filter(
+        LogArchive.source_id == archive.source_id,
+    ).scalar()
+    data = bytes(data)
+
+    source = archive.source
+    result = []
+    for offset, _, block_start, block_size in blocks:
+        block_start -= data_start
+        text = zlib.decompress(data[block_start:block_start + block_size]).decode('utf-8')
+        for chunk_text in chunked([text], LOG_CHUNK_SIZE):
+            result.append(LogChunk(
+                id=uuid.uuid5(source.id, str(offset)),
+                job_id=archive.job_id,
+                project_id=archive.project_id,
+                source_id=source.id,
+                source=source,
+                offset=offset,
+                size=len(chunk_text),
+                text=chunk_text,
+                date_created=archive.date_created,
+            ))
+            offset += len(chunk_text)
+    return result
+
+
+def iter_log_text_reversed(source):
+    """
+    Yields the text of a LogSource a chunk at a time, starting from the end.
+
+    Only as much of the log as is consumed is read: live chunks are
+    streamed from the database newest first, and archived blocks are
+    fetched and decompressed one at a time.
+    """
+    queryset = db.session.query(
+        LogChunk.text,
+    ).filter(
+        LogChunk.source_id == source.id,
+    ).order_by(LogChunk.offset.desc()).yield_per(100)
+    for text, in queryset:
+        yield text
+
+    archive = source.archive
+    if archive is None:
+        return
+
+    for offset, size, _, _ in reversed(archive.block_index['blocks']):
+        chunks = get_archived_chunks(archive, offset, offset + size)
+        for chunk in reversed(chunks):
+            yield chunk.text
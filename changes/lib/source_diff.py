@@ -0,0 +1,109 @@
+from __future__ import absolute_import
+
+import json
+import zlib
+
+from collections import defaultdict
+
+from changes.config import redis
+from changes.utils.diff_parser import DiffParser
+
+# A source's diff never changes, but exporting it from the VCS and parsing
+# it can be expensive, and several things want it for every build.
+DIFF_SUMMARY_CACHE_SECONDS = 60 * 60 * 24
+
+
+def get_diff_summary_cache_key(source_id):
+    return 'source:{0}:diff-summary'.format(source_id.hex)
+
+
+def _summarize_diff(diff):
+    changed_files = set()
+    added_ranges = {}
+    for file_diff in DiffParser(diff).iter_files(compact=True):
+        if file_diff['old_filename']:
+            changed_files.add(file_diff['old_filename'][2:])
+        if file_diff['new_filename']:
+            filename = file_diff['new_filename'][2:]
+            changed_files.add(filename)
+            if file_diff['chunk_markers']:
+                added_ranges.setdefault(filename, []).extend(file_diff['added_ranges'])
+
+    return {
+        'changed_files': sorted(changed_files),
+        'added_ranges': added_ranges,
+    }
+
+
+def get_patch_diff_summary_cache_key(patch_id):
+    return 'patch:{0}:diff-summary'.format(patch_id.hex)
+
+
+def _get_cached_diff_summary(cache_key, generate_diff):
+    cached = redis.get(cache_key)
+    if cached:
+        return json.loads(zlib.decompress(cached))
+
+    diff = generate_diff()
+    if not diff:
+        return None
+
+    summary = _summarize_diff(diff)
+    redis.setex(cache_key, zlib.compress(json.dumps(summary)),
+                DIFF_SUMMARY_CACHE_SECONDS)
+    return summary
+
+
+def get_diff_summary(source):
+    """
+    Returns the files changed by a source's diff and the line ranges added to
+    each of them, parsing the diff only the first time it's asked for.
+
+    Returns None if the source has no diff (or it couldn't be generated).
+    """
+    return _get_cached_diff_summary(
+        get_diff_summary_cache_key(source.id), source.generate_diff)
+
+
+def get_patch_diff_summary(patch_id, diff):
+    """
+    Same as get_diff_summary(), for a patch that may not have a source yet.
+    """
+    return _get_cached_diff_summary(
+        get_patch_diff_summary_cache_key(patch_id), lambda: diff)
+
+
+def get_changed_files(source):
+    """
+    Returns the same as DiffParser.get_changed_files() for a source's diff.
+    """
+    summary = get_diff_summary(source)
+    if summary is None:
+        return set()
+    return set(summary['changed_files'])
+
+
+def get_patch_changed_files(patch_id, diff):
+    """
+    Returns the same as DiffParser.get_changed_files() for a patch's diff.
+    """
+    summary = get_patch_diff_summary(patch_id, diff)
+    if summary is None:
+        return set()
+    return set(summary['changed_files'])
+
+
+def get_lines_by_file(source):
+    """
+    Returns the same as DiffParser.get_lines_by_file() for a source's diff.
+    """
+    lines_by_file = defaultdict(set)
+    summary = get_diff_summary(source)
+    if summary is None:
+        return lines_by_file
+
+    for filename, ranges in summary['added_ranges'].iteritems():
+        lines = lines_by_file[filename]
+        for start, stop in ranges:
+            lines.update(xrange(start, stop))
+    return lines_by_file
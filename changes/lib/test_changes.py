@@ -0,0 +1,172 @@
+"""
+Which tests a build added or removed compared to the build before it.
+
+Diffing two builds' test sets means a FULL OUTER JOIN over all of their
+tests, so it's done once per build (when the build finishes, or the first
+time someone asks) and stored as a BuildTestChanges.
+"""
+
+from __future__ import absolute_import
+
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager, joinedload
+from uuid import UUID
+
+from changes.config import db
+from changes.constants import Status
+from changes.models import Build, BuildTestChanges, Job, Source
+
+# How many of the changes are kept.
+MAX_CHANGES = 100
+
+
+def find_previous_build(build):
+    """
+    Returns the project's most recent finished commit build created before
+    ``build``, or None.
+    """
+    try:
+        return Build.query.filter(
+            Build.project == build.project,
+            Build.date_created < build.date_created,
+            Build.status == Status.finished,
+            Build.id != build.id,
+            Source.patch_id == None,  # NOQA
+        ).join(
+            Source, Build.source_id == Source.id,
+        ).options(
+            contains_eager('source').joinedload('revision'),
+            joinedload('author'),
+        ).order_by(Build.date_created.desc())[0]
+    except IndexError:
+        return None
+
+
+def _get_job_ids(build):
+    return [job_id.hex for job_id, in db.session.query(Job.id).filter(
+        Job.build_id == build.id,
+    )]
+
+
+def compute_test_changes(current_build, previous_build):
+    """
+    Diffs the tests of two builds, returning ``(num_added, num_removed,
+    changes)`` where changes are the first MAX_CHANGES ``(sign, test_id)``
+    pairs (with hex IDs), or None if either build has no jobs.
+    """
+    current_job_ids = _get_job_ids(current_build)
+    previous_job_ids = _get_job_ids(previous_build)
+
+    if not (current_job_ids and previous_job_ids):
+        return None
+
+    current_job_clause = ', '.join(
+        ':c_job_id_%s' % i for i in range(len(current_job_ids))
+    )
+    previous_job_clause = ', '.join(
+        ':p_job_id_%s' % i for i in range(len(previous_job_ids))
+    )
+
+    params = {}
+    for idx, job_id in enumerate(current_job_ids):
+        params['c_job_id_%s' % idx] = job_id
+    for idx, job_id in enumerate(previous_job_ids):
+        params['p_job_id_%s' % idx] = job_id
+
+    # find all tests that have appeared in one job but not the other
+    # we have to build this query up manually as sqlalchemy doesnt support
+    # the FULL OUTER JOIN clause. The window functions count every change,
+    # not just the ones within the limit.
+    query = """
+        SELECT c.id AS c_id,
+               p.id AS p_id,
+               SUM(CASE WHEN p.id IS NULL THEN 1 ELSE 0 END) OVER () AS num_added,
+               SUM(CASE WHEN c.id IS NULL THEN 1 ELSE 0 END) OVER () AS num_removed
+        FROM (
+            SELECT label_sha, id
+            FROM test
+            WHERE job_id IN (%(current_job_clause)s)
+        ) as c
+        FULL OUTER JOIN (
+            SELECT label_sha, id
+            FROM test
+            WHERE job_id IN (%(previous_job_clause)s)
+        ) as p
+        ON c.label_sha = p.label_sha
+        WHERE (c.id IS NULL OR p.id IS NULL)
+        ORDER BY COALESCE(c.label_sha, p.label_sha)
+        LIMIT %(limit)d
+    """ % {
+        'current_job_clause': current_job_clause,
+        'previous_job_clause': previous_job_clause,
+        'limit': MAX_CHANGES,
+    }
+
+    results = list(db.session.query(
+        'c_id', 'p_id', 'num_added', 'num_removed',
+    ).from_statement(query).params(**params))
+
+    if not results:
+        return 0, 0, []
+
+    changes = []
+    for c_id, p_id, _, _ in results:
+        if p_id:
+            changes.append(('-', UUID(p_id).hex))
+        else:
+            changes.append(('+', UUID(c_id).hex))
+
+    return int(results[0][2]), int(results[0][3]), changes
+
+
+def update_test_changes(build, previous_build):
+    """
+    Computes and stores the tests ``build`` added or removed compared to
+    ``previous_build``.
+
+    Returns the BuildTestChanges, or None if either build has no jobs.
+    """
+    result = compute_test_changes(build, previous_build)
+    if result is None:
+        return None
+    num_added, num_removed, changes = result
+
+    values = {
+        'previous_build_id': previous_build.id,
+        'num_added': num_added,
+        'num_removed': num_removed,
+        'changes': {'tests': [list(c) for c in changes]},
+        'date_created': datetime.utcnow(),
+    }
+
+    instance = BuildTestChanges.query.get(build.id)
+    if instance is None:
+        try:
+            with db.session.begin_nested():
+                instance = BuildTestChanges(build_id=build.id, **values)
+                db.session.add(instance)
+        except IntegrityError:
+            # someone else got there first
+            instance = BuildTestChanges.query.get(build.id)
+    else:
+        for key, value in values.iteritems():
+            setattr(instance, key, value)
+        db.session.add(instance)
+
+    db.session.commit()
+    return instance
+
+
+def get_test_changes(build, previous_build):
+    """
+    Returns the stored BuildTestChanges of ``build`` against
+    ``previous_build``, computing them if they're missing or were computed
+    against a different build.
+
+    Returns None if either build has no jobs.
+    """
+    instance = BuildTestChanges.query.get(build.id)
+    if instance is not None and instance.previous_build_id == previous_build.id:
+        return instance
+    return update_test_changes(build, previous_build)
@@ -0,0 +1,122 @@
+from __future__ import absolute_import, division
+
+from datetime import datetime
+
+from changes.config import db
+from changes.db.utils import get_or_create
+from changes.models import Job, TestCase, TestDurationIndex
+from changes.utils.trees import build_flat_tree
+
+# How much weight the newest build gets in the moving average.
+EWMA_ALPHA = 0.3
+
+
+def normalize_test_segments(test_name):
+    sep = TestCase(name=test_name).sep
+    segments = test_name.split(sep)
+
+    # kill the file extension
+    if sep == '/' and '.' in segments[-1]:
+        segments[-1] = segments[-1].rsplit('.', 1)[0]
+
+    return tuple(segments)
+
+
+def get_build_test_stats(build_id):
+    """
+    Returns the durations of the tests of a single build, keyed by the
+    normalized segments of every test and every group of tests sharing a
+    name prefix, along with the average duration of a single test.
+    """
+    job_list = db.session.query(Job.id).filter(
+        Job.build_id == build_id,
+    )
+
+    test_durations = dict(db.session.query(
+        TestCase.name, TestCase.duration
+    ).filter(
+        TestCase.job_id.in_(job_list),
+    ))
+    return get_test_stats_from_durations(test_durations)
+
+
+def get_test_stats_from_durations(test_durations):
+    """
+    Returns the same as get_build_test_stats() for a mapping of test name to
+    duration.
+    """
+    test_names = []
+    total_count, total_duration = 0, 0
+    for test in test_durations:
+        test_names.append(test)
+        total_duration += test_durations[test]
+        total_count += 1
+
+    test_stats = {}
+    if test_names:
+        sep = TestCase(name=test_names[0]).sep
+        tree = build_flat_tree(test_names, sep=sep)
+        for group_name, group_tests in tree.iteritems():
+            segments = normalize_test_segments(group_name)
+            test_stats[segments] = sum(test_durations[t] for t in group_tests)
+
+    # the build report can contain different test suites so this isnt the
+    # most accurate
+    if total_duration > 0:
+        avg_test_time = int(total_duration / total_count)
+    else:
+        avg_test_time = 0
+
+    return test_stats, avg_test_time
+
+
+def _ewma(new, old):
+    if old is None:
+        return new
+    return int(round(EWMA_ALPHA * new + (1 - EWMA_ALPHA) * old))
+
+
+def update_test_duration_index(build):
+    """
+    Folds the test durations of a green ``build`` into its project's
+    TestDurationIndex.
+
+    Tests which didn't run in the build are dropped from the index, and
+    builds older than the last one indexed (or the last one itself, should
+    it finish again) are ignored.
+    """
+    test_stats, avg_test_time = get_build_test_stats(build.id)
+    if not test_stats:
+        return None
+
+    get_or_create(TestDurationIndex, where={
+        'project_id': build.project_id,
+    })
+    index = TestDurationIndex.query.filter(
+        TestDurationIndex.project_id == build.project_id,
+    ).with_for_update().populate_existing().one()
+
+    last_build = index.last_build
+    if last_build is not None and (last_build.id == build.id or
+                                   last_build.date_created > build.date_created):
+        db.session.commit()
+        return index
+
+    sep = TestDurationIndex.SEGMENT_SEP
+    old_durations = index.durations
+    index.durations = dict(
+        (key, _ewma(duration, old_durations.get(key)))
+        for key, duration in (
+            (sep.join(segments), duration)
+            for segments, duration in test_stats.iteritems()
+        )
+    )
+    index.avg_test_time = _ewma(
+        avg_test_time, index.avg_test_time if index.num_builds else None)
+    index.num_builds += 1
+    index.last_build_id = build.id
+    index.date_modified = datetime.utcnow()
+    db.session.add(index)
+    db.session.commit()
+
+    return index
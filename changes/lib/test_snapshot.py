@@ -0,0 +1,111 @@
+from __future__ import absolute_import
+
+from collections import defaultdict
+from datetime import datetime
+
+from changes.config import db
+from changes.db.utils import get_or_create
+from changes.models import Job, ProjectTestSnapshot, ProjectTestSnapshotCase, TestCase
+from changes.utils.trees import build_expanded_tree
+
+# Groups with fewer children than this are folded into their parent, as the
+# test group browser has always done.
+MIN_GROUP_CHILDREN = 2
+
+
+def get_project_test_snapshot(project_id):
+    """
+    Returns the project's ProjectTestSnapshot, or None if it hasn't had a
+    green commit build since snapshots were introduced.
+    """
+    return ProjectTestSnapshot.query.get(project_id)
+
+
+def build_test_groups(test_durations, sep):
+    """
+    Returns the expanded test group tree for a mapping of test name to
+    duration, as stored in ProjectTestSnapshot.groups.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for name, duration in test_durations.iteritems():
+        segments = name.split(sep)
+        for i in xrange(1, len(segments) + 1):
+            total = totals[sep.join(segments[:i])]
+            total[0] += 1
+            total[1] += duration
+
+    tree = build_expanded_tree(
+        test_durations.keys(), sep=sep, min_children=MIN_GROUP_CHILDREN)
+
+    groups = {}
+    for parent, children in tree.iteritems():
+        if not children:
+            continue
+        groups[parent] = sorted(
+            ([path] + totals[path] for path in children),
+            key=lambda x: x[2], reverse=True,
+        )
+    return groups
+
+
+def update_project_test_snapshot(build):
+    """
+    Replaces the ProjectTestSnapshot of ``build``'s project with the tests
+    from ``build``, which should be a green commit build.
+
+    Builds older than the one already in the snapshot are ignored.
+    """
+    job_list = db.session.query(Job.id).filter(
+        Job.build_id == build.id,
+    )
+
+    test_list = db.session.query(
+        TestCase.name, TestCase.name_sha, TestCase._package, TestCase.duration,
+    ).filter(
+        TestCase.job_id.in_(job_list),
+    )
+
+    rows = {}
+    for name, name_sha, package, duration in test_list:
+        rows[name_sha] = {
+            'project_id': build.project_id,
+            'label_sha': name_sha,
+            'name': name,
+            'package': TestCase(name=name, package=package).package,
+            'duration': duration or 0,
+        }
+
+    get_or_create(ProjectTestSnapshot, where={
+        'project_id': build.project_id,
+    })
+    snapshot = ProjectTestSnapshot.query.filter(
+        ProjectTestSnapshot.project_id == build.project_id,
+    ).with_for_update().populate_existing().one()
+
+    if snapshot.date_build is not None and snapshot.date_build > build.date_created:
+        db.session.commit()
+        return snapshot
+
+    ProjectTestSnapshotCase.query.filter(
+        ProjectTestSnapshotCase.project_id == build.project_id,
+    ).delete(synchronize_session=False)
+
+    if rows:
+        db.session.execute(ProjectTestSnapshotCase.__table__.insert(), rows.values())
+
+    test_durations = dict((r['name'], r['duration']) for r in rows.itervalues())
+    if test_durations:
+        sep = TestCase(name=min(test_durations)).sep
+    else:
+        sep = '.'
+
+    snapshot.build_id = build.id
+    snapshot.date_build = build.date_created
+    snapshot.sep = sep
+    snapshot.num_tests = len(rows)
+    snapshot.groups = build_test_groups(test_durations, sep)
+    snapshot.date_modified = datetime.utcnow()
+    db.session.add(snapshot)
+    db.session.commit()
+
+    return snapshot
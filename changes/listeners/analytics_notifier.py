@@ -20,10 +20,11 @@ from changes.constants import Result
 from changes.models.build import Build
 from changes.models.job import Job
 from changes.models.jobstep import JobStep
-from changes.models.log import LogChunk, LogSource
+from changes.models.log import LogSource
 from changes.models.failurereason import FailureReason
 from changes.models.itemstat import ItemStat
 from changes.experimental import categorize
+from changes.lib.log_chunks import iter_log_text_reversed
 
 logger = logging.getLogger('analytics_notifier')
 
@@ -208,7 +209,7 @@ def _categorize_step_logs(job):
     if rules:
         for ls in _get_failing_log_sources(job):
             logdata = _get_log_data(ls)
-            tags, applicable = categorize.categorize(job.project.slug, rules, logdata)
+            tags, applicable = categorize.categorize_stream(job.project.slug, rules, logdata)
             tags_by_step[ls.step_id].update(tags)
             _incr("failing-log-processed")
             if not tags and applicable:
@@ -264,20 +265,21 @@ def _get_failing_log_sources(job):
 
 
 def _get_log_data(source):
-    queryset = LogChunk.query.filter(
-        LogChunk.source_id == source.id,
-    ).order_by(LogChunk.offset.asc())
-    return ''.join(l.text for l in queryset)
+    """Return the text of a LogSource as an iterable of chunks, last chunk first."""
+    return iter_log_text_reversed(source)
+
+
+_rule_cache = categorize.RuleCache()
 
 
 def _get_rules():
-    """Return the current rules to be used with categorize.categorize.
-    NB: Reloads the rules file at each call.
+    """Return the current compiled rules to be used with categorize.categorize_stream.
+    NB: Reloads the rules file whenever it changes.
     """
     rules_file = current_app.config.get('CATEGORIZE_RULES_FILE')
     if not rules_file:
         return None
-    return categorize.load_rules(rules_file)
+    return _rule_cache.get(rules_file)
 
 
 def _incr(name):
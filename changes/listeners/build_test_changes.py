@@ -0,0 +1,24 @@
+from changes.constants import Status
+from changes.lib.test_changes import find_previous_build, update_test_changes
+from changes.models import Build
+from changes.utils.locking import lock
+
+
+@lock
+def build_finished_handler(build_id, **kwargs):
+    """
+    Works out which tests a finished build added or removed, so the build
+    page doesn't have to.
+    """
+    build = Build.query.get(build_id)
+    if build is None:
+        return
+
+    if build.status != Status.finished:
+        return
+
+    previous_build = find_previous_build(build)
+    if previous_build is None:
+        return
+
+    update_test_changes(build, previous_build)
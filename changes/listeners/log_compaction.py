@@ -0,0 +1,16 @@
+from changes.lib.log_chunks import compact_logsource
+from changes.models import Job, LogSource
+from changes.utils.locking import lock
+
+
+@lock
+def job_finished_handler(job_id, **kwargs):
+    """
+    Compacts the logs of every step of a finished job into LogArchives.
+    """
+    job = Job.query.get(job_id)
+    if job is None:
+        return
+
+    for source in LogSource.query.filter(LogSource.job_id == job.id):
+        compact_logsource(source)
@@ -0,0 +1,27 @@
+from changes.api import response_cache
+from changes.models import Build, Job
+
+
+def build_finished_handler(build_id, **kwargs):
+    """
+    Drops cached API responses which depend on a build that just finished.
+    """
+    build = Build.query.get(build_id)
+    if build is None:
+        return
+
+    response_cache.invalidate_build(build)
+
+
+def job_finished_handler(job_id, **kwargs):
+    """
+    Drops cached API responses which depend on a job that just finished.
+    """
+    job = Job.query.get(job_id)
+    if job is None:
+        return
+
+    response_cache.invalidate(
+        'build:{0}'.format(job.build_id.hex),
+        'project:{0}'.format(job.project_id.hex),
+    )
@@ -0,0 +1,24 @@
+from changes.constants import Result, Status
+from changes.lib.test_durations import update_test_duration_index
+from changes.models import Build
+from changes.utils.locking import lock
+
+
+@lock
+def build_finished_handler(build_id, **kwargs):
+    """
+    Folds the test durations of a green commit build into its project's
+    TestDurationIndex.
+    """
+    build = Build.query.get(build_id)
+    if build is None:
+        return
+
+    if build.status != Status.finished or build.result != Result.passed:
+        return
+
+    # diff builds may be running tests that don't exist yet
+    if build.source.patch_id is not None:
+        return
+
+    update_test_duration_index(build)
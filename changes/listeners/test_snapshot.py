@@ -0,0 +1,23 @@
+from changes.constants import Result, Status
+from changes.lib.test_snapshot import update_project_test_snapshot
+from changes.models import Build
+from changes.utils.locking import lock
+
+
+@lock
+def build_finished_handler(build_id, **kwargs):
+    """
+    Makes a green commit build's tests its project's ProjectTestSnapshot.
+    """
+    build = Build.query.get(build_id)
+    if build is None:
+        return
+
+    if build.status != Status.finished or build.result != Result.passed:
+        return
+
+    # diff builds may be running tests that don't exist yet
+    if build.source.patch_id is not None:
+        return
+
+    update_project_test_snapshot(build)
@@ -0,0 +1,47 @@
+from __future__ import absolute_import
+
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Integer
+from sqlalchemy.orm import relationship
+
+from changes.config import db
+from changes.db.types.guid import GUID
+from changes.db.types.json import JSONEncodedDict
+
+
+class BuildTestChanges(db.Model):
+    """
+    The tests which were added to or removed from a build, compared to the
+    build it's compared against (the project's previous finished commit
+    build).
+
+    Only the counts and the first few changes are kept: ``changes`` holds
+    ``tests``, a list of ``[sign, test_id]`` pairs, where sign is ``+`` for
+    an added test and ``-`` for a removed one.
+    """
+    __tablename__ = 'buildtestchanges'
+
+    build_id = Column(GUID, ForeignKey('build.id', ondelete="CASCADE"), primary_key=True)
+    previous_build_id = Column(GUID, ForeignKey('build.id', ondelete="CASCADE"), nullable=False)
+    num_added = Column(Integer, default=0, nullable=False)
+    num_removed = Column(Integer, default=0, nullable=False)
+    changes = Column(JSONEncodedDict, nullable=False)
+    date_created = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    build = relationship('Build', foreign_keys=[build_id])
+    previous_build = relationship('Build', foreign_keys=[previous_build_id])
+
+    def __init__(self, **kwargs):
+        super(BuildTestChanges, self).__init__(**kwargs)
+        if self.num_added is None:
+            self.num_added = 0
+        if self.num_removed is None:
+            self.num_removed = 0
+        if self.changes is None:
+            self.changes = {}
+        if self.date_created is None:
+            self.date_created = datetime.utcnow()
+
+    @property
+    def total(self):
+        return self.num_added + self.num_removed
@@ -0,0 +1,107 @@
+from uuid import uuid4
+
+from sqlalchemy import BigInteger, Column, Date, ForeignKey, Integer, String, Text
+from sqlalchemy.orm import relationship
+from sqlalchemy.schema import Index, UniqueConstraint
+
+from changes.config import db
+from changes.db.types.guid import GUID
+from changes.db.utils import model_repr
+
+
+class ProjectDailyStat(db.Model):
+    """
+    Build counts and durations for a project's finished commit builds
+    created on a given day.
+
+    Durations are kept as a sum and a count rather than an average, so that
+    any range of days can be combined into an average.
+    """
+    __tablename__ = 'projectdailystat'
+    __table_args__ = (
+        Index('idx_projectdailystat_date', 'date'),
+        UniqueConstraint('project_id', 'date', name='unq_projectdailystat_date'),
+    )
+
+    id = Column(GUID, primary_key=True, default=uuid4)
+    project_id = Column(GUID, ForeignKey('project.id', ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+    total_builds = Column(Integer, default=0, nullable=False)
+    green_builds = Column(Integer, default=0, nullable=False)
+    # of green builds with a known duration
+    green_duration_total = Column(BigInteger, default=0, nullable=False)
+    green_duration_count = Column(Integer, default=0, nullable=False)
+
+    project = relationship('Project')
+
+    __repr__ = model_repr('project_id', 'date')
+
+    def __init__(self, **kwargs):
+        super(ProjectDailyStat, self).__init__(**kwargs)
+        if self.id is None:
+            self.id = uuid4()
+
+
+class ProjectDailyFailureStat(db.Model):
+    """
+    How many of a project's commit builds created on a given day failed for
+    a given reason.
+    """
+    __tablename__ = 'projectdailyfailurestat'
+    __table_args__ = (
+        Index('idx_projectdailyfailurestat_date', 'date'),
+        UniqueConstraint('project_id', 'date', 'reason', name='unq_projectdailyfailurestat_reason'),
+    )
+
+    id = Column(GUID, primary_key=True, default=uuid4)
+    project_id = Column(GUID, ForeignKey('project.id', ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+    reason = Column(String(32), nullable=False)
+    num_builds = Column(Integer, default=0, nullable=False)
+
+    project = relationship('Project')
+
+    __repr__ = model_repr('project_id', 'date', 'reason')
+
+    def __init__(self, **kwargs):
+        super(ProjectDailyFailureStat, self).__init__(**kwargs)
+        if self.id is None:
+            self.id = uuid4()
+
+
+class ProjectDailySlowTest(db.Model):
+    """
+    One of the slowest tests in the last green commit build a project
+    created on a given day.
+    """
+    __tablename__ = 'projectdailyslowtest'
+    __table_args__ = (
+        Index('idx_projectdailyslowtest_date', 'date'),
+        Index('idx_projectdailyslowtest_project_date', 'project_id', 'date'),
+    )
+
+    id = Column(GUID, primary_key=True, default=uuid4)
+    project_id = Column(GUID, ForeignKey('project.id', ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+    build_id = Column(GUID, ForeignKey('build.id', ondelete="CASCADE"), nullable=False)
+    name_sha = Column('label_sha', String(40), nullable=False)
+    name = Column(Text, nullable=False)
+    package = Column(Text, nullable=True)
+    duration = Column(Integer, default=0, nullable=False)
+
+    project = relationship('Project')
+    build = relationship('Build')
+
+    __repr__ = model_repr('project_id', 'date', 'name')
+
+    def __init__(self, **kwargs):
+        super(ProjectDailySlowTest, self).__init__(**kwargs)
+        if self.id is None:
+            self.id = uuid4()
+
+    @property
+    def short_name(self):
+        name, package = self.name, self.package
+        if package and name.startswith(package) and name != package:
+            return name[len(package) + 1:]
+        return name
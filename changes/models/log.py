@@ -1,12 +1,13 @@
 import uuid
 
 from datetime import datetime
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String, Text, Integer
-from sqlalchemy.orm import backref, relationship
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, LargeBinary, String, Text, Integer
+from sqlalchemy.orm import backref, deferred, relationship
 from sqlalchemy.schema import Index, UniqueConstraint
 
 from changes.config import db
 from changes.db.types.guid import GUID
+from changes.db.types.json import JSONEncodedDict
 
 # The expected maximum log chunk size; chunks from incremental logs
 # and final chunks can certainly be smaller.
@@ -104,3 +105,39 @@ class LogChunk(db.Model):
             self.id = uuid.uuid4()
         if self.date_created is None:
             self.date_created = datetime.utcnow()
+
+
+class LogArchive(db.Model):
+    """
+    The compacted contents of a LogSource whose step has finished. Once an
+    archive is written the source's logchunk rows are deleted.
+
+    The text is split into blocks which are zlib compressed independently
+    and concatenated into ``data``. ``block_index`` maps them back to the
+    log: its 'blocks' entry is a list of [offset, size, data_offset,
+    data_size], ordered by offset, so a range of the log can be read by
+    fetching and decompressing only the blocks which overlap it.
+    """
+    __tablename__ = 'logarchive'
+    __table_args__ = (
+        Index('idx_logarchive_job_id', 'job_id'),
+        Index('idx_logarchive_project_id', 'project_id'),
+    )
+
+    source_id = Column(GUID, ForeignKey('logsource.id', ondelete="CASCADE"), primary_key=True)
+    job_id = Column(GUID, ForeignKey('job.id', ondelete="CASCADE"), nullable=False)
+    project_id = Column(GUID, ForeignKey('project.id', ondelete="CASCADE"), nullable=False)
+    # size is the total length of the uncompressed text
+    size = Column(Integer, nullable=False)
+    block_index = Column(JSONEncodedDict, nullable=False)
+    data = deferred(Column(LargeBinary, nullable=False))
+    date_created = Column(DateTime, default=datetime.utcnow)
+
+    job = relationship('Job')
+    project = relationship('Project')
+    source = relationship('LogSource', backref=backref('archive', uselist=False))
+
+    def __init__(self, **kwargs):
+        super(LogArchive, self).__init__(**kwargs)
+        if self.date_created is None:
+            self.date_created = datetime.utcnow()
@@ -0,0 +1,58 @@
+from __future__ import absolute_import
+
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Integer
+from sqlalchemy.orm import relationship
+
+from changes.config import db
+from changes.db.types.guid import GUID
+from changes.db.types.json import JSONEncodedDict
+
+
+class TestDurationIndex(db.Model):
+    """
+    A rolling estimate of how long a project's tests take, used to shard
+    them evenly.
+
+    ``durations`` maps each test, and each group of tests sharing a name
+    prefix, to an exponentially weighted moving average of its duration
+    across the project's recent green builds. Keys are the test's
+    normalized segments joined by ``SEGMENT_SEP``.
+    """
+    __tablename__ = 'testdurationindex'
+
+    SEGMENT_SEP = '\x1f'
+
+    project_id = Column(GUID, ForeignKey('project.id', ondelete="CASCADE"), primary_key=True)
+    last_build_id = Column(GUID, ForeignKey('build.id', ondelete="SET NULL"))
+    num_builds = Column(Integer, default=0, nullable=False)
+    avg_test_time = Column(Integer, default=0, nullable=False)
+    durations = Column(JSONEncodedDict, nullable=False)
+    date_modified = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    project = relationship('Project')
+    last_build = relationship('Build')
+
+    def __init__(self, **kwargs):
+        super(TestDurationIndex, self).__init__(**kwargs)
+        if self.num_builds is None:
+            self.num_builds = 0
+        if self.avg_test_time is None:
+            self.avg_test_time = 0
+        if self.durations is None:
+            self.durations = {}
+        if self.date_modified is None:
+            self.date_modified = datetime.utcnow()
+
+    def get_test_stats(self):
+        """
+        Returns the index in the form TestsExpander.shard_tests expects: a
+        mapping of normalized segments to duration, and the average
+        duration of a single test.
+        """
+        sep = self.SEGMENT_SEP
+        test_stats = dict(
+            (tuple(key.split(sep)), duration)
+            for key, duration in self.durations.iteritems()
+        )
+        return test_stats, self.avg_test_time
@@ -2,6 +2,7 @@ from __future__ import absolute_import, division
 
 import logging
 import re
+import uuid
 
 from datetime import datetime
 from sqlalchemy.exc import IntegrityError
@@ -81,13 +82,86 @@ class TestResultManager(object):
         project = job.project
 
         # Create all test cases.
-        testcase_list = []
+        testcase_list = [
+            TestCase(job=job, step=step, project=project, **values)
+            for values in self._get_testcase_values(test_list)
+        ]
+
+        # Try an optimistic commit of all cases at once.
+        for testcase in testcase_list:
+            db.session.add(testcase)
+
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            self._save_individually(testcase_list)
+
+        self._save_artifacts(test_list, [t.id for t in testcase_list])
+        self._record_aggregates()
+
+    def save_batches(self, batches):
+        """
+        Saves tests delivered as an iterable of lists, writing each list with
+        a single multi-row INSERT and committing between batches.
+
+        Unlike ``save`` this never holds more than one batch worth of rows,
+        which makes it suitable for reports that are parsed incrementally.
+        """
+        saved = False
+        for test_list in batches:
+            if not test_list:
+                continue
+            self._bulk_save(test_list)
+            saved = True
+
+        if saved:
+            self._record_aggregates()
+
+    def _bulk_save(self, test_list):
+        step = self.step
+        job = step.job
+        project = job.project
+
+        values_list = self._get_testcase_values(test_list)
+
+        rows = []
+        for values in values_list:
+            row = dict(values, job_id=job.id, step_id=step.id, project_id=project.id)
+            row['label_sha'] = row.pop('name_sha')
+            rows.append(row)
+
+        try:
+            with db.session.begin_nested():
+                db.session.execute(TestCase.__table__.insert().values(rows))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # At least one of these tests was already recorded (possibly by an
+            # earlier batch), so fall back to the slow path to find out which.
+            testcase_list = [
+                TestCase(job=job, step=step, project=project, **values)
+                for values in values_list
+            ]
+            self._save_individually(testcase_list)
+            testcase_ids = [t.id for t in testcase_list]
+        else:
+            testcase_ids = [values['id'] for values in values_list]
+
+        self._save_artifacts(test_list, testcase_ids)
+
+    def _get_testcase_values(self, test_list):
+        """
+        Returns a dict of column values for the TestCase of each given test.
+        """
+        project = self.step.job.project
 
         # For tracking the name of any test we see with a bad
         # duration, typically the first one if we see multiple.
         bad_duration_test_name = None
         bad_duration_value = None
 
+        values_list = []
         for test in test_list:
             duration = test.duration
             # Maximum value for the Integer column type
@@ -99,66 +173,65 @@ class TestResultManager(object):
                     bad_duration_test_name = test.name
                     bad_duration_value = duration
                 duration = 0
-            testcase = TestCase(
-                job=job,
-                step=step,
-                name_sha=test.name_sha,
-                project=project,
-                name=test.name,
-                duration=duration,
-                message=test.message,
-                result=test.result,
-                date_created=test.date_created,
-                reruns=test.reruns
-            )
-            testcase_list.append(testcase)
+            values_list.append({
+                'id': uuid.uuid4(),
+                'name_sha': test.name_sha,
+                'name': test.name,
+                'duration': duration,
+                'message': test.message,
+                'result': test.result,
+                'date_created': test.date_created,
+                'reruns': test.reruns,
+            })
 
         if bad_duration_test_name:
             # Include the project slug in the warning so project warnings aren't bucketed together.
             logger.warning("Got bad test duration for " + project.slug + "; %s: %s",
                            bad_duration_test_name, bad_duration_value)
 
-        # Try an optimistic commit of all cases at once.
-        for testcase in testcase_list:
-            db.session.add(testcase)
-
-        try:
-            db.session.commit()
-        except IntegrityError:
-            db.session.rollback()
+        return values_list
 
-            create_or_update(FailureReason, where={
-                'step_id': step.id,
-                'reason': 'duplicate_test_name',
-            }, values={
-                'project_id': step.project_id,
-                'build_id': step.job.build_id,
-                'job_id': step.job_id,
-            })
-            db.session.commit()
-
-            # Slowly make separate commits, to uncover duplicate test cases:
-            for i, testcase in enumerate(testcase_list):
-                db.session.add(testcase)
-                try:
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
-                    original = _record_duplicate_testcase(testcase)
-                    db.session.commit()
-                    testcase_list[i] = original  # so artifacts get stored
-                    _record_test_failures(original.step)  # so count is right
+    def _save_individually(self, testcase_list):
+        """
+        Commits test cases one at a time, recording any which turn out to
+        be duplicates. ``testcase_list`` is updated in place so that each
+        entry refers to the row that was actually stored.
+        """
+        step = self.step
 
+        create_or_update(FailureReason, where={
+            'step_id': step.id,
+            'reason': 'duplicate_test_name',
+        }, values={
+            'project_id': step.project_id,
+            'build_id': step.job.build_id,
+            'job_id': step.job_id,
+        })
+        db.session.commit()
+
+        # Slowly make separate commits, to uncover duplicate test cases:
+        for i, testcase in enumerate(testcase_list):
+            db.session.add(testcase)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                original = _record_duplicate_testcase(testcase)
+                db.session.commit()
+                testcase_list[i] = original  # so artifacts get stored
+                _record_test_failures(original.step)  # so count is right
+
+    def _save_artifacts(self, test_list, testcase_ids):
         # Test artifacts do not operate under a unique constraint, so
         # they should insert cleanly without an integrity error.
 
-        for test, testcase in zip(test_list, testcase_list):
+        for test, testcase_id in zip(test_list, testcase_ids):
             if test.artifacts:
                 for ta in test.artifacts:
                     testartifact = TestArtifact(
                         name=ta['name'],
                         type=ta['type'],
-                        test=testcase,)
+                        test_id=testcase_id,)
                     testartifact.save_base64_content(ta['base64'])
                     db.session.add(testartifact)
 
@@ -167,8 +240,9 @@ class TestResultManager(object):
         except Exception:
             db.session.rollback()
             logger.exception('Failed to save artifacts'
-                             ' for step {}'.format(step.id.hex))
+                             ' for step {}'.format(self.step.id.hex))
 
+    def _record_aggregates(self):
         try:
             _record_test_counts(self.step)
             _record_test_failures(self.step)
@@ -177,7 +251,7 @@ class TestResultManager(object):
         except Exception:
             db.session.rollback()
             logger.exception('Failed to record aggregate test statistics'
-                             ' for step {}'.format(step.id.hex))
+                             ' for step {}'.format(self.step.id.hex))
 
 
 def _record_test_counts(step):
@@ -0,0 +1,85 @@
+from __future__ import absolute_import
+
+import uuid
+
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.orm import relationship
+from sqlalchemy.schema import Index, UniqueConstraint
+
+from changes.config import db
+from changes.db.types.guid import GUID
+from changes.db.types.json import JSONEncodedDict
+from changes.db.utils import model_repr
+
+
+class ProjectTestSnapshot(db.Model):
+    """
+    The set of tests in a project's latest green commit build.
+
+    The tests themselves live in ProjectTestSnapshotCase. ``groups`` is the
+    test group tree (as build_tree would expand it) precomputed from them: it
+    maps each group's path to a list of its child groups, each as
+    ``[path, num_tests, total_duration]``. The root is keyed by ``''``.
+    """
+    __tablename__ = 'projecttestsnapshot'
+
+    project_id = Column(GUID, ForeignKey('project.id', ondelete="CASCADE"), primary_key=True)
+    build_id = Column(GUID, ForeignKey('build.id', ondelete="SET NULL"))
+    sep = Column(String(1), default='.', nullable=False)
+    num_tests = Column(Integer, default=0, nullable=False)
+    groups = Column(JSONEncodedDict, nullable=False)
+    date_build = Column(DateTime)
+    date_modified = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    project = relationship('Project')
+    build = relationship('Build')
+
+    def __init__(self, **kwargs):
+        super(ProjectTestSnapshot, self).__init__(**kwargs)
+        if self.sep is None:
+            self.sep = '.'
+        if self.num_tests is None:
+            self.num_tests = 0
+        if self.groups is None:
+            self.groups = {}
+        if self.date_modified is None:
+            self.date_modified = datetime.utcnow()
+
+
+class ProjectTestSnapshotCase(db.Model):
+    """
+    A single test from a project's ProjectTestSnapshot.
+
+    Quacks like a TestCase as far as GeneralizedTestCase is concerned.
+    """
+    __tablename__ = 'projecttestsnapshotcase'
+    __table_args__ = (
+        UniqueConstraint('project_id', 'label_sha', name='unq_projecttestsnapshotcase_name'),
+        Index('idx_projecttestsnapshotcase_duration', 'project_id', 'duration'),
+    )
+
+    id = Column(GUID, nullable=False, primary_key=True, default=uuid.uuid4)
+    project_id = Column(GUID, ForeignKey('project.id', ondelete="CASCADE"), nullable=False)
+    name_sha = Column('label_sha', String(40), nullable=False)
+    name = Column(Text, nullable=False)
+    package = Column(Text, nullable=True)
+    duration = Column(Integer, default=0, nullable=False)
+
+    project = relationship('Project')
+
+    __repr__ = model_repr('name', 'package')
+
+    def __init__(self, **kwargs):
+        super(ProjectTestSnapshotCase, self).__init__(**kwargs)
+        if self.id is None:
+            self.id = uuid.uuid4()
+        if self.duration is None:
+            self.duration = 0
+
+    @property
+    def short_name(self):
+        name, package = self.name, self.package
+        if package and name.startswith(package) and name != package:
+            return name[len(package) + 1:]
+        return name
@@ -35,9 +35,11 @@ _SLOW_RUN_THRESHOLD = 5 * 60
 
 
 class NotFinished(Exception):
-    def __init__(self, message=None, retry_after=None):
+    def __init__(self, message=None, retry_after=None, requeue=True):
         super(NotFinished, self).__init__(message)
         self.retry_after = retry_after or CONTINUE_COUNTDOWN
+        # if False, the Task is left in progress for something else to pick up
+        self.requeue = requeue
 
 
 class TooManyRetries(Exception):
@@ -122,7 +124,7 @@ class TrackedTask(local):
             self.logger.info(
                 'Task marked as not finished: %s %s', self.task_name, self.task_id)
 
-            self._continue(kwargs, e.retry_after)
+            self._continue(kwargs, e.retry_after, e.requeue)
 
         except Exception as exc:
             db.session.rollback()
@@ -189,7 +191,7 @@ class TrackedTask(local):
         ).update(kwargs, synchronize_session=False)
         return bool(count)
 
-    def _continue(self, kwargs, retry_after=CONTINUE_COUNTDOWN):
+    def _continue(self, kwargs, retry_after=CONTINUE_COUNTDOWN, requeue=True):
         kwargs['task_id'] = self.task_id
         kwargs['parent_task_id'] = self.parent_id
 
@@ -200,6 +202,9 @@ class TrackedTask(local):
 
         db.session.commit()
 
+        if not requeue:
+            return
+
         queue.delay(
             self.task_name,
             kwargs=kwargs,
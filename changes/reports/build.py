@@ -1,12 +1,10 @@
 from __future__ import absolute_import, division
 
-from collections import defaultdict
 from datetime import datetime, timedelta
-from sqlalchemy.sql import func
 
-from changes.config import db
-from changes.constants import Status, Result
-from changes.models import Build, FailureReason, JobStep, TestCase, Source
+from changes.lib.daily_stats import (
+    get_failure_counts, get_project_stats, get_slow_tests
+)
 from changes.lib.flaky_tests import get_flaky_tests
 from changes.utils.http import build_uri
 
@@ -28,8 +26,12 @@ class BuildReport(object):
     def __init__(self, projects):
         self.projects = set(projects)
 
-    def generate(self, days=7):
-        end_period = datetime.utcnow()
+    def generate(self, days=7, end_date=None):
+        # stats are rolled up by day, so periods are whole days (in UTC)
+        # ending with end_date (today by default)
+        if end_date is None:
+            end_date = datetime.utcnow().date()
+        end_period = end_date + timedelta(days=1)
         days_delta = timedelta(days=days)
         start_period = end_period - days_delta
 
@@ -108,16 +110,17 @@ class BuildReport(object):
             start_period, end_period, self.projects, MAX_FLAKY_TESTS)
         slow_tests = self.get_slow_tests(start_period, end_period)
 
+        last_day = end_period - timedelta(days=1)
         title = 'Build Report ({0} through {1})'.format(
             start_period.strftime('%b %d, %Y'),
-            end_period.strftime('%b %d, %Y'),
+            last_day.strftime('%b %d, %Y'),
         )
         if len(self.projects) == 1:
             title = '[%s] %s' % (iter(self.projects).next().name, title)
 
         return {
             'title': title,
-            'period': [start_period, end_period],
+            'period': [start_period, last_day],
             'failure_stats': failure_stats,
             'project_stats': project_stats,
             'tests': {
@@ -127,145 +130,50 @@ class BuildReport(object):
         }
 
     def get_project_stats(self, start_period, end_period):
-        projects_by_id = dict((p.id, p) for p in self.projects)
-        project_ids = projects_by_id.keys()
-
-        # fetch overall build statistics per project
-        query = db.session.query(
-            Build.project_id, Build.result,
-            func.count(Build.id).label('num'),
-            func.avg(Build.duration).label('duration'),
-        ).join(
-            Source, Source.id == Build.source_id,
-        ).filter(
-            Source.patch_id == None,  # NOQA
-            Build.project_id.in_(project_ids),
-            Build.status == Status.finished,
-            Build.result.in_([Result.failed, Result.passed]),
-            Build.date_created >= start_period,
-            Build.date_created < end_period,
-        ).group_by(Build.project_id, Build.result)
+        stats_by_project = get_project_stats(
+            [p.id for p in self.projects], start_period, end_period)
 
         project_results = {}
         for project in self.projects:
+            stats = stats_by_project.get(project.id, {})
+            total_builds = stats.get('total_builds', 0)
+            green_builds = stats.get('green_builds', 0)
+            if total_builds:
+                green_percent = percent(green_builds, total_builds)
+            else:
+                green_percent = None
             project_results[project] = {
-                'total_builds': 0,
-                'green_builds': 0,
-                'green_percent': None,
-                'avg_duration': 0,
+                'total_builds': total_builds,
+                'green_builds': green_builds,
+                'green_percent': green_percent,
+                'avg_duration': stats.get('avg_duration', 0),
                 'link': build_uri('/project/{0}/'.format(project.slug)),
             }
 
-        for project_id, result, num_builds, duration in query:
-            if duration is None:
-                duration = 0
-
-            project = projects_by_id[project_id]
-
-            if result == Result.passed:
-                project_results[project]['avg_duration'] = duration
-
-            project_results[project]['total_builds'] += num_builds
-            if result == Result.passed:
-                project_results[project]['green_builds'] += num_builds
-
-        for project, stats in project_results.iteritems():
-            if stats['total_builds']:
-                stats['green_percent'] = percent(stats['green_builds'], stats['total_builds'])
-            else:
-                stats['green_percent'] = None
-
         return project_results
 
     def get_failure_stats(self, start_period, end_period):
-        failure_stats = {
-            'total': 0,
-            'reasons': defaultdict(int),
-        }
-        for project in self.projects:
-            for stat, value in self.get_failure_stats_for_project(
-                    project, start_period, end_period).iteritems():
-                failure_stats['reasons'][stat] += value
-
-        failure_stats['total'] = Build.query.join(
-            Source, Source.id == Build.source_id,
-        ).filter(
-            Source.patch_id == None,  # NOQA
-            Build.project_id.in_(p.id for p in self.projects),
-            Build.status == Status.finished,
-            Build.result == Result.failed,
-            Build.date_created >= start_period,
-            Build.date_created < end_period,
-        ).count()
-
-        return failure_stats
+        project_ids = [p.id for p in self.projects]
 
-    def get_failure_stats_for_project(self, project, start_period, end_period):
-        base_query = db.session.query(
-            FailureReason.reason, FailureReason.build_id
-        ).join(
-            Build, Build.id == FailureReason.build_id,
-        ).join(
-            Source, Source.id == Build.source_id,
-        ).join(
-            JobStep, JobStep.id == FailureReason.step_id,
-        ).filter(
-            Source.patch_id == None,  # NOQA
-            Build.project_id == project.id,
-            Build.date_created >= start_period,
-            Build.date_created < end_period,
-            JobStep.replacement_id.is_(None),
-        ).group_by(
-            FailureReason.reason, FailureReason.build_id
-        ).subquery()
-
-        return dict(
-            db.session.query(
-                base_query.c.reason,
-                func.count(),
-            ).group_by(
-                base_query.c.reason,
-            )
+        total = sum(
+            stats['total_builds'] - stats['green_builds']
+            for stats in get_project_stats(
+                project_ids, start_period, end_period).itervalues()
         )
 
-    def get_slow_tests(self, start_period, end_period):
-        slow_tests = []
-        for project in self.projects:
-            slow_tests.extend(self.get_slow_tests_for_project(
-                project, start_period, end_period))
-        slow_tests.sort(key=lambda x: x['duration_raw'], reverse=True)
-        return slow_tests[:MAX_SLOW_TESTS]
-
-    def get_slow_tests_for_project(self, project, start_period, end_period):
-        latest_build = Build.query.filter(
-            Build.project == project,
-            Build.status == Status.finished,
-            Build.result == Result.passed,
-            Build.date_created >= start_period,
-            Build.date_created < end_period,
-        ).order_by(
-            Build.date_created.desc(),
-        ).limit(1).first()
-
-        if not latest_build:
-            return []
-
-        job_list = list(latest_build.jobs)
-        if not job_list:
-            return []
+        return {
+            'total': total,
+            'reasons': get_failure_counts(project_ids, start_period, end_period),
+        }
 
-        queryset = TestCase.query.filter(
-            TestCase.job_id.in_(j.id for j in job_list),
-            TestCase.result == Result.passed,
-            TestCase.date_created > start_period,
-            TestCase.date_created <= end_period,
-        ).order_by(
-            TestCase.duration.desc()
-        ).limit(MAX_SLOW_TESTS)
+    def get_slow_tests(self, start_period, end_period):
+        projects_by_id = dict((p.id, p) for p in self.projects)
 
-        slow_list = []
-        for test in queryset:
-            slow_list.append({
+        slow_tests = []
+        for test in get_slow_tests(projects_by_id.keys(), start_period,
+                                   end_period, MAX_SLOW_TESTS):
+            project = projects_by_id[test.project_id]
+            slow_tests.append({
                 'project': project,
                 'name': test.short_name,
                 'package': test.package,
@@ -274,5 +182,4 @@ class BuildReport(object):
                 'link': build_uri('/project_test/{0}/{1}/'.format(
                     project.id.hex, test.name_sha)),
             })
-
-        return slow_list
+        return slow_tests
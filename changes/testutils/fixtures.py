@@ -6,6 +6,7 @@ from loremipsum import get_paragraphs, get_sentences
 from uuid import uuid4
 
 from changes.config import db
+from changes.constants import Result, Status
 from changes.models.build import Build
 from changes.models import (
     Repository, Job, JobPlan, Project, Revision, Change, Author,
@@ -261,6 +262,28 @@ class Fixtures(object):
 
         return build
 
+    def create_finished_build(self, project, tests=None, **kwargs):
+        """
+        Create a finished build, passed unless a ``result`` is given.
+
+        ``tests`` is either a list of test names or a mapping of test name to
+        duration; when given, the build gets a job with one test per entry.
+        """
+        kwargs.setdefault('status', Status.finished)
+        kwargs.setdefault('result', Result.passed)
+        build = self.create_build(project, **kwargs)
+
+        if tests is not None:
+            job = self.create_job(build)
+            if isinstance(tests, dict):
+                for name, duration in tests.iteritems():
+                    self.create_test(job, name=name, duration=duration)
+            else:
+                for name in tests:
+                    self.create_test(job, name=name)
+
+        return build
+
     def create_patch(self, **kwargs):
         kwargs.setdefault('diff', SAMPLE_DIFF)
         kwargs.setdefault('parent_revision_sha', uuid4().hex)
@@ -1,3 +1,7 @@
+from collections import OrderedDict
+from threading import Lock
+
+
 class memoize(object):
     """
     Memoize the result of a property call.
@@ -22,3 +26,45 @@ class memoize(object):
             value = self.func(obj)
             d[n] = value
         return value
+
+
+class LRUCache(object):
+    """
+    A cache of at most ``size`` items, dropping the least recently used item
+    first when it's full.
+
+    >>> cache = LRUCache(100)
+    >>> cache.set('foo', 'bar')
+    >>> cache.get('foo')
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return default
+            self._items[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -38,7 +38,23 @@ class DiffParser(object):
 
     def __init__(self, udiff):
         """:param udiff:   a text in udiff format"""
-        self.lines = udiff.splitlines()
+        self.udiff = udiff
+
+    def _iter_lines(self):
+        # Like udiff.splitlines(), but without holding every line of a
+        # (possibly huge) diff in memory at once.
+        udiff = self.udiff
+        start = 0
+        end = len(udiff)
+        while start < end:
+            pos = udiff.find('\n', start)
+            if pos == -1:
+                pos = end
+            line = udiff[start:pos]
+            if line.endswith('\r'):
+                line = line[:-1]
+            yield line
+            start = pos + 1
 
     def _extract_rev(self, line1, line2):
         def _extract(line):
@@ -52,20 +68,31 @@ class DiffParser(object):
         return (None, None), (None, None)
 
     def parse(self):
+        return list(self.iter_files())
+
+    def iter_files(self, compact=False):
+        """
+        Lazily parses the diff, yielding a dict for each file.
+
+        By default these are as described for `parse`. With ``compact``, the
+        individual lines aren't kept: instead of 'chunks', each file has
+        'added_ranges', a list of ``(start, stop)`` ranges of the (1-based,
+        end exclusive) line numbers added to the new file.
+        """
         # reference: unidiff format by Guido:
         # https://www.artima.com/weblogs/viewpost.jsp?thread=164293
-        lineiter = iter(self.lines)
-        files = []
+        lineiter = self._iter_lines()
 
         # current_file is only used for git-generated "extended diffs"
         # which are able to express empty file creation and deletion
         current_file = None
+        pending_file = None
         try:
             line = lineiter.next()
             while 1:
                 if current_file:
                     if line.startswith('diff --git '):
-                        files.append(current_file)
+                        yield current_file
                         current_file = None
                     elif line.startswith('deleted file mode '):
                         current_file['new_filename'] = None
@@ -76,25 +103,38 @@ class DiffParser(object):
                     current_file = {
                         'old_filename': diff_line[2],
                         'new_filename': diff_line[3],
-                        'chunks': [],
                         'chunk_markers': [],
                     }
+                    if compact:
+                        current_file['added_ranges'] = []
+                    else:
+                        current_file['chunks'] = []
 
                 if not line.startswith('--- '):
                     line = lineiter.next()
                     continue
 
-                chunks = []
-                chunk_markers = []
                 old, new = self._extract_rev(line, lineiter.next())
-                files.append({
+                file_dict = {
                     'old_filename': old[0] if old[0] != '/dev/null' else None,
                     'new_filename': new[0] if new[0] != '/dev/null' else None,
-                    'chunks': chunks,
-                    'chunk_markers': chunk_markers,
-                })
+                    'chunk_markers': [],
+                }
                 current_file = None
 
+                if compact:
+                    file_dict['added_ranges'] = []
+                    line = self._read_chunks(lineiter, file_dict)
+                    yield file_dict
+                    if line is None:
+                        return
+                    continue
+
+                file_dict['chunks'] = chunks = []
+                chunk_markers = file_dict['chunk_markers']
+                # the diff can end part way through the file
+                pending_file = file_dict
+
                 line = lineiter.next()
                 while line:
                     match = self._chunk_re.match(line)
@@ -146,13 +186,58 @@ class DiffParser(object):
                             line_dict['ends_with_newline'] = False
                             line = lineiter.next()
                 assert len(chunks) == len(chunk_markers)
+                pending_file = None
+                yield file_dict
 
         except StopIteration:
+            if not compact and pending_file is not None:
+                yield pending_file
             if current_file:
-                files.append(current_file)
-            pass
+                yield current_file
+
+    def _read_chunks(self, lineiter, file_dict):
+        """
+        Reads the chunks of a file for `iter_files` in compact mode.
+
+        Returns the first line after the chunks, or None at the end of the diff.
+        """
+        chunk_markers = file_dict['chunk_markers']
+        added_ranges = file_dict['added_ranges']
+        try:
+            line = lineiter.next()
+            while line:
+                match = self._chunk_re.match(line)
+                if not match:
+                    break
+
+                chunk_markers.append(line)
+
+                old_line, old_end, new_line, new_end = [
+                    int(x or 1) for x in match.groups()
+                ]
+                old_end += old_line - 1
+                new_end += new_line - 1
+                line = lineiter.next()
 
-        return files
+                while old_line <= old_end or new_line <= new_end:
+                    command = line[:1]
+                    if command == '+':
+                        if added_ranges and added_ranges[-1][1] == new_line:
+                            added_ranges[-1] = (added_ranges[-1][0], new_line + 1)
+                        else:
+                            added_ranges.append((new_line, new_line + 1))
+                        new_line += 1
+                    elif command == '-':
+                        old_line += 1
+                    else:
+                        old_line += 1
+                        new_line += 1
+                    line = lineiter.next()
+                    if line == '\ No newline at end of file':
+                        line = lineiter.next()
+            return line
+        except StopIteration:
+            return None
 
     def reconstruct_file_diff(self, file_dict):
         """Given a file_dict dictionary in the same format returned by `parse`,
@@ -205,7 +290,7 @@ class DiffParser(object):
         filenames found in the diff.
         """
         results = set()
-        for info in self.parse():
+        for info in self.iter_files(compact=True):
             if info['new_filename']:
                 results.add(info['new_filename'][2:])
             if info['old_filename']:
@@ -221,11 +306,10 @@ class DiffParser(object):
         context only), in the numbering after the diff is applied.
         """
         lines_by_file = defaultdict(set)
-        for file_diff in self.parse():
-            for diff_chunk in file_diff['chunks']:
-                if not file_diff['new_filename']:
-                    continue
-                lines_by_file[file_diff['new_filename'][2:]].update(
-                    d['new_lineno'] for d in diff_chunk if d['action'] == 'add'
-                )
+        for file_diff in self.iter_files(compact=True):
+            if not file_diff['new_filename'] or not file_diff['chunk_markers']:
+                continue
+            lines = lines_by_file[file_diff['new_filename'][2:]]
+            for start, stop in file_diff['added_ranges']:
+                lines.update(xrange(start, stop))
         return lines_by_file
@@ -6,17 +6,21 @@ from changes.ext.redis import UnableToGetLock
 from changes.config import redis
 
 
+def get_lock_key(func, kwargs):
+    return '{0}:{1}:{2}'.format(
+        func.__module__,
+        func.__name__,
+        md5(
+            '&'.join('{0}={1}'.format(k, repr(v))
+            for k, v in sorted(kwargs.iteritems()))
+        ).hexdigest()
+    )
+
+
 def lock(func):
     @wraps(func)
     def wrapped(**kwargs):
-        key = '{0}:{1}:{2}'.format(
-            func.__module__,
-            func.__name__,
-            md5(
-                '&'.join('{0}={1}'.format(k, repr(v))
-                for k, v in sorted(kwargs.iteritems()))
-            ).hexdigest()
-        )
+        key = get_lock_key(func, kwargs)
         try:
             with redis.lock(key, expire=300, nowait=True):
                 return func(**kwargs)
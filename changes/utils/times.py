@@ -1,3 +1,16 @@
+from datetime import datetime
+
+
+def parse_day(value):
+    """
+    Returns the date of a ``YYYY-MM-DD`` string (as task arguments are
+    passed), or ``value`` itself if it's already a date.
+    """
+    if isinstance(value, basestring):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    return value
+
+
 def duration(value):
     ONE_SECOND = 1000
     ONE_MINUTE = ONE_SECOND * 60
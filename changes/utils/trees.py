@@ -14,7 +14,11 @@ def build_flat_tree(tests, sep='.', min_children=1):
     return tree
 
 
-def build_tree(tests, sep='.', min_children=1, parent=''):
+def build_expanded_tree(tests, sep='.', min_children=1):
+    """
+    Returns the mapping of every group to its children that build_tree
+    picks a single group's children from.
+    """
     tree = defaultdict(set)
 
     # Build a mapping of prefix => set(children)
@@ -47,6 +51,11 @@ def build_tree(tests, sep='.', min_children=1, parent=''):
     # Expand the tree, starting at the root.
     expand(sep=sep, min_children=min_children)
 
+    return tree
+
+
+def build_tree(tests, sep='.', min_children=1, parent=''):
+    tree = build_expanded_tree(tests, sep=sep, min_children=min_children)
     if parent:
         return tree[parent]
     return tree['']
@@ -6,16 +6,32 @@ import re
 import shutil
 import tempfile
 
+from functools import partial
 from subprocess import Popen, PIPE, check_call, CalledProcessError
+from uuid import uuid4
+
+from sqlalchemy.exc import IntegrityError
 
 from changes.constants import PROJECT_ROOT
 from changes.db.utils import create_or_update, get_or_create, try_create
 from changes.models import Author, Revision, Source
-from changes.config import statsreporter
+from changes.config import db, statsreporter
+from changes.utils.cache import LRUCache
 from changes.utils.diff_parser import DiffParser
 
 from time import time
 
+FULL_SHA_RE = re.compile(r'^[0-9a-f]{40}$')
+
+# The content of a file at a full sha never changes, so the files we read
+# (mostly project configs, on every build) are kept around for later reads.
+FILE_CACHE_SIZE = 500
+
+_file_cache = LRUCache(FILE_CACHE_SIZE)
+
+# How much command output ``Vcs.stream`` reads at a time.
+STREAM_CHUNK_SIZE = 65536
+
 
 class CommandError(Exception):
     def __init__(self, cmd, retcode, stdout=None, stderr=None):
@@ -87,10 +103,7 @@ class Vcs(object):
     def get_default_env(self):
         return {}
 
-    def run(self, *args, **kwargs):
-        if self.exists():
-            kwargs.setdefault('cwd', self.path)
-
+    def get_env(self):
         env = os.environ.copy()
 
         for key, value in self.get_default_env().iteritems():
@@ -98,6 +111,14 @@ class Vcs(object):
 
         env.setdefault('CHANGES_SSH_REPO', self.url)
 
+        return env
+
+    def run(self, *args, **kwargs):
+        if self.exists():
+            kwargs.setdefault('cwd', self.path)
+
+        env = self.get_env()
+
         for key, value in kwargs.pop('env', {}):
             env[key] = value
 
@@ -111,6 +132,43 @@ class Vcs(object):
             raise CommandError(args[0], proc.returncode, stdout, stderr)
         return stdout
 
+    def stream(self, *args, **kwargs):
+        """
+        Like ``run``, but yields the command's output as it arrives rather
+        than once the command has finished.
+
+        The command is killed if the caller stops iterating early. If it
+        fails, CommandError is raised after whatever output it gave.
+        """
+        if self.exists():
+            kwargs.setdefault('cwd', self.path)
+
+        kwargs['env'] = self.get_env()
+        kwargs['stdout'] = PIPE
+
+        # stderr goes to a file so that a chatty command can't block on it
+        # while we're waiting on stdout
+        with tempfile.TemporaryFile() as stderr:
+            kwargs['stderr'] = stderr
+            proc = Popen(*args, **kwargs)
+            try:
+                read = partial(os.read, proc.stdout.fileno(), STREAM_CHUNK_SIZE)
+                for chunk in iter(read, ''):
+                    yield chunk
+                proc.wait()
+            finally:
+                if proc.returncode is None:
+                    try:
+                        proc.kill()
+                    except OSError:
+                        pass
+                    proc.wait()
+                proc.stdout.close()
+
+            if proc.returncode != 0:
+                stderr.seek(0)
+                raise CommandError(args[0], proc.returncode, None, stderr.read())
+
     def exists(self):
         return os.path.exists(self.path)
 
@@ -120,7 +178,8 @@ class Vcs(object):
     def update(self):
         raise NotImplementedError
 
-    def log(self, parent=None, branch=None, author=None, offset=0, limit=100):
+    def log(self, parent=None, branch=None, author=None, offset=0, limit=100,
+            after=None):
         """ Gets the commit log for the repository.
 
         Only one of parent or branch can be specified for restricting searches.
@@ -138,6 +197,9 @@ class Vcs(object):
         :param author: The author name or email to filter results.
         :param offset: An offset into the results at which to begin.
         :param limit: The maximum number of results to return.
+        :param after: The id of a revision from an earlier call with the same
+            arguments, to return the revisions following it instead of
+            using an offset. Not supported by every tool.
         :return: A list of revisions matching the given criteria.
         """
         raise NotImplementedError
@@ -178,6 +240,12 @@ class Vcs(object):
         """
         raise NotImplementedError
 
+    def get_branches_for_revisions(self, revisions):
+        """ Looks up the branches of many revisions (as returned by log) at once.
+        :return: A dict of the list of branches of each revision, by id.
+        """
+        return dict((r.id, r.branches) for r in revisions)
+
     # XXX(dcramer): not overly happy with the buildstep commands API
     def get_buildstep_clone(self, source, workspace, clean=True):
         raise NotImplementedError
@@ -211,6 +279,27 @@ class Vcs(object):
         Raises:
             CommandError - if the file or the revision cannot be found
         """
+        cache_key = None
+        if FULL_SHA_RE.match(sha):
+            cache_key = (self.path, sha, file_path)
+
+        content = None
+        if cache_key is not None:
+            content = _file_cache.get(cache_key)
+        if content is None:
+            start_time = time()
+            content = self._read_file(sha, file_path)
+            self.log_timing('read_file', start_time)
+            if cache_key is not None:
+                _file_cache.set(cache_key, content)
+
+        if diff is None:
+            return content
+
+        return self._selectively_apply_diff(file_path, content, diff)
+
+    def _read_file(self, sha, file_path):
+        """Read the content of a file at a given revision, without caching."""
         raise NotImplementedError
 
     def _selectively_apply_diff(self, file_path, file_content, diff):
@@ -230,8 +319,13 @@ class Vcs(object):
             InvalidDiffError - when the supplied diff is invalid.
         """
         parser = DiffParser(diff)
+        # Only fully parse the diff if it touches the file, which it
+        # usually doesn't.
+        if not any(file_dict['new_filename'] is not None and file_dict['new_filename'][2:] == file_path
+                   for file_dict in parser.iter_files(compact=True)):
+            return file_content
         selected_diff = None
-        for file_dict in parser.parse():
+        for file_dict in parser.iter_files():
             if file_dict['new_filename'] is not None and file_dict['new_filename'][2:] == file_path:
                 selected_diff = parser.reconstruct_file_diff(file_dict)
         if selected_diff is None:
@@ -279,6 +373,16 @@ class Vcs(object):
         return patched_content
 
 
+def parse_author(value):
+    """Splits a "Name <email>" author into its name and email."""
+    match = re.match(r'^(.+) <([^>]+)>$', value)
+    if not match:
+        if '@' in value:
+            return value, value
+        return value, '{0}@localhost'.format(value)
+    return match.group(1), match.group(2)
+
+
 class RevisionResult(object):
     parents = None
     branches = None
@@ -301,14 +405,7 @@ class RevisionResult(object):
             type(self).__name__, self.id, self.author, self.subject)
 
     def _get_author(self, value):
-        match = re.match(r'^(.+) <([^>]+)>$', value)
-        if not match:
-            if '@' in value:
-                name, email = value, value
-            else:
-                name, email = value, '{0}@localhost'.format(value)
-        else:
-            name, email = match.group(1), match.group(2)
+        name, email = parse_author(value)
 
         author, _ = get_or_create(Author, where={
             'email': email,
@@ -350,3 +447,127 @@ class RevisionResult(object):
         })
 
         return (revision, created, source)
+
+
+def _get_author_ids(values):
+    """
+    Returns the ID of the Author of each "Name <email>" in ``values``,
+    creating any which are missing.
+    """
+    parsed = dict((value, parse_author(value)) for value in values)
+
+    author_ids = dict(db.session.query(
+        Author.email, Author.id,
+    ).filter(
+        Author.email.in_(set(email for _, email in parsed.itervalues())),
+    ))
+
+    missing = {}
+    for name, email in parsed.itervalues():
+        if email not in author_ids:
+            missing.setdefault(email, name)
+
+    if missing:
+        rows = [{
+            'id': uuid4(),
+            'email': email,
+            'name': name,
+        } for email, name in missing.iteritems()]
+        try:
+            with db.session.begin_nested():
+                db.session.execute(Author.__table__.insert(), rows)
+        except IntegrityError:
+            # someone else is creating the same authors
+            for email, name in missing.iteritems():
+                author, _ = get_or_create(Author, where={
+                    'email': email,
+                }, defaults={
+                    'name': name,
+                })
+                author_ids[email] = author.id
+        else:
+            author_ids.update((r['email'], r['id']) for r in rows)
+
+    return dict(
+        (value, author_ids[email])
+        for value, (_, email) in parsed.iteritems()
+    )
+
+
+def save_revisions(repository, results, branches=None):
+    """
+    Saves RevisionResults in bulk, as RevisionResult.save would one at a time
+    but with a few queries for all of them.
+
+    ``branches`` may give the branches of each revision by id, as looked up
+    in bulk by Vcs.get_branches_for_revisions, rather than asking each
+    result for its own.
+
+    Returns the shas of the revisions which were created.
+    """
+    results = dict((r.id, r) for r in results).values()
+    if not results:
+        return set()
+
+    if branches is None:
+        branches = dict((r.id, r.branches) for r in results)
+
+    author_ids = _get_author_ids(
+        set(r.author for r in results) | set(r.committer for r in results))
+
+    existing = dict(
+        (r.sha, r) for r in Revision.query.filter(
+            Revision.repository_id == repository.id,
+            Revision.sha.in_([r.id for r in results]),
+        )
+    )
+
+    new_rows = []
+    for result in results:
+        values = {
+            'author_id': author_ids[result.author],
+            'committer_id': author_ids[result.committer],
+            'message': result.message,
+            'parents': result.parents,
+            'branches': branches[result.id],
+            'date_created': result.author_date,
+            'date_committed': result.committer_date,
+        }
+        revision = existing.get(result.id)
+        if revision is None:
+            values['repository_id'] = repository.id
+            values['sha'] = result.id
+            new_rows.append(values)
+            continue
+
+        for key, value in values.iteritems():
+            if getattr(revision, key) != value:
+                setattr(revision, key, value)
+        db.session.add(revision)
+
+    if not new_rows:
+        return set()
+
+    # we also want to create a source for each revision as it's the canonical
+    # representation in the UI
+    source_rows = [{
+        'id': uuid4(),
+        'repository_id': repository.id,
+        'revision_sha': row['sha'],
+    } for row in new_rows]
+
+    created = set(row['sha'] for row in new_rows)
+    try:
+        with db.session.begin_nested():
+            db.session.execute(Revision.__table__.insert(), new_rows)
+            db.session.execute(Source.__table__.insert(), source_rows)
+    except IntegrityError:
+        # someone else is saving some of the same revisions
+        for result in results:
+            result.branches = branches[result.id]
+        created = set(
+            result.id for result in results
+            if result.id in created and result.save(repository)[1]
+        )
+
+    return created
@@ -1,5 +1,8 @@
 from __future__ import absolute_import, division, print_function
 
+import logging
+import traceback
+
 from datetime import datetime
 from urlparse import urlparse
 
@@ -8,8 +11,9 @@ from changes.utils.http import build_uri
 
 from .base import (
     Vcs, RevisionResult, BufferParser, ConcurrentUpdateError, CommandError,
-    UnknownRevision,
+    UnknownRevision, FULL_SHA_RE,
 )
+from .readers import GitObjectReader, ReaderError, reader_pool
 
 from time import time
 
@@ -107,6 +111,51 @@ class GitVcs(Vcs):
     def branches_for_commit(self, _id):
         return self.get_known_branches(commit_id=_id)
 
+    def get_branches_for_revisions(self, revisions):
+        """ Looks up the branches of many revisions (as returned by log) at once.
+
+        A branch which contains a commit contains all of its ancestors, so
+        along a run of revisions where each is the first parent of the one
+        before it (which is what log returns for a parent or branch) the
+        branches can only grow. When both ends of a run are on the same
+        branches so is everything in between, so a run of history is split
+        up only where branches fork off, rather than running
+        ``git branch --contains`` for every commit.
+
+        :return: A dict of the list of branches of each revision, by id.
+        """
+        start_time = time()
+
+        runs = []
+        for revision in revisions:
+            if runs and runs[-1][-1].parents and runs[-1][-1].parents[0] == revision.id:
+                runs[-1].append(revision)
+            else:
+                runs.append([revision])
+
+        results = {}
+
+        def get_branches(revision):
+            if revision.id not in results:
+                results[revision.id] = revision.branches
+            return results[revision.id]
+
+        while runs:
+            run = runs.pop()
+            first, last = get_branches(run[0]), get_branches(run[-1])
+            if len(run) <= 2:
+                continue
+            if set(first) == set(last):
+                for revision in run[1:-1]:
+                    results[revision.id] = first
+            else:
+                middle = len(run) // 2
+                runs.append(run[:middle + 1])
+                runs.append(run[middle:])
+
+        self.log_timing('get_branches_for_revisions', start_time)
+        return results
+
     def get_known_branches(self, commit_id=None):
         """ List all branches or those related to the commit for this repo.
 
@@ -136,19 +185,88 @@ class GitVcs(Vcs):
         self.log_timing('get_known_branches', start_time)
         return list(set(results))
 
+    def _get_command_error(self, e):
+        if 'unknown revision or path' in e.stderr:
+            return UnknownRevision(
+                cmd=e.cmd,
+                retcode=e.retcode,
+                stdout=e.stdout,
+                stderr=e.stderr,
+            )
+        return e
+
     def run(self, cmd, **kwargs):
         cmd = [self.binary_path] + cmd
         try:
             return super(GitVcs, self).run(cmd, **kwargs)
         except CommandError as e:
-            if 'unknown revision or path' in e.stderr:
-                raise UnknownRevision(
-                    cmd=e.cmd,
-                    retcode=e.retcode,
-                    stdout=e.stdout,
-                    stderr=e.stderr,
-                )
-            raise
+            raise self._get_command_error(e)
+
+    def stream(self, cmd, **kwargs):
+        cmd = [self.binary_path] + cmd
+        try:
+            for chunk in super(GitVcs, self).stream(cmd, **kwargs):
+                yield chunk
+        except CommandError as e:
+            raise self._get_command_error(e)
+
+    def _read_object(self, spec):
+        """
+        Reads an object through the repository's (pooled) ``git cat-file``,
+        returning None when it isn't there or the reader isn't available.
+
+        The caller should fall back to running a git command on None, which
+        also gets it the command's usual error.
+        """
+        if not self.exists():
+            return None
+        try:
+            return reader_pool.call(
+                GitObjectReader, self.path, self.get_env(), 'read_object', spec)
+        except ReaderError:
+            logging.warning('Unable to read %s from %s', spec, self.path, exc_info=True)
+            return None
+
+    def _parse_commit(self, sha, content):
+        headers, _, message = content.partition('\n\n')
+
+        author = committer = None
+        author_date = committer_date = None
+        parents = []
+        for line in headers.splitlines():
+            key, _, value = line.partition(' ')
+            if key == 'parent':
+                parents.append(value)
+            elif key == 'author':
+                author, author_date = self._parse_signature(value)
+            elif key == 'committer':
+                committer, committer_date = self._parse_signature(value)
+            elif key == 'encoding' and value.lower() not in ('utf-8', 'utf8'):
+                # git log would re-encode the message for us
+                return None
+
+        return LazyGitRevisionResult(
+            vcs=self,
+            id=sha,
+            author=author,
+            committer=committer,
+            author_date=author_date,
+            committer_date=committer_date,
+            parents=parents,
+            message=message,
+        )
+
+    def _parse_signature(self, value):
+        # "Name <email> timestamp tz"
+        name, timestamp, _ = value.rsplit(' ', 2)
+        return name, datetime.utcfromtimestamp(float(timestamp))
+
+    def _read_commit(self, treeish):
+        result = self._read_object('%s^{commit}' % (treeish,))
+        if result is None:
+            return None
+        sha, _, content = result
+        return self._parse_commit(sha, content)
 
     def clone(self):
         self.run(['clone', '--mirror', self.remote_url, self.path])
@@ -167,19 +285,48 @@ class GitVcs(Vcs):
                 )
             raise e
 
-    def log(self, parent=None, branch=None, author=None, offset=0, limit=100, paths=None):
+    def log(self, parent=None, branch=None, author=None, offset=0, limit=100,
+            paths=None, after=None):
         """ Gets the commit log for the repository.
 
         Each revision returned includes all the branches with which this commit
         is associated. There will always be at least one associated branch.
 
+        Revisions are parsed as git outputs them, and git is stopped if the
+        caller stops iterating early.
+
+        :param after: A cursor to resume from instead of an offset: the sha
+            of the last revision of a previous page from the same log. Only
+            revisions following it are returned. Needs a parent or branch.
+
         See documentation for the base for general information on this function.
         """
+        if parent and branch:
+            raise ValueError('Both parent and branch cannot be set')
+        if after and not (parent or branch):
+            raise ValueError('A parent or branch must be set to page with after')
+        # anything else could be taken as an option by git
+        if after and not FULL_SHA_RE.match(after):
+            raise ValueError('after must be a full sha')
+
         start_time = time()
 
-        # TODO(dcramer): we should make this streaming
+        # looking up a single commit (e.g. to identify a revision) doesn't
+        # need a git log of its own
+        if parent and limit == 1 and not (author or offset or paths or after):
+            revision = self._read_commit(parent)
+            if revision is not None:
+                self.log_timing('log', start_time)
+                yield revision
+                return
+
         cmd = ['log', '--date-order', '--pretty=format:%s' % (LOG_FORMAT,), '--first-parent']
 
+        # --first-parent walks a single chain of commits, so everything after
+        # a commit in the log is that commit's own log, minus itself
+        if after:
+            offset += 1
+
         if author:
             cmd.append('--author=%s' % (author,))
         if offset:
@@ -187,16 +334,16 @@ class GitVcs(Vcs):
         if limit:
             cmd.append('--max-count=%d' % (limit,))
 
-        if parent and branch:
-            raise ValueError('Both parent and branch cannot be set')
-        if branch:
+        if after:
+            cmd.append(after)
+        elif branch:
             cmd.append(branch)
 
         # TODO(dcramer): determine correct way to paginate results in git as
         # combining --all with --parent causes issues
         elif not parent:
             cmd.append('--all')
-        if parent:
+        else:
             cmd.append(parent)
 
         if paths:
@@ -204,12 +351,11 @@ class GitVcs(Vcs):
             cmd.extend([p.strip() for p in paths])
 
         try:
-            result = self.run(cmd)
+            for revision in self._parse_log(self.stream(cmd)):
+                yield revision
         except CommandError as cmd_error:
             err_msg = cmd_error.stderr
-            if branch and branch in err_msg:
-                import traceback
-                import logging
+            if branch and not after and branch in err_msg:
                 msg = traceback.format_exception(CommandError, cmd_error, None)
                 logging.warning(msg)
                 raise ValueError('Unable to fetch commit log for branch "{0}".'
@@ -218,7 +364,8 @@ class GitVcs(Vcs):
 
         self.log_timing('log', start_time)
 
-        for chunk in BufferParser(result, '\x02'):
+    def _parse_log(self, output):
+        for chunk in BufferParser(output, '\x02'):
             (sha, author, author_date, committer, committer_date,
              parents, message) = chunk.split('\x01')
 
@@ -290,23 +437,11 @@ class GitVcs(Vcs):
                                 source.patch_id.hex)),
         )
 
-    def read_file(self, sha, file_path, diff=None):
-        """Read the content of a file at a given revision.
-
-        Args:
-            sha (str): the sha identifying the revision
-            file_path (str): the path to the file from the root of the repo
-            diff (str): the optional patch to apply before reading the config
-        Returns:
-            str - the content of the file
-        Raises:
-            CommandError - if the file or the revision cannot be found
-        """
-        cmd = ['show', '{revision}:{file_path}'.format(
+    def _read_file(self, sha, file_path):
+        spec = '{revision}:{file_path}'.format(
             revision=sha, file_path=file_path
-        )]
-        content = self.run(cmd)
-        if diff is None:
-            return content
-
-        return self._selectively_apply_diff(file_path, content, diff)
+        )
+        result = self._read_object(spec)
+        if result is not None and result[1] == 'blob':
+            return result[2]
+        return self.run(['show', spec])
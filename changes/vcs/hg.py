@@ -1,5 +1,7 @@
 from __future__ import absolute_import, division, print_function
 
+import logging
+
 from datetime import datetime
 from rfc822 import parsedate_tz, mktime_tz
 from urlparse import urlparse
@@ -8,6 +10,11 @@ from time import time
 from changes.utils.http import build_uri
 
 from .base import Vcs, RevisionResult, BufferParser, CommandError, UnknownRevision
+from .readers import HgCommandServer, ReaderError, reader_pool
+
+# Read-only commands, which are run through the repository's (pooled)
+# command server rather than a new hg process.
+SERVER_COMMANDS = frozenset(['branches', 'cat', 'debugancestor', 'diff', 'log', 'status'])
 
 LOG_FORMAT = '{node}\x01{author}\x01{date|rfc822date}\x01{p1node} {p2node}\x01{branches}\x01{desc}\x02'
 
@@ -77,12 +84,15 @@ class MercurialVcs(Vcs):
         return url
 
     def run(self, cmd, **kwargs):
+        use_server = cmd[0] in SERVER_COMMANDS and not kwargs
         cmd = [
             self.binary_path,
             '--config',
             'ui.ssh={0}'.format(self.ssh_connect_path)
         ] + cmd
         try:
+            if use_server and self.exists():
+                return self._run_in_server(cmd)
             return super(MercurialVcs, self).run(cmd, **kwargs)
         except CommandError as e:
             if "abort: unknown revision '" in e.stderr:
@@ -94,13 +104,26 @@ class MercurialVcs(Vcs):
                 )
             raise
 
+    def _run_in_server(self, cmd):
+        try:
+            retcode, stdout, stderr = reader_pool.call(
+                HgCommandServer, self.path, self.get_env(), 'run_command', cmd[1:])
+        except ReaderError:
+            logging.warning('Unable to use command server for %s', self.path, exc_info=True)
+            return super(MercurialVcs, self).run(cmd)
+
+        if retcode != 0:
+            raise CommandError(cmd, retcode, stdout, stderr)
+        return stdout
+
     def clone(self):
         self.run(['clone', '--uncompressed', self.remote_url, self.path])
 
     def update(self):
         self.run(['pull'])
 
-    def log(self, parent=None, branch=None, author=None, offset=0, limit=100, paths=None):
+    def log(self, parent=None, branch=None, author=None, offset=0, limit=100,
+            paths=None, after=None):
         """ Gets the commit log for the repository.
 
         Each revision returned has exactly one branch name associated with it.
@@ -115,6 +138,10 @@ class MercurialVcs(Vcs):
 
         if parent and branch:
             raise ValueError('Both parent and branch cannot be set')
+        if after:
+            # the log is ordered by revision number rather than walked from
+            # a commit, so there's no cheap way to resume from one
+            raise ValueError('Paging with after is not supported for mercurial')
 
         # Build the -r parameter value into r_str with branch, parent and author
         r_str = None
@@ -224,20 +251,5 @@ class MercurialVcs(Vcs):
                                 source.patch_id.hex)),
         )
 
-    def read_file(self, sha, file_path, diff=None):
-        """Read the content of a file at a given revision.
-
-        Args:
-            sha (str): the sha identifying the revision
-            file_path (str): the path to the file from the root of the repo
-            diff (str): the optional patch to apply before reading the config
-        Returns:
-            str - the content of the file
-        Raises:
-            CommandError - if the file or the revision cannot be found
-        """
-        content = self.run(['cat', '-r', sha, file_path])
-        if diff is None:
-            return content
-
-        return self._selectively_apply_diff(file_path, content, diff)
+    def _read_file(self, sha, file_path):
+        return self.run(['cat', '-r', sha, file_path])
@@ -0,0 +1,226 @@
+"""
+Long-lived git and hg processes which read from a repository without forking
+a new command for every read.
+
+Each process (worker) keeps at most one reader per repository path, in
+``reader_pool``. Readers are restarted when they die, when they get old, or
+when the repository's directory changes (e.g. it's fetched into or
+re-cloned).
+"""
+
+from __future__ import absolute_import
+
+import os
+import struct
+
+from subprocess import Popen, PIPE
+from threading import Lock
+from time import time
+
+# Readers are restarted after this many seconds, so that nothing a reader
+# caches about the repository (e.g. the refs) goes stale for long.
+MAX_READER_AGE = 600
+
+
+class ReaderError(Exception):
+    """The reader process went away or said something we didn't expect.
+
+    Callers should fall back to running the equivalent command."""
+    pass
+
+
+def _get_identity(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino, st.st_ctime)
+
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+class Reader(object):
+    command = None
+
+    def __init__(self, path, env=None):
+        self.path = path
+        self.identity = _get_identity(path)
+        self.date_started = time()
+        self.lock = Lock()
+
+        with open(os.devnull, 'w') as devnull:
+            self.proc = Popen(
+                self.command, cwd=path, env=env,
+                stdin=PIPE, stdout=PIPE, stderr=devnull,
+            )
+
+    def is_usable(self):
+        return (
+            self.proc.poll() is None and
+            time() - self.date_started < MAX_READER_AGE and
+            _get_identity(self.path) == self.identity
+        )
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+            self.proc.wait()
+        except EnvironmentError:
+            pass
+
+    def _write(self, data):
+        self.proc.stdin.write(data)
+        self.proc.stdin.flush()
+
+    def _read(self, size):
+        data = self.proc.stdout.read(size)
+        if len(data) != size:
+            raise ReaderError('Unexpected end of output from %r' % (self.command,))
+        return data
+
+
+class GitObjectReader(Reader):
+    """
+    Reads objects through ``git cat-file --batch``.
+    """
+    command = ['git', 'cat-file', '--batch']
+
+    def read_object(self, spec):
+        """
+        Returns an ``(sha, type, content)`` tuple for the object named by
+        ``spec`` (anything ``git rev-parse`` understands), or None if there's
+        no such object.
+        """
+        spec = _encode(spec)
+        if '\n' in spec:
+            return None
+
+        with self.lock:
+            self._write(spec + '\n')
+            header = self.proc.stdout.readline()
+            if not header.endswith('\n'):
+                raise ReaderError('Unexpected end of output from %r' % (self.command,))
+
+            # "<sha> <type> <size>", or "<spec> missing" (or "ambiguous")
+            parts = header.split()
+            if len(parts) != 3 or not parts[2].isdigit():
+                return None
+            sha, obj_type, size = parts
+            content = self._read(int(size) + 1)[:-1]
+
+        return sha, obj_type, content
+
+
+class HgCommandServer(Reader):
+    """
+    Runs commands through ``hg serve --cmdserver pipe``.
+
+    See https://www.mercurial-scm.org/wiki/CommandServer for the protocol.
+    """
+    command = ['hg', 'serve', '--cmdserver', 'pipe']
+
+    def __init__(self, path, env=None):
+        super(HgCommandServer, self).__init__(path, env=env)
+
+        channel, data = self._read_channel()
+        if channel != 'o' or 'runcommand' not in data:
+            self.close()
+            raise ReaderError('Unexpected hello from command server: %r' % (data,))
+
+    def _read_channel(self):
+        channel, length = struct.unpack('>cI', self._read(5))
+        # input channels carry the size wanted, rather than any data
+        if channel in 'IL':
+            return channel, length
+        return channel, self._read(length)
+
+    def run_command(self, args):
+        """
+        Runs ``hg <args>``, returning a ``(retcode, stdout, stderr)`` tuple.
+        """
+        data = '\0'.join(_encode(a) for a in args)
+
+        stdout, stderr = [], []
+        with self.lock:
+            self._write('runcommand\n' + struct.pack('>I', len(data)) + data)
+            while True:
+                channel, data = self._read_channel()
+                if channel == 'o':
+                    stdout.append(data)
+                elif channel == 'e':
+                    stderr.append(data)
+                elif channel == 'r':
+                    retcode = struct.unpack('>i', data)[0]
+                    return retcode, ''.join(stdout), ''.join(stderr)
+                elif channel in 'IL':
+                    # we never have any input to give
+                    self._write(struct.pack('>I', 0))
+                elif channel.isupper():
+                    raise ReaderError('Unexpected required channel %r' % (channel,))
+
+
+class ReaderPool(object):
+    """
+    The readers of the current process, one per reader type and repository
+    path.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.readers = {}
+        self.pid = os.getpid()
+
+    def get(self, cls, path, env=None):
+        with self.lock:
+            if self.pid != os.getpid():
+                # we've been forked, and the pipes belong to our parent
+                self.readers = {}
+                self.pid = os.getpid()
+
+            key = (cls, path)
+            reader = self.readers.get(key)
+            if reader is not None and not reader.is_usable():
+                del self.readers[key]
+                reader.close()
+                reader = None
+            if reader is None:
+                reader = cls(path, env=env)
+                self.readers[key] = reader
+            return reader
+
+    def discard(self, reader):
+        with self.lock:
+            key = (type(reader), reader.path)
+            if self.readers.get(key) is reader:
+                del self.readers[key]
+        reader.close()
+
+    def call(self, cls, path, env, method, *args):
+        """
+        Calls ``method`` on the reader for ``path``, starting one if needed.
+
+        A reader which fails is discarded, and ReaderError is raised.
+        """
+        try:
+            reader = self.get(cls, path, env=env)
+        except (EnvironmentError, ReaderError, struct.error) as e:
+            raise ReaderError(unicode(e))
+
+        try:
+            return getattr(reader, method)(*args)
+        except (EnvironmentError, ReaderError, ValueError, struct.error) as e:
+            self.discard(reader)
+            raise ReaderError(unicode(e))
+
+    def close_all(self):
+        with self.lock:
+            readers, self.readers = self.readers.values(), {}
+        for reader in readers:
+            reader.close()
+
+
+reader_pool = ReaderPool()
@@ -0,0 +1,67 @@
+"""add project daily stats
+
+Revision ID: 3f9b2d6e8a14
+Revises: 5e1a3c8d2f47
+Create Date: 2026-10-18 20:31:44.270913
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3f9b2d6e8a14'
+down_revision = '5e1a3c8d2f47'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        'projectdailystat',
+        sa.Column('id', sa.GUID(), nullable=False),
+        sa.Column('project_id', sa.GUID(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('total_builds', sa.Integer(), nullable=False),
+        sa.Column('green_builds', sa.Integer(), nullable=False),
+        sa.Column('green_duration_total', sa.BigInteger(), nullable=False),
+        sa.Column('green_duration_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['project.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('project_id', 'date', name='unq_projectdailystat_date')
+    )
+    op.create_index('idx_projectdailystat_date', 'projectdailystat', ['date'])
+
+    op.create_table(
+        'projectdailyfailurestat',
+        sa.Column('id', sa.GUID(), nullable=False),
+        sa.Column('project_id', sa.GUID(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('reason', sa.String(length=32), nullable=False),
+        sa.Column('num_builds', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['project.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('project_id', 'date', 'reason', name='unq_projectdailyfailurestat_reason')
+    )
+    op.create_index('idx_projectdailyfailurestat_date', 'projectdailyfailurestat', ['date'])
+
+    op.create_table(
+        'projectdailyslowtest',
+        sa.Column('id', sa.GUID(), nullable=False),
+        sa.Column('project_id', sa.GUID(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('build_id', sa.GUID(), nullable=False),
+        sa.Column('label_sha', sa.String(length=40), nullable=False),
+        sa.Column('name', sa.Text(), nullable=False),
+        sa.Column('package', sa.Text(), nullable=True),
+        sa.Column('duration', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['project.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['build_id'], ['build.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_projectdailyslowtest_date', 'projectdailyslowtest', ['date'])
+    op.create_index('idx_projectdailyslowtest_project_date', 'projectdailyslowtest', ['project_id', 'date'])
+
+
+def downgrade():
+    op.drop_table('projectdailyslowtest')
+    op.drop_table('projectdailyfailurestat')
+    op.drop_table('projectdailystat')
@@ -0,0 +1,33 @@
+"""add testdurationindex
+
+Revision ID: 4c2d7e9a1b05
+Revises: 2b8e4c1f7a31
+Create Date: 2026-10-18 13:40:21.604113
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4c2d7e9a1b05'
+down_revision = '2b8e4c1f7a31'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        'testdurationindex',
+        sa.Column('project_id', sa.GUID(), nullable=False),
+        sa.Column('last_build_id', sa.GUID(), nullable=True),
+        sa.Column('num_builds', sa.Integer(), nullable=False),
+        sa.Column('avg_test_time', sa.Integer(), nullable=False),
+        sa.Column('durations', sa.JSONEncodedDict(), nullable=False),
+        sa.Column('date_modified', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['project.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['last_build_id'], ['build.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('project_id')
+    )
+
+
+def downgrade():
+    op.drop_table('testdurationindex')
@@ -0,0 +1,50 @@
+"""add projecttestsnapshot
+
+Revision ID: 5e1a3c8d2f47
+Revises: 4c2d7e9a1b05
+Create Date: 2026-10-18 19:52:10.318245
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5e1a3c8d2f47'
+down_revision = '4c2d7e9a1b05'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        'projecttestsnapshot',
+        sa.Column('project_id', sa.GUID(), nullable=False),
+        sa.Column('build_id', sa.GUID(), nullable=True),
+        sa.Column('sep', sa.String(length=1), nullable=False),
+        sa.Column('num_tests', sa.Integer(), nullable=False),
+        sa.Column('groups', sa.JSONEncodedDict(), nullable=False),
+        sa.Column('date_build', sa.DateTime(), nullable=True),
+        sa.Column('date_modified', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['project.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['build_id'], ['build.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('project_id')
+    )
+
+    op.create_table(
+        'projecttestsnapshotcase',
+        sa.Column('id', sa.GUID(), nullable=False),
+        sa.Column('project_id', sa.GUID(), nullable=False),
+        sa.Column('label_sha', sa.String(length=40), nullable=False),
+        sa.Column('name', sa.Text(), nullable=False),
+        sa.Column('package', sa.Text(), nullable=True),
+        sa.Column('duration', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['project_id'], ['project.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'project_id', 'label_sha', name='unq_projecttestsnapshotcase_name')
+    )
+    op.create_index('idx_projecttestsnapshotcase_duration', 'projecttestsnapshotcase', ['project_id', 'duration'])
+
+
+def downgrade():
+    op.drop_table('projecttestsnapshotcase')
+    op.drop_table('projecttestsnapshot')
@@ -0,0 +1,33 @@
+"""add buildtestchanges
+
+Revision ID: 6a4c1e8f3b52
+Revises: 3f9b2d6e8a14
+Create Date: 2026-10-18 21:14:07.519362
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '6a4c1e8f3b52'
+down_revision = '3f9b2d6e8a14'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table(
+        'buildtestchanges',
+        sa.Column('build_id', sa.GUID(), nullable=False),
+        sa.Column('previous_build_id', sa.GUID(), nullable=False),
+        sa.Column('num_added', sa.Integer(), nullable=False),
+        sa.Column('num_removed', sa.Integer(), nullable=False),
+        sa.Column('changes', sa.JSONEncodedDict(), nullable=False),
+        sa.Column('date_created', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['build_id'], ['build.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['previous_build_id'], ['build.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('build_id')
+    )
+
+
+def downgrade():
+    op.drop_table('buildtestchanges')
@@ -1,4 +1,7 @@
-from changes.api.serializer import serialize
+from datetime import datetime
+from uuid import UUID
+
+from changes.api.serializer import Crumbler, get_crumbler, serialize
 
 
 def test_identity():
@@ -14,3 +17,65 @@ def test_identity():
     ]
     for val in passthrough:
         assert serialize(val) == val
+
+
+def test_subclass():
+    """Verify that subclasses of registered types use the parent's crumbler."""
+    class MyDateTime(datetime):
+        pass
+
+    assert get_crumbler(MyDateTime(2015, 1, 1), {}) is get_crumbler(datetime(2015, 1, 1), {})
+    assert serialize(MyDateTime(2015, 1, 1)) == '2015-01-01T00:00:00'
+
+
+class Parent(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class Child(object):
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+
+
+class BatchCrumbler(Crumbler):
+    def __init__(self):
+        self.batches = []
+
+    def get_extra_attrs_from_db(self, item_list):
+        self.batches.append(len(item_list))
+        return dict((item, {'upper': item.name.upper()}) for item in item_list)
+
+
+class ParentCrumbler(BatchCrumbler):
+    def crumble(self, item, attrs):
+        return {'name': item.name, 'upper': attrs['upper']}
+
+
+class ChildCrumbler(BatchCrumbler):
+    def crumble(self, item, attrs):
+        return {'name': item.name, 'parent': item.parent, 'id': UUID(int=1)}
+
+
+def test_batched_by_level():
+    """Verify that nested objects are crumbled in one batch per level."""
+    registry = {Parent: ParentCrumbler(), Child: ChildCrumbler()}
+    parents = [Parent('a'), Parent('b')]
+
+    result = serialize({
+        'children': [Child('x', parents[0]), Child('y', parents[1])],
+        'other': {'child': Child('z', parents[0])},
+    }, registry)
+
+    assert result == {
+        'children': [
+            {'name': 'x', 'parent': {'name': 'a', 'upper': 'A'}, 'id': UUID(int=1).hex},
+            {'name': 'y', 'parent': {'name': 'b', 'upper': 'B'}, 'id': UUID(int=1).hex},
+        ],
+        'other': {
+            'child': {'name': 'z', 'parent': {'name': 'a', 'upper': 'A'}, 'id': UUID(int=1).hex},
+        },
+    }
+    assert registry[Child].batches == [3]
+    assert registry[Parent].batches == [3]
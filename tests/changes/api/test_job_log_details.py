@@ -1,4 +1,5 @@
 from changes.config import db
+from changes.lib.log_chunks import compact_logsource
 from changes.models import LogSource, LogChunk
 from changes.testutils import APITestCase
 
@@ -61,3 +62,44 @@ class JobLogDetailsTest(APITestCase):
         assert resp.status_code == 200
         assert resp.headers['Content-Type'] == 'text/plain; charset=utf-8'
         assert resp.data == lc1.text + lc2.text
+
+    def test_archived(self):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        source = LogSource(job=job, project=project, name='test')
+        db.session.add(source)
+
+        lc1 = LogChunk(
+            job=job, project=project, source=source,
+            offset=0, size=100, text='a' * 100,
+        )
+        db.session.add(lc1)
+        lc2 = LogChunk(
+            job=job, project=project, source=source,
+            offset=100, size=100, text='b' * 100,
+        )
+        db.session.add(lc2)
+        db.session.commit()
+
+        compact_logsource(source)
+        assert LogChunk.query.filter(LogChunk.source_id == source.id).count() == 0
+
+        path = '/api/0/jobs/{0}/logs/{1}/'.format(
+            job.id.hex, source.id.hex)
+
+        resp = self.client.get(path)
+        assert resp.status_code == 200
+        data = self.unserialize(resp)
+        assert data['nextOffset'] == 201
+        assert ''.join(c['text'] for c in data['chunks']) == lc1.text + lc2.text
+
+        resp = self.client.get(path + '?offset=200')
+        assert resp.status_code == 200
+        data = self.unserialize(resp)
+        assert data['nextOffset'] == 200
+        assert data['chunks'] == []
+
+        resp = self.client.get(path + '?raw=1')
+        assert resp.status_code == 200
+        assert resp.data == lc1.text + lc2.text
@@ -0,0 +1,114 @@
+import json
+
+from changes.constants import Status
+from changes.lib.log_chunks import compact_logsource
+from changes.testutils import APITestCase
+
+
+def parse_events(data):
+    events = []
+    for block in data.split('\n\n'):
+        event = {}
+        for line in block.splitlines():
+            if line.startswith(':'):
+                continue
+            key, _, value = line.partition(': ')
+            event[key] = value
+        if event:
+            events.append(event)
+    return events
+
+
+class JobLogTailTest(APITestCase):
+    def setUp(self):
+        super(JobLogTailTest, self).setUp()
+        self.project = self.create_project()
+        self.build = self.create_build(self.project)
+
+    def create_source_with_chunks(self, job):
+        source = self.create_logsource(job=job, name='test')
+        self.create_logchunk(source, text='a' * 100, offset=0)
+        self.create_logchunk(source, text='b' * 100, offset=100)
+        return source
+
+    def test_finished(self):
+        job = self.create_job(self.build, status=Status.finished)
+        source = self.create_source_with_chunks(job)
+
+        path = '/api/0/jobs/{0}/logs/{1}/tail/'.format(
+            job.id.hex, source.id.hex)
+
+        resp = self.client.get(path)
+        assert resp.status_code == 200
+        assert resp.headers['Content-Type'].startswith('text/event-stream')
+        events = parse_events(resp.data)
+        assert len(events) == 2
+        assert events[0]['id'] == '200'
+        data = json.loads(events[0]['data'])
+        assert data['offset'] == 0
+        assert data['size'] == 200
+        assert data['text'] == 'a' * 100 + 'b' * 100
+        assert events[1]['event'] == 'end'
+
+        resp = self.client.get(path + '?offset=150')
+        events = parse_events(resp.data)
+        assert len(events) == 2
+        assert json.loads(events[0]['data'])['text'] == 'b' * 50
+
+        resp = self.client.get(path, headers={'Last-Event-ID': '200'})
+        events = parse_events(resp.data)
+        assert len(events) == 1
+        assert events[0]['event'] == 'end'
+
+    def test_in_progress(self):
+        job = self.create_job(self.build, status=Status.in_progress)
+        source = self.create_source_with_chunks(job)
+
+        path = '/api/0/jobs/{0}/logs/{1}/tail/?offset=100&timeout=0'.format(
+            job.id.hex, source.id.hex)
+
+        resp = self.client.get(path)
+        assert resp.status_code == 200
+        events = parse_events(resp.data)
+        assert len(events) == 1
+        assert events[0]['id'] == '200'
+        assert json.loads(events[0]['data'])['text'] == 'b' * 100
+
+    def test_archived(self):
+        job = self.create_job(self.build, status=Status.finished)
+        source = self.create_source_with_chunks(job)
+        compact_logsource(source)
+
+        path = '/api/0/jobs/{0}/logs/{1}/tail/?offset=50'.format(
+            job.id.hex, source.id.hex)
+
+        resp = self.client.get(path)
+        events = parse_events(resp.data)
+        assert len(events) == 2
+        assert events[0]['id'] == '200'
+        assert json.loads(events[0]['data'])['text'] == 'a' * 50 + 'b' * 100
+        assert events[1]['event'] == 'end'
+
+    def test_invalid_args(self):
+        job = self.create_job(self.build, status=Status.finished)
+        source = self.create_source_with_chunks(job)
+
+        path = '/api/0/jobs/{0}/logs/{1}/tail/'.format(
+            job.id.hex, source.id.hex)
+
+        resp = self.client.get(path + '?offset=foo')
+        assert resp.status_code == 400
+
+        resp = self.client.get(path + '?timeout=foo')
+        assert resp.status_code == 400
+
+        resp = self.client.get(path, headers={'Last-Event-ID': 'foo'})
+        assert resp.status_code == 400
+
+    def test_missing(self):
+        job = self.create_job(self.build)
+        path = '/api/0/jobs/{0}/logs/{1}/tail/'.format(
+            job.id.hex, job.id.hex)
+
+        resp = self.client.get(path)
+        assert resp.status_code == 404
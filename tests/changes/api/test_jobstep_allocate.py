@@ -34,8 +34,9 @@ class JobStepAllocateTest(APITestCase):
         assert resp.status_code == 200, resp
         assert resp.data == '[]', resp.data
 
+    @patch('changes.api.jobstep_allocate.supports_skip_locked', return_value=False)
     @patch('changes.config.redis.lock',)
-    def test_cant_allocate(self, mock_allocate):
+    def test_cant_allocate(self, mock_allocate, mock_supports_skip_locked):
         project = self.create_project()
         build = self.create_build(project)
         job = self.create_job(build)
@@ -112,3 +113,52 @@ class JobStepAllocateTest(APITestCase):
         resp = self.post_simple()
         assert resp.status_code == 200, resp.data
         assert resp.data == '[]', 'Expecting no content'
+
+    @patch('changes.buildsteps.base.BuildStep.get_allocation_command',)
+    def test_fair_between_projects(self, mock_get_allocation_command):
+        mock_get_allocation_command.return_value = 'echo 1'
+
+        jobsteps = []
+        for num_steps in (3, 1):
+            project = self.create_project()
+            build = self.create_build(project, status=Status.pending_allocation)
+            job = self.create_job(build)
+            jobphase = self.create_jobphase(job)
+            plan = self.create_plan(project)
+            self.create_step(plan)
+            self.create_job_plan(job, plan)
+            jobsteps.append([
+                self.create_jobstep(jobphase, status=Status.pending_allocation)
+                for _ in range(num_steps)
+            ])
+
+        # the second project's step is the newest, but it still gets a turn
+        resp = self.post_simple()
+        assert resp.status_code == 200
+        data = self.unserialize(resp)
+        assert [d['id'] for d in data] == [jobsteps[0][0].id.hex, jobsteps[1][0].id.hex]
+
+    @patch('changes.buildsteps.base.BuildStep.get_allocation_command',)
+    def test_packs_resources(self, mock_get_allocation_command):
+        mock_get_allocation_command.return_value = 'echo 1'
+
+        project = self.create_project()
+        build = self.create_build(project, status=Status.pending_allocation)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        plan = self.create_plan(project)
+        self.create_step(plan)
+        self.create_job_plan(job, plan)
+
+        big = self.create_jobstep(jobphase, status=Status.pending_allocation,
+                                  data={'cpus': 6, 'mem': 1024})
+        self.create_jobstep(jobphase, status=Status.pending_allocation,
+                            data={'cpus': 4, 'mem': 1024})
+        small = self.create_jobstep(jobphase, status=Status.pending_allocation,
+                                    data={'cpus': 2, 'mem': 1024})
+
+        # the middle step doesn't fit alongside the first, but the last does
+        resp = self.post_simple()
+        assert resp.status_code == 200
+        data = self.unserialize(resp)
+        assert [d['id'] for d in data] == [big.id.hex, small.id.hex]
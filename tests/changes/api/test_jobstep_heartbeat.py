@@ -1,7 +1,13 @@
+import mock
+
+from datetime import datetime
+from flask import current_app
 from uuid import uuid4
 
 from changes.config import db
 from changes.constants import Result, Status
+from changes.lib.heartbeats import get_last_heartbeat
+from changes.models import JobStep
 from changes.testutils import APITestCase
 
 
@@ -32,3 +38,21 @@ class JobStepHeartbeatTest(APITestCase):
 
         resp = self.client.post(path)
         assert resp.status_code == 410
+
+    def test_write_behind(self):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase)
+
+        path = '/api/0/jobsteps/{0}/heartbeat/'.format(jobstep.id.hex)
+
+        with mock.patch.dict(current_app.config, {'JOBSTEP_HEARTBEAT_WRITE_BEHIND': True}):
+            resp = self.client.post(path, data={'date': '2013-09-19T22:15:22.000000Z'})
+            assert resp.status_code == 200
+
+            db.session.expire_all()
+            jobstep = JobStep.query.get(jobstep.id)
+            assert jobstep.last_heartbeat is None
+            assert get_last_heartbeat(jobstep) == datetime(2013, 9, 19, 22, 15, 22)
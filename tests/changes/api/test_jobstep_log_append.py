@@ -1,3 +1,4 @@
+from changes.lib.log_chunks import compact_logsource
 from changes.models import LogSource, LogChunk
 from changes.testutils import APITestCase
 
@@ -111,3 +112,43 @@ class JobStepLogAppendTest(APITestCase):
         logchunk = LogChunk.query.get(data['chunks'][0]['id'])
         assert logchunk.offset == 13
         assert logchunk.size == 9
+
+    def test_after_compaction(self):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase)
+        logsource = self.create_logsource(step=jobstep, name='stderr')
+        self.create_logchunk(source=logsource, text='hello world!\n')
+
+        archive = compact_logsource(logsource)
+        assert archive.size == 13
+
+        path = '/api/0/jobsteps/{0}/logappend/'.format(jobstep.id.hex)
+
+        # a late append goes after the archived text, not over it
+        resp = self.client.post(path, data={
+            'source': 'stderr',
+            'text': 'foo bar?\n',
+        })
+        assert resp.status_code == 200, resp.data
+        data = self.unserialize(resp)
+        assert len(data['chunks']) == 1
+        logchunk = LogChunk.query.get(data['chunks'][0]['id'])
+        assert logchunk.offset == 13
+        assert logchunk.size == 9
+
+        resp = self.client.post(path, data={
+            'source': 'stderr',
+            'offset': 22,
+            'text': 'zoom zoom\n',
+        })
+        assert resp.status_code == 200, resp.data
+        data = self.unserialize(resp)
+        logchunk = LogChunk.query.get(data['chunks'][0]['id'])
+        assert logchunk.offset == 22
+
+        assert LogChunk.query.filter(
+            LogChunk.source_id == logsource.id,
+        ).count() == 2
@@ -1,5 +1,6 @@
 import mock
 
+from base64 import urlsafe_b64encode
 from datetime import datetime
 from uuid import uuid4
 
@@ -50,7 +51,7 @@ class ProjectCommitIndexTest(APITestCase):
 
     @mock.patch('changes.models.Repository.get_vcs')
     def test_with_vcs(self, get_vcs):
-        def log_results(parent=None, branch=None, offset=0, limit=100, paths=None):
+        def log_results(parent=None, branch=None, offset=0, limit=100, paths=None, after=None):
             assert not branch
             results = [
                 RevisionResult(
@@ -101,9 +102,52 @@ class ProjectCommitIndexTest(APITestCase):
         assert len(data) == 1
         assert data[0]['id'] == 'b' * 40
 
+    @mock.patch('changes.models.Repository.get_vcs')
+    def test_with_vcs_cursor(self, get_vcs):
+        shas = [c * 40 for c in 'abcd']
+
+        def log_results(parent=None, branch=None, offset=0, limit=100, paths=None, after=None):
+            assert branch == 'master'
+            assert offset == 0
+            start = shas.index(after) + 1 if after else 0
+            return iter([
+                RevisionResult(
+                    id=sha,
+                    message='hello world',
+                    author='Foo <foo@example.com>',
+                    author_date=datetime(2013, 9, 19, 22, 15, 22),
+                ) for sha in shas[start:start + limit]
+            ])
+
+        fake_vcs = mock.Mock(spec=Vcs)
+        fake_vcs.log.side_effect = log_results
+        get_vcs.return_value = fake_vcs
+
+        project = self.create_project()
+
+        path = '/api/0/projects/{0}/commits/?branch=master&per_page=2'.format(project.id.hex)
+
+        resp = self.client.get(path + '&after=' + urlsafe_b64encode('a' * 40))
+        assert resp.status_code == 200
+        data = self.unserialize(resp)
+        assert [d['id'] for d in data] == ['b' * 40, 'c' * 40]
+        assert 'after={0}'.format(urlsafe_b64encode('c' * 40)) in resp.headers['Link']
+
+        resp = self.client.get(path + '&after=' + urlsafe_b64encode('c' * 40))
+        assert resp.status_code == 200
+        data = self.unserialize(resp)
+        assert [d['id'] for d in data] == ['d' * 40]
+        assert 'rel="next"' not in resp.headers.get('Link', '')
+
+        # only shas make it to the vcs
+        fake_vcs.log.reset_mock()
+        resp = self.client.get(path + '&after=' + urlsafe_b64encode('--output=/tmp/foo'))
+        assert resp.status_code == 400
+        assert not fake_vcs.log.called
+
     @mock.patch('changes.models.Repository.get_vcs')
     def test_with_vcs_filtering(self, get_vcs):
-        def log_results(parent=None, branch=None, offset=0, limit=100, paths=None):
+        def log_results(parent=None, branch=None, offset=0, limit=100, paths=None, after=None):
             results = [
                 RevisionResult(
                     id='a' * 40,
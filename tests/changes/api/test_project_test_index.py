@@ -1,6 +1,7 @@
 from uuid import uuid4
 
 from changes.constants import Result, Status
+from changes.lib.test_snapshot import update_project_test_snapshot
 from changes.testutils import APITestCase
 
 
@@ -72,3 +73,33 @@ class ProjectTestIndexTest(APITestCase):
         assert resp.status_code == 200
         data = self.unserialize(resp)
         assert len(data) == 0
+
+    def test_snapshot(self):
+        project = self.create_project()
+        build = self.create_build(project, status=Status.finished, result=Result.passed)
+        job = self.create_job(build)
+        test = self.create_test(job=job, name='foo.bar', duration=50)
+        test2 = self.create_test(job=job, name='foo.baz', duration=70)
+
+        update_project_test_snapshot(build)
+
+        path = '/api/0/projects/{0}/tests/?sort=duration'.format(project.id.hex)
+
+        resp = self.client.get(path)
+        assert resp.status_code == 200
+        data = self.unserialize(resp)
+        assert len(data) == 2
+        assert data[0]['hash'] == test2.name_sha
+        assert data[0]['project']['id'] == project.id.hex
+        assert data[0]['package'] == 'foo'
+        assert data[0]['shortName'] == 'baz'
+        assert data[0]['duration'] == 70
+        assert data[1]['hash'] == test.name_sha
+
+        path = '/api/0/projects/{0}/tests/?query=bar&min_duration=50'.format(project.id.hex)
+
+        resp = self.client.get(path)
+        assert resp.status_code == 200
+        data = self.unserialize(resp)
+        assert len(data) == 1
+        assert data[0]['hash'] == test.name_sha
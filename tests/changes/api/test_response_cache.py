@@ -0,0 +1,97 @@
+import json
+import mock
+
+from flask import current_app
+
+from changes.api import response_cache
+from changes.config import db
+from changes.constants import Status
+from changes.listeners.response_cache import build_finished_handler
+from changes.models import HistoricalImmutableStep
+from changes.testutils import APITestCase
+
+
+class ResponseCacheTest(APITestCase):
+    def setUp(self):
+        super(ResponseCacheTest, self).setUp()
+        patcher = mock.patch.dict(current_app.config, {
+            'API_RESPONSE_CACHE_ENABLED': True,
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_status_counts(self):
+        resp = self.client.get('/api/0/systemstats/')
+        assert resp.status_code == 200
+        return resp, json.loads(resp.data)['statusCounts']
+
+    def test_cached(self):
+        project = self.create_project()
+        self.create_build(project, status=Status.in_progress)
+
+        resp, counts = self.get_status_counts()
+        etag = resp.headers['ETag']
+        assert etag
+
+        # not seen until the cache is invalidated
+        self.create_build(project, status=Status.in_progress)
+        resp, cached_counts = self.get_status_counts()
+        assert cached_counts == counts
+        assert resp.headers['ETag'] == etag
+
+        resp = self.client.get('/api/0/systemstats/', headers={
+            'If-None-Match': etag,
+        })
+        assert resp.status_code == 304
+        assert resp.data == ''
+
+        response_cache.invalidate('system')
+        resp, new_counts = self.get_status_counts()
+        assert new_counts != counts
+        assert resp.headers['ETag'] != etag
+
+    def test_build_finished(self):
+        project = self.create_project()
+        build = self.create_build(project, status=Status.in_progress)
+
+        path = '/api/0/builds/{0}/'.format(build.id.hex)
+        resp = self.client.get(path)
+        assert json.loads(resp.data)['status']['id'] == 'in_progress'
+
+        build.status = Status.finished
+        db.session.add(build)
+        db.session.commit()
+
+        resp = self.client.get(path)
+        assert json.loads(resp.data)['status']['id'] == 'in_progress'
+
+        build_finished_handler(build_id=build.id.hex)
+
+        resp = self.client.get(path)
+        assert json.loads(resp.data)['status']['id'] == 'finished'
+
+    @mock.patch.object(HistoricalImmutableStep, 'get_implementation')
+    def test_build_cancelled(self, get_implementation):
+        get_implementation.return_value = mock.Mock()
+
+        project = self.create_project()
+        build = self.create_build(project, status=Status.in_progress)
+        job = self.create_job(build=build, status=Status.in_progress)
+        plan = self.create_plan(project)
+        self.create_step(plan)
+        self.create_job_plan(job, plan)
+
+        path = '/api/0/builds/{0}/'.format(build.id.hex)
+        resp = self.client.get(path)
+        assert json.loads(resp.data)['status']['id'] == 'in_progress'
+
+        resp = self.client.post(path + 'cancel/')
+        assert resp.status_code == 200
+
+        resp = self.client.get(path)
+        assert json.loads(resp.data)['status']['id'] == 'finished'
+
+    def test_disabled(self):
+        with mock.patch.dict(current_app.config, {'API_RESPONSE_CACHE_ENABLED': False}):
+            resp, _ = self.get_status_counts()
+        assert 'ETag' not in resp.headers
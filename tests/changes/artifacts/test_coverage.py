@@ -182,3 +182,47 @@ class CoverageHandlerTest(TestCase):
         assert file_cov[1].lines_uncovered == 1
         assert file_cov[1].diff_lines_covered == 1
         assert file_cov[1].diff_lines_uncovered == 1
+
+    @patch.object(CoverageHandler, 'get_coverage')
+    @patch.object(CoverageHandler, 'process_diff')
+    def test_process_duplicate_files(self, process_diff, get_coverage):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase)
+
+        handler = CoverageHandler(jobstep)
+
+        process_diff.return_value = {
+            'setup.py': set([1, 2]),
+        }
+
+        # the same file can be reported by several classes in one report
+        get_coverage.return_value = [FileCoverage(
+            job_id=job.id,
+            step_id=jobstep.id,
+            project_id=project.id,
+            filename='setup.py',
+            data='CUNN',
+        ), FileCoverage(
+            job_id=job.id,
+            step_id=jobstep.id,
+            project_id=project.id,
+            filename='setup.py',
+            data='NNUC',
+        )]
+
+        results = handler.process(StringIO())
+        assert len(results) == 1
+
+        file_cov = list(FileCoverage.query.filter(
+            FileCoverage.job_id == job.id,
+        ))
+        assert len(file_cov) == 1
+        assert file_cov[0].filename == 'setup.py'
+        assert file_cov[0].data == 'CUUC'
+        assert file_cov[0].lines_covered == 2
+        assert file_cov[0].lines_uncovered == 2
+        assert file_cov[0].diff_lines_covered == 1
+        assert file_cov[0].diff_lines_uncovered == 1
@@ -135,6 +135,76 @@ E   ZeroDivisionError: integer division or modulo by zero"""
     assert r2.reruns == 0
 
 
+def test_iter_test_batches():
+    jobstep = JobStep(
+        id=uuid.uuid4(),
+        project_id=uuid.uuid4(),
+        job_id=uuid.uuid4(),
+    )
+
+    handler = XunitHandler(jobstep)
+    expected = handler.get_tests(StringIO(SAMPLE_XUNIT))
+
+    batches = list(handler.iter_test_batches(StringIO(SAMPLE_XUNIT), 1))
+
+    assert [len(b) for b in batches] == [1, 1]
+    results = batches[0] + batches[1]
+    for r, e in zip(results, expected):
+        assert type(r) == TestResult
+        assert r.step == jobstep
+        assert r.name == e.name
+        assert r.duration == e.duration
+        assert r.result == e.result
+        assert r.message == e.message
+        assert r.reruns == e.reruns
+
+
+def test_iter_test_batches_combines_cases_within_batch():
+    jobstep = JobStep(
+        id=uuid.uuid4(),
+        project_id=uuid.uuid4(),
+        job_id=uuid.uuid4(),
+    )
+
+    handler = XunitHandler(jobstep)
+    batches = list(handler.iter_test_batches(StringIO(SAMPLE_XUNIT_DOUBLE_CASES), 100))
+
+    assert len(batches) == 1
+    results = batches[0]
+    assert len(results) == 2
+    assert results[0].name == 'test_simple.SampleTest.test_falsehood'
+    assert results[0].duration == 750.0
+    assert results[0].result == Result.failed
+    assert results[1].name == 'test_simple.SampleTest.test_truth'
+    assert results[1].duration == 1250.0
+
+
+def test_iter_test_batches_combines_cases_across_batches():
+    jobstep = JobStep(
+        id=uuid.uuid4(),
+        project_id=uuid.uuid4(),
+        job_id=uuid.uuid4(),
+    )
+
+    handler = XunitHandler(jobstep)
+    expected = handler.get_tests(StringIO(SAMPLE_XUNIT_DOUBLE_CASES))
+
+    # test_falsehood's two cases fall on either side of the first boundary
+    for batch_size in (1, 2):
+        batches = list(handler.iter_test_batches(
+            StringIO(SAMPLE_XUNIT_DOUBLE_CASES), batch_size))
+
+        assert all(len(b) <= batch_size for b in batches)
+        results = sum(batches, [])
+        assert len(results) == 2
+        for r, e in zip(results, expected):
+            assert r.name == e.name
+            assert r.duration == e.duration
+            assert r.result == e.result
+            assert r.message == e.message
+            assert r.reruns == e.reruns
+
+
 def test_truncate_message():
     suffix = "But it'll be truncated anyway."
     original = ("This isn't really that big.\n" * 1024) + suffix
@@ -14,7 +14,7 @@ from changes.config import db, redis
 from changes.constants import Status, Result
 from changes.models import (
     Artifact, FailureReason, FileCoverage, Job, LogChunk, LogSource,
-    Patch, TestCase, TestArtifact
+    Patch, TestCase, TestArtifact, LOG_CHUNK_SIZE
 )
 from changes.backends.jenkins.builder import JenkinsBuilder, MASTER_BLACKLIST_KEY
 from changes.testutils import (
@@ -617,15 +617,16 @@ class SyncStepTest(BaseTestCase):
         assert step.result == Result.infra_failed
 
     @responses.activate
+    @mock.patch('changes.backends.jenkins.builder.sync_log')
     @mock.patch('changes.backends.jenkins.builder.time')
-    def test_result_slow_log(self, mock_time):
+    def test_result_slow_log(self, mock_time, mock_sync_log):
         mock_time.time.return_value = time.time()
+        data = "log\n" * 10000
 
         def log_text_callback(request):
             # Zoom 10 minutes into the future; this should cause the console
             # downloading code to bail
             mock_time.time.return_value += 10 * 60
-            data = "log\n" * 10000
             return (200, {'X-Text-Size': str(len(data))}, data)
 
         responses.add(
@@ -657,12 +658,66 @@ class SyncStepTest(BaseTestCase):
         builder = self.get_builder()
         builder.sync_step(step)
 
+        # we stopped after the first chunk, and will carry on later
         assert len(step.logsources) == 1
         chunks = list(LogChunk.query.filter_by(
             source=step.logsources[0],
         ).order_by(LogChunk.offset.asc()))
-        assert len(chunks) == 2
-        assert "TOO LONG TO DOWNLOAD" in chunks[1].text
+        assert len(chunks) == 1
+        assert step.data['log_offset'] == 0
+        assert step.data['log_skip'] == chunks[0].size
+        mock_sync_log.delay_if_needed.assert_called_once_with(
+            step_id=step.id.hex,
+            task_id=mock.ANY,
+            parent_task_id=step.id.hex,
+        )
+
+        # the next sync picks up where we left off, rather than starting over
+        mock_time.time.return_value = time.time()
+        with mock.patch('changes.backends.jenkins.builder.LOG_SYNC_TIMEOUT_SECS', 10 ** 9):
+            assert builder.sync_log(step)
+
+        chunks = list(LogChunk.query.filter_by(
+            source=step.logsources[0],
+        ).order_by(LogChunk.offset.asc()))
+        assert len(chunks) > 1
+        assert ''.join(c.text for c in chunks) == data
+        assert [c.offset for c in chunks] == [
+            sum(c.size for c in chunks[:i]) for i in xrange(len(chunks))
+        ]
+        assert step.data['log_offset'] == len(data)
+        assert 'log_skip' not in step.data
+
+    @responses.activate
+    @mock.patch('changes.backends.jenkins.builder.LOG_SYNC_BATCH_SIZE', 2)
+    def test_sync_log_in_batches(self):
+        data = "log\n" * 10000
+        responses.add(
+            responses.GET, 'http://jenkins.example.com/job/server/2/logText/progressiveText/?start=0',
+            match_querystring=True,
+            adding_headers={'X-Text-Size': str(len(data))},
+            body=data)
+
+        build = self.create_build(self.project)
+        job = self.create_job(build=build)
+        phase = self.create_jobphase(job)
+        step = self.create_jobstep(phase, data={
+            'build_no': 2,
+            'job_name': 'server',
+            'master': 'http://jenkins.example.com',
+        })
+
+        builder = self.get_builder()
+        with mock.patch('changes.backends.jenkins.builder.append_chunks') as append_chunks:
+            append_chunks.return_value = []
+            assert builder.sync_log(step)
+
+        assert append_chunks.call_count == 3
+        assert [len(c[0][2]) for c in append_chunks.call_args_list] == [2, 2, 1]
+        assert [c[0][1] for c in append_chunks.call_args_list] == [
+            0, LOG_CHUNK_SIZE * 2, LOG_CHUNK_SIZE * 4,
+        ]
+        assert step.data['log_offset'] == len(data)
 
 
 class SyncGenericResultsTest(BaseTestCase):
@@ -0,0 +1,171 @@
+from __future__ import absolute_import
+
+import json
+import mock
+import pytest
+import threading
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from flask import current_app
+from requests.exceptions import ConnectionError
+
+from changes.backends.jenkins.builder import JenkinsBuilder
+from changes.backends.jenkins.client import JenkinsClient
+from changes.testutils import TestCase
+
+
+class FakeJenkinsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        gate = self.server.gate
+        with gate.lock:
+            self.server.connections.add(self.client_address)
+            gate.in_flight += 1
+            gate.max_in_flight = max(gate.max_in_flight, gate.in_flight)
+            if gate.in_flight >= gate.wait_for:
+                gate.all_in_flight.set()
+
+        # hold on to the request until enough others have arrived, so we can
+        # tell whether they were made at once
+        gate.all_in_flight.wait(2)
+
+        with gate.lock:
+            gate.in_flight -= 1
+
+        status, body = self.server.responses.get(self.path.split('?')[0], (404, ''))
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Gate(object):
+    """
+    Holds requests to one or more fake masters until ``wait_for`` of them
+    are in flight at once.
+    """
+
+    def __init__(self, wait_for=1):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.wait_for = wait_for
+        self.all_in_flight = threading.Event()
+
+
+class FakeJenkins(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, gate=None):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), FakeJenkinsHandler)
+        self.gate = gate or Gate()
+        self.connections = set()
+        self.responses = {}
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+
+class JenkinsClientTest(TestCase):
+    def setUp(self):
+        super(JenkinsClientTest, self).setUp()
+        self.servers = []
+        self.client = JenkinsClient(pool_size=2, concurrency=4)
+
+    def tearDown(self):
+        self.client.close()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        super(JenkinsClientTest, self).tearDown()
+
+    def start_server(self, **kwargs):
+        server = FakeJenkins(**kwargs)
+        server.start()
+        self.servers.append(server)
+        return server
+
+    def test_keep_alive(self):
+        server = self.start_server()
+        server.responses['/queue/api/json/'] = (200, '{"items": []}')
+
+        for _ in xrange(3):
+            resp = self.client.request('GET', server.url + '/queue/api/json/')
+            assert resp.json() == {'items': []}
+
+        assert len(server.connections) == 1
+
+    def test_map(self):
+        server = self.start_server(gate=Gate(wait_for=4))
+        for n in xrange(4):
+            server.responses['/{}'.format(n)] = (200, str(n))
+
+        def fetch(n):
+            return self.client.request('GET', '{}/{}'.format(server.url, n)).text
+
+        assert self.client.map(fetch, range(4)) == ['0', '1', '2', '3']
+        assert server.gate.max_in_flight == 4
+
+    def test_map_raises(self):
+        def fetch(n):
+            if n == 2:
+                raise ValueError(n)
+            return n
+
+        with pytest.raises(ValueError):
+            self.client.map(fetch, range(4))
+
+    def test_stats(self):
+        server = self.start_server()
+        server.responses['/ok'] = (200, 'ok')
+        server.responses['/broken'] = (500, 'broken')
+        suffix = '127_0_0_1_{}'.format(server.server_address[1])
+
+        with mock.patch('changes.backends.jenkins.client.statsreporter') as statsreporter:
+            stats = statsreporter.stats.return_value
+            self.client.request('GET', server.url + '/ok')
+            assert stats.log_timing.call_args[0][0] == 'jenkins_api_latency_' + suffix
+            assert mock.call('jenkins_api_errors_' + suffix) not in stats.incr.call_args_list
+
+            self.client.request('GET', server.url + '/broken')
+            stats.incr.assert_any_call('jenkins_api_errors_' + suffix)
+
+        # nothing listens on port 1
+        with mock.patch('changes.backends.jenkins.client.statsreporter') as statsreporter:
+            with pytest.raises(ConnectionError):
+                self.client.request('GET', 'http://127.0.0.1:1/ok')
+            statsreporter.stats.return_value.incr.assert_any_call(
+                'jenkins_api_errors_127_0_0_1_1')
+
+    def test_pick_master(self):
+        # neither master answers until both have been asked
+        gate = Gate(wait_for=2)
+        busy = self.start_server(gate=gate)
+        idle = self.start_server(gate=gate)
+        busy.responses['/queue/api/json/'] = (200, json.dumps({'items': [
+            {'task': {'name': 'server'}},
+        ]}))
+        idle.responses['/queue/api/json/'] = (200, json.dumps({'items': [
+            {'task': {'name': 'client'}},
+        ]}))
+
+        builder = JenkinsBuilder(
+            app=current_app,
+            master_urls=[busy.url, idle.url],
+            job_name='server',
+        )
+        builder.client = self.client
+
+        assert builder._pick_master('server') == idle.url
+        assert gate.max_in_flight == 2
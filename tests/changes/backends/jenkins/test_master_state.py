@@ -0,0 +1,135 @@
+from __future__ import absolute_import
+
+import json
+import mock
+import responses
+
+from flask import current_app
+
+from changes.backends.jenkins.builder import JenkinsBuilder
+from changes.backends.jenkins.master_state import (
+    clear_master_state, fetch_master_state, get_build_no, get_queue_item_id,
+    get_queued_count, save_master_state
+)
+from changes.testutils import TestCase
+
+MASTER = 'http://jenkins.example.com'
+
+
+def _params(changes_bid):
+    return [{}, {'parameters': [
+        {'name': 'CHANGES_BID', 'value': changes_bid},
+    ]}]
+
+
+QUEUE = {'items': [
+    {'id': 14, 'task': {'name': 'server'}, 'actions': _params('a' * 32)},
+    {'id': 13, 'task': {'name': 'server'}, 'actions': _params('a' * 32)},
+    {'id': 12, 'task': {'name': 'client'}, 'actions': [{}]},
+]}
+
+COMPUTERS = {'computer': [
+    {
+        'executors': [
+            {'currentExecutable': None},
+            {'currentExecutable': {
+                'number': 7,
+                'url': MASTER + '/job/server/7/',
+                'actions': _params('b' * 32),
+            }},
+        ],
+        'oneOffExecutors': [],
+    },
+    {
+        'executors': [
+            {'currentExecutable': {
+                'number': 9,
+                'url': MASTER + '/job/server/9/',
+                'actions': _params('b' * 32),
+            }},
+        ],
+    },
+]}
+
+
+class MasterStateTest(TestCase):
+    @responses.activate
+    def test_fetch(self):
+        responses.add(responses.GET, MASTER + '/queue/api/json/',
+                      body=json.dumps(QUEUE))
+        responses.add(responses.GET, MASTER + '/computer/api/json/',
+                      body=json.dumps(COMPUTERS))
+
+        state = fetch_master_state(MASTER)
+
+        assert state == {
+            'queued': {'server': 2, 'client': 1},
+            'queue': {'a' * 32: '14'},
+            'builds': {'b' * 32: {'job_name': 'server', 'build_no': '9'}},
+        }
+
+    def test_lookups(self):
+        state = {
+            'queued': {'server': 2},
+            'queue': {'a' * 32: '14'},
+            'builds': {'b' * 32: {'job_name': 'server', 'build_no': '9'}},
+        }
+        save_master_state(MASTER, state)
+
+        # only masters we're told to poll are trusted
+        assert get_queued_count(MASTER, 'server') is None
+
+        with mock.patch.dict(current_app.config, {'JENKINS_MASTER_STATE_URLS': [MASTER]}):
+            assert get_queued_count(MASTER, 'server') == 2
+            assert get_queued_count(MASTER, 'client') == 0
+            assert get_queue_item_id(MASTER, 'a' * 32) == '14'
+            assert get_queue_item_id(MASTER, 'b' * 32) is None
+            assert get_build_no(MASTER, 'server', 'b' * 32) == '9'
+            assert get_build_no(MASTER, 'client', 'b' * 32) is None
+
+            clear_master_state(MASTER)
+            assert get_queued_count(MASTER, 'server') is None
+            assert get_queue_item_id(MASTER, 'a' * 32) is None
+
+
+class BuilderMasterStateTest(TestCase):
+    def get_builder(self):
+        return JenkinsBuilder(
+            app=current_app,
+            master_urls=[MASTER],
+            job_name='server',
+        )
+
+    @responses.activate
+    def test_find_job_from_snapshot(self):
+        save_master_state(MASTER, {
+            'queued': {'server': 1},
+            'queue': {'a' * 32: '14'},
+            'builds': {'b' * 32: {'job_name': 'server', 'build_no': '9'}},
+        })
+        builder = self.get_builder()
+
+        with mock.patch.dict(current_app.config, {'JENKINS_MASTER_STATE_URLS': [MASTER]}):
+            # nothing is registered with responses, so any request would fail
+            assert builder._count_queued_jobs(MASTER, 'server') == 1
+            assert builder._find_job(MASTER, 'server', 'a' * 32) == {
+                'job_name': 'server',
+                'queued': True,
+                'item_id': '14',
+                'build_no': None,
+                'uri': None,
+            }
+            assert builder._find_job(MASTER, 'server', 'b' * 32)['build_no'] == '9'
+
+    @responses.activate
+    def test_falls_back_on_miss(self):
+        save_master_state(MASTER, {'queued': {}, 'queue': {}, 'builds': {}})
+        responses.add(
+            responses.GET, MASTER + '/queue/api/xml/',
+            body='<x><id>15</id></x>')
+        builder = self.get_builder()
+
+        with mock.patch.dict(current_app.config, {'JENKINS_MASTER_STATE_URLS': [MASTER]}):
+            assert builder._find_queue_item_id(MASTER, 'c' * 32) == '15'
+
+        assert len(responses.calls) == 1
@@ -0,0 +1,97 @@
+from __future__ import absolute_import
+
+import pytest
+
+from changes.expanders.sharding import (
+    LPTStrategy, SetupCostStrategy, choose_shard_count, get_imbalance,
+    get_makespan, get_setup_group, parse_sharding_config
+)
+
+
+def test_get_setup_group():
+    assert get_setup_group('foo/bar.py') == ('foo', 'bar')
+    assert get_setup_group('foo.bar.test_biz') == ('foo', 'bar')
+    assert get_setup_group('foo') == ('foo',)
+
+
+def test_lpt():
+    durations = {'a': 50, 'b': 15, 'c': 10, 'd': 200}
+
+    groups = sorted(LPTStrategy().shard(sorted(durations), 2, durations.__getitem__))
+    assert groups == [(78, ['a', 'b', 'c']), (201, ['d'])]
+
+
+def test_setup_cost_keeps_modules_together():
+    tests = ['a.b.test_1', 'a.b.test_2', 'a.c.test_3', 'a.c.test_4']
+
+    groups = LPTStrategy().shard(tests, 2, lambda t: 10)
+    assert all(len(set(get_setup_group(t) for t in g)) == 2 for _, g in groups)
+
+    groups = sorted(SetupCostStrategy(setup_cost=100).shard(tests, 2, lambda t: 10))
+    assert groups == [
+        (122, ['a.b.test_1', 'a.b.test_2']),
+        (122, ['a.c.test_3', 'a.c.test_4']),
+    ]
+
+
+def test_setup_cost_splits_large_modules():
+    durations = {'a.b.test_1': 1000, 'a.b.test_2': 1000, 'a.c.test_3': 10}
+
+    groups = sorted(SetupCostStrategy().shard(sorted(durations), 2, durations.__getitem__))
+    assert groups == [
+        (1001, ['a.b.test_2']),
+        (1012, ['a.b.test_1', 'a.c.test_3']),
+    ]
+
+
+def test_setup_cost_fewer_groups_than_shards():
+    durations = {'a.b.test_1': 10, 'a.b.test_2': 10, 'a.c.test_3': 1000}
+
+    groups = sorted(SetupCostStrategy().shard(sorted(durations), 3, durations.__getitem__))
+    assert groups == [
+        (22, ['a.b.test_1', 'a.b.test_2']),
+        (1001, ['a.c.test_3']),
+    ]
+    assert all(tests for _, tests in groups)
+
+
+def test_no_tests():
+    # shard_tests asks for min(len(tests), max_shards) shards
+    assert LPTStrategy().shard([], 0, lambda t: 10) == []
+    assert SetupCostStrategy(setup_cost=100).shard([], 0, lambda t: 10) == []
+
+
+def test_makespan_and_imbalance():
+    groups = [(100, ['a']), (300, ['b'])]
+    assert get_makespan(groups) == 300
+    assert get_imbalance(groups) == 0.5
+    assert get_makespan([]) == 0
+    assert get_imbalance([]) == 0
+
+
+def test_choose_shard_count():
+    tests = [str(i) for i in range(10)]
+    strategy = LPTStrategy()
+
+    assert choose_shard_count(strategy, tests, 10, lambda t: 99, 250) == 5
+    assert choose_shard_count(strategy, tests, 10, lambda t: 99, 1000) == 1
+    # can't hit the target, so use as many as we're allowed
+    assert choose_shard_count(strategy, tests, 3, lambda t: 99, 250) == 3
+
+
+def test_parse_sharding_config():
+    strategy, target_duration = parse_sharding_config(None)
+    assert isinstance(strategy, LPTStrategy)
+    assert target_duration is None
+
+    strategy, target_duration = parse_sharding_config({
+        'strategy': 'setup_cost',
+        'setup_cost': 2000,
+        'target_duration': 600000,
+    })
+    assert isinstance(strategy, SetupCostStrategy)
+    assert strategy.setup_cost == 2000
+    assert target_duration == 600000
+
+    with pytest.raises(ValueError):
+        parse_sharding_config({'strategy': 'nope'})
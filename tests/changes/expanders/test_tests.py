@@ -4,8 +4,10 @@ import pytest
 
 from mock import patch
 
+from changes.config import db
 from changes.constants import Status, Result
 from changes.expanders.tests import TestsExpander
+from changes.models import TestDurationIndex
 from changes.testutils import TestCase
 
 
@@ -51,6 +53,26 @@ class TestsExpanderTest(TestCase):
         assert results[('foo', 'bar', 'test_baz')] == 50
         assert results[('foo', 'bar', 'test_bar')] == 25
 
+    @patch('changes.expanders.tests.api_client')
+    def test_get_test_stats_from_index(self, mock_api_client):
+        index = TestDurationIndex(project_id=self.project.id, avg_test_time=40, durations={
+            'foo': 80,
+            'foo\x1fbar': 80,
+            'foo\x1fbar\x1ftest_baz': 80,
+        })
+        db.session.add(index)
+        db.session.commit()
+
+        results, avg_time = TestsExpander.get_test_stats(self.project.slug)
+
+        assert avg_time == 40
+        assert results == {
+            ('foo',): 80,
+            ('foo', 'bar'): 80,
+            ('foo', 'bar', 'test_baz'): 80,
+        }
+        assert not mock_api_client.get.called
+
     def test_sharding(self):
         tests = [
             'foo/bar.py',
@@ -83,6 +105,11 @@ class TestsExpanderTest(TestCase):
         groups = TestsExpander.shard_tests(tests, len(tests) * 2, test_weights, avg_test_time)
         assert len(groups) == len(tests)
 
+        # only as many shards as it takes to finish in time
+        groups = TestsExpander.shard_tests(tests, len(tests), test_weights, avg_test_time,
+                                           target_duration=201)
+        assert len(groups) == 2
+
     @patch.object(TestsExpander, 'get_test_stats')
     def test_expand(self, mock_get_test_stats):
         mock_get_test_stats.return_value = {
@@ -114,3 +141,34 @@ class TestsExpanderTest(TestCase):
         assert results[1].data['weight'] == 78
         assert results[1].commands[0].label == results[1].label
         assert results[1].commands[0].script == results[1].label
+
+    @patch.object(TestsExpander, 'get_test_stats')
+    def test_expand_with_setup_cost(self, mock_get_test_stats):
+        mock_get_test_stats.return_value = {
+            ('foo', 'bar', 'test_1'): 10,
+            ('foo', 'bar', 'test_2'): 10,
+            ('foo', 'baz', 'test_3'): 1000,
+        }, 340
+
+        results = list(self.get_expander({
+            'cmd': 'py.test --junit=junit.xml {test_names}',
+            'tests': [
+                'foo.bar.test_1',
+                'foo.bar.test_2',
+                'foo.baz.test_3',
+            ],
+        }).expand(max_executors=3, sharding={
+            'strategy': 'setup_cost',
+            'setup_cost': 100,
+        }))
+
+        results.sort(key=lambda x: x.data['weight'])
+
+        # two setup groups make two shards, however many executors there are
+        assert len(results) == 2
+        assert results[0].commands[0].script == \
+            'py.test --junit=junit.xml foo.bar.test_1 foo.bar.test_2'
+        assert results[0].data['weight'] == 122
+        assert results[0].data['shard_count'] == 2
+        assert results[1].commands[0].script == 'py.test --junit=junit.xml foo.baz.test_3'
+        assert results[1].data['weight'] == 1101
@@ -0,0 +1,36 @@
+from __future__ import absolute_import
+
+import mock
+
+from datetime import date
+
+from changes.jobs.daily_stats import backfill_daily_stats, rollup_daily_stats
+from changes.testutils import TestCase
+
+
+class RollupDailyStatsTest(TestCase):
+    @mock.patch('changes.jobs.daily_stats.update_daily_stats')
+    def test_day(self, update_daily_stats):
+        rollup_daily_stats(day='2015-06-01')
+
+        update_daily_stats.assert_called_once_with(date(2015, 6, 1))
+
+
+class BackfillDailyStatsTest(TestCase):
+    @mock.patch('changes.config.queue.delay')
+    def test_simple(self, queue_delay):
+        backfill_daily_stats('2015-05-30', '2015-06-02')
+
+        assert queue_delay.call_args_list == [
+            mock.call('rollup_daily_stats', kwargs={'day': '2015-05-30'}),
+            mock.call('rollup_daily_stats', kwargs={'day': '2015-05-31'}),
+            mock.call('rollup_daily_stats', kwargs={'day': '2015-06-01'}),
+        ]
+
+    @mock.patch('changes.config.queue.delay')
+    def test_dates(self, queue_delay):
+        backfill_daily_stats(date(2015, 6, 1), date(2015, 6, 2))
+
+        queue_delay.assert_called_once_with('rollup_daily_stats', kwargs={
+            'day': '2015-06-01',
+        })
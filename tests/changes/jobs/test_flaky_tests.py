@@ -0,0 +1,89 @@
+from __future__ import absolute_import
+
+import mock
+
+from datetime import date, datetime, timedelta
+
+from changes.constants import Result
+from changes.jobs.flaky_tests import aggregate_flaky_tests, backfill_flaky_tests
+from changes.models import FlakyTestStat
+from changes.testutils import TestCase
+
+
+class AggregateFlakyTestsTest(TestCase):
+    @mock.patch('changes.config.queue.delay')
+    def test_simple(self, queue_delay):
+        day = date(2015, 6, 1)
+        when = datetime(2015, 6, 1, 12)
+
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        job2 = self.create_job(build)
+        job3 = self.create_job(build)
+
+        # foo first ran long before it got flaky
+        old_build = self.create_build(project)
+        self.create_test(
+            self.create_job(old_build), name='foo', result=Result.passed,
+            date_created=when - timedelta(days=30))
+
+        self.create_test(job, name='foo', result=Result.passed, reruns=1,
+                         date_created=when)
+        latest_rerun = self.create_test(job2, name='foo', result=Result.passed,
+                                        reruns=2, date_created=when + timedelta(hours=1))
+        self.create_test(job3, name='foo', result=Result.passed, reruns=0,
+                         date_created=when + timedelta(hours=2))
+        # never flaky
+        self.create_test(job, name='bar', result=Result.passed,
+                         date_created=when)
+        # flaky, but not on this day
+        self.create_test(job, name='baz', result=Result.passed, reruns=1,
+                         date_created=when + timedelta(days=1))
+
+        aggregate_flaky_tests(day=day.isoformat())
+
+        stats = list(FlakyTestStat.query.all())
+        assert len(stats) == 1
+        stat = stats[0]
+        assert stat.name == 'foo'
+        assert stat.project_id == project.id
+        assert stat.date == day
+        assert stat.last_flaky_run_id == latest_rerun.id
+        assert stat.flaky_runs == 2
+        assert stat.double_reruns == 1
+        assert stat.passing_runs == 3
+        assert stat.first_run == (when - timedelta(days=30)).date()
+
+        queue_delay.assert_called_once_with('send_flaky_test_metrics', kwargs={
+            'metrics': [{
+                'flaky_test_reruns_name': 'foo',
+                'flaky_test_reruns_project_id': str(project.id),
+                'flaky_test_reruns_flaky_runs': 2,
+                'flaky_test_reruns_passing_runs': 3,
+            }],
+        })
+
+        # running the same day again doesn't duplicate anything
+        queue_delay.reset_mock()
+        aggregate_flaky_tests(day=day)
+
+        assert FlakyTestStat.query.count() == 1
+        assert not queue_delay.called
+
+
+class BackfillFlakyTestsTest(TestCase):
+    @mock.patch('changes.config.queue.delay')
+    def test_simple(self, queue_delay):
+        backfill_flaky_tests(date(2015, 5, 31), '2015-06-02', max_flaky_tests=10)
+
+        assert queue_delay.call_args_list == [
+            mock.call('aggregate_flaky_tests', kwargs={
+                'day': '2015-05-31',
+                'max_flaky_tests': 10,
+            }),
+            mock.call('aggregate_flaky_tests', kwargs={
+                'day': '2015-06-01',
+                'max_flaky_tests': 10,
+            }),
+        ]
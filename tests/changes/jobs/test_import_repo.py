@@ -5,7 +5,7 @@ import mock
 from datetime import datetime
 
 from changes.config import db
-from changes.jobs.import_repo import import_repo
+from changes.jobs.import_repo import import_repo, IMPORT_LIMIT
 from changes.models.repository import Repository, RepositoryBackend, RepositoryStatus
 from changes.queue.task import _DEFAULT_COUNTDOWN
 from changes.testutils import TestCase
@@ -18,7 +18,7 @@ class ImportRepoTest(TestCase):
     def test_simple(self, queue_delay, get_vcs_backend):
         vcs_backend = mock.MagicMock(spec=Vcs)
 
-        def log(parent):
+        def log(parent, limit):
             if parent is None:
                 yield RevisionResult(
                     id='a' * 40,
@@ -28,6 +28,8 @@ class ImportRepoTest(TestCase):
                 )
 
         get_vcs_backend.return_value = vcs_backend
+        vcs_backend.get_branches_for_revisions.side_effect = lambda revisions: dict(
+            (r.id, r.branches) for r in revisions)
         vcs_backend.log.side_effect = log
 
         repo = self.create_repo(
@@ -39,7 +41,7 @@ class ImportRepoTest(TestCase):
             import_repo(repo_id=repo.id.hex, task_id=repo.id.hex)
 
         get_vcs_backend.assert_called_once_with()
-        vcs_backend.log.assert_called_once_with(parent=None)
+        vcs_backend.log.assert_called_once_with(parent=None, limit=IMPORT_LIMIT)
 
         db.session.expire_all()
 
@@ -58,3 +60,33 @@ class ImportRepoTest(TestCase):
             'task_id': repo.id.hex,
             'parent': 'a' * 40,
         }, countdown=_DEFAULT_COUNTDOWN)
+
+    @mock.patch('changes.models.Repository.get_vcs')
+    @mock.patch('changes.config.queue.delay')
+    def test_finished(self, queue_delay, get_vcs_backend):
+        vcs_backend = mock.MagicMock(spec=Vcs)
+
+        def log(parent, limit):
+            yield RevisionResult(
+                id=parent,
+                message='hello world!',
+                author='Example <foo@example.com>',
+                author_date=datetime(2013, 9, 19, 22, 15, 22),
+            )
+
+        get_vcs_backend.return_value = vcs_backend
+        vcs_backend.get_branches_for_revisions.side_effect = lambda revisions: dict(
+            (r.id, r.branches) for r in revisions)
+        vcs_backend.log.side_effect = log
+
+        repo = self.create_repo(
+            backend=RepositoryBackend.git,
+            status=RepositoryStatus.importing,
+        )
+
+        with mock.patch.object(import_repo, 'allow_absent_from_db', True):
+            import_repo(repo_id=repo.id.hex, task_id=repo.id.hex, parent='a' * 40)
+
+        # only the parent itself was left, so there's nothing more to import
+        for args, kwargs in queue_delay.call_args_list:
+            assert args[0] != 'import_repo'
@@ -0,0 +1,44 @@
+from __future__ import absolute_import
+
+import json
+import mock
+import responses
+
+from flask import current_app
+
+from changes.backends.jenkins.master_state import get_master_state, save_master_state
+from changes.jobs.sync_jenkins_masters import sync_jenkins_masters
+from changes.testutils import TestCase
+
+
+class SyncJenkinsMastersTest(TestCase):
+    @responses.activate
+    def test_simple(self):
+        responses.add(responses.GET, 'http://jenkins.example.com/queue/api/json/',
+                      body=json.dumps({'items': [
+                          {'id': 13, 'task': {'name': 'server'}, 'actions': []},
+                      ]}))
+        responses.add(responses.GET, 'http://jenkins.example.com/computer/api/json/',
+                      body=json.dumps({'computer': []}))
+        responses.add(responses.GET, 'http://jenkins-2.example.com/queue/api/json/',
+                      status=500)
+        save_master_state('http://jenkins-2.example.com', {
+            'queued': {}, 'queue': {}, 'builds': {},
+        })
+
+        with mock.patch.dict(current_app.config, {'JENKINS_MASTER_STATE_URLS': [
+            'http://jenkins.example.com',
+            'http://jenkins-2.example.com',
+        ]}):
+            sync_jenkins_masters()
+
+            assert get_master_state('http://jenkins.example.com') == {
+                'queued': {'server': 1}, 'queue': {}, 'builds': {},
+            }
+            # a master we couldn't reach is left to be asked directly
+            assert get_master_state('http://jenkins-2.example.com') is None
+
+    def test_disabled(self):
+        with mock.patch('changes.jobs.sync_jenkins_masters.fetch_master_state') as fetch:
+            sync_jenkins_masters()
+        assert not fetch.called
@@ -0,0 +1,110 @@
+from __future__ import absolute_import
+
+import mock
+import re
+import responses
+
+from datetime import datetime, timedelta
+from flask import current_app
+
+from changes.constants import Status
+from changes.jobs.sync_job_steps import sync_job_steps
+from changes.models import HistoricalImmutableStep, JobStep, Task
+from changes.testutils import TestCase
+
+
+class SyncJobStepsTest(TestCase):
+    ARTIFACTSTORE_REQUEST_RE = re.compile(r'http://localhost:1234/buckets/.+/artifacts')
+
+    def setUp(self):
+        super(SyncJobStepsTest, self).setUp()
+        self.project = self.create_project()
+        build = self.create_build(project=self.project)
+        self.job = self.create_job(build=build)
+
+        plan = self.create_plan(self.project)
+        self.create_step(plan, implementation='test', order=0)
+        self.create_job_plan(self.job, plan)
+
+        self.phase = self.create_jobphase(self.job)
+
+    def create_due_step(self, **kwargs):
+        step = self.create_jobstep(self.phase, status=Status.in_progress, **kwargs)
+        task = self.create_task(
+            parent_id=self.job.id,
+            task_id=step.id,
+            task_name='sync_job_step',
+            status=Status.in_progress,
+            date_modified=datetime.utcnow() - timedelta(minutes=1),
+        )
+        return step, task
+
+    @mock.patch('changes.config.queue.delay')
+    @mock.patch.object(HistoricalImmutableStep, 'get_implementation')
+    def test_disabled(self, get_implementation, queue_delay):
+        self.create_due_step()
+
+        sync_job_steps()
+
+        assert not get_implementation.called
+        assert not queue_delay.called
+
+    @mock.patch('changes.config.queue.delay')
+    @mock.patch.object(HistoricalImmutableStep, 'get_implementation')
+    @responses.activate
+    def test_in_progress(self, get_implementation, queue_delay):
+        responses.add(responses.GET, self.ARTIFACTSTORE_REQUEST_RE, body='', status=404)
+
+        implementation = mock.Mock()
+        get_implementation.return_value = implementation
+
+        step, task = self.create_due_step()
+        date_modified = task.date_modified
+
+        # recently synced, so shouldn't be polled
+        self.create_task(
+            parent_id=self.job.id,
+            task_id=self.create_jobstep(self.phase, status=Status.in_progress).id,
+            task_name='sync_job_step',
+            status=Status.in_progress,
+            date_modified=datetime.utcnow(),
+        )
+
+        with mock.patch.dict(current_app.config, {'JOBSTEP_SYNC_BATCH_SIZE': 10}):
+            sync_job_steps()
+
+        implementation.update_step.assert_called_once_with(step=step)
+
+        task = Task.query.get(task.id)
+        assert task.status == Status.in_progress
+        assert task.date_modified > date_modified
+
+        assert not queue_delay.called
+
+    @mock.patch('changes.config.queue.delay')
+    @mock.patch.object(HistoricalImmutableStep, 'get_implementation')
+    @responses.activate
+    def test_finished(self, get_implementation, queue_delay):
+        responses.add(responses.GET, self.ARTIFACTSTORE_REQUEST_RE, body='', status=404)
+
+        implementation = mock.Mock()
+        get_implementation.return_value = implementation
+
+        def mark_finished(step):
+            step.status = Status.finished
+
+        implementation.update_step.side_effect = mark_finished
+
+        step, task = self.create_due_step()
+
+        with mock.patch.dict(current_app.config, {'JOBSTEP_SYNC_BATCH_SIZE': 10}):
+            sync_job_steps()
+
+        assert JobStep.query.get(step.id).status == Status.finished
+        assert Task.query.get(task.id).status == Status.queued
+
+        queue_delay.assert_called_once_with('sync_job_step', kwargs={
+            'step_id': step.id.hex,
+            'task_id': step.id.hex,
+            'parent_task_id': self.job.id.hex,
+        }, countdown=mock.ANY)
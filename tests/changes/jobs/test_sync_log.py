@@ -0,0 +1,70 @@
+from __future__ import absolute_import
+
+import mock
+
+from changes.config import db
+from changes.constants import Status
+from changes.jobs.sync_log import sync_log
+from changes.models import HistoricalImmutableStep, Task
+from changes.testutils import TestCase
+
+
+class SyncLogTest(TestCase):
+    def setUp(self):
+        super(SyncLogTest, self).setUp()
+        self.project = self.create_project()
+        self.build = self.create_build(project=self.project)
+        self.job = self.create_job(build=self.build)
+        self.jobphase = self.create_jobphase(self.job)
+        self.jobstep = self.create_jobstep(self.jobphase)
+
+        self.plan = self.create_plan(self.project)
+        self.step = self.create_step(self.plan, implementation='test', order=0)
+        self.jobplan = self.create_job_plan(self.job, self.plan)
+
+        self.task_id = self.jobstep.id
+        self.task = self.create_task(
+            parent_id=self.jobstep.id,
+            task_id=self.task_id,
+            task_name='sync_log',
+        )
+
+    @mock.patch('changes.config.queue.delay')
+    @mock.patch.object(HistoricalImmutableStep, 'get_implementation')
+    def test_finished(self, get_implementation, queue_delay):
+        implementation = mock.Mock()
+        implementation.sync_log.return_value = True
+        get_implementation.return_value = implementation
+
+        sync_log(
+            step_id=self.jobstep.id.hex,
+            task_id=self.task_id.hex,
+            parent_task_id=self.jobstep.id.hex,
+        )
+
+        implementation.sync_log.assert_called_once_with(step=self.jobstep)
+        db.session.expire(self.task)
+        assert Task.query.get(self.task.id).status == Status.finished
+        assert not queue_delay.called
+
+    @mock.patch('changes.config.queue.delay')
+    @mock.patch.object(HistoricalImmutableStep, 'get_implementation')
+    def test_not_finished(self, get_implementation, queue_delay):
+        implementation = mock.Mock()
+        implementation.sync_log.return_value = False
+        get_implementation.return_value = implementation
+
+        sync_log(
+            step_id=self.jobstep.id.hex,
+            task_id=self.task_id.hex,
+            parent_task_id=self.jobstep.id.hex,
+        )
+
+        implementation.sync_log.assert_called_once_with(step=self.jobstep)
+        db.session.expire(self.task)
+        assert Task.query.get(self.task.id).status == Status.in_progress
+        queue_delay.assert_any_call('sync_log', kwargs={
+            'step_id': self.jobstep.id.hex,
+            'task_id': self.task_id.hex,
+            'parent_task_id': self.jobstep.id.hex,
+        }, countdown=5)
@@ -29,6 +29,8 @@ class SyncRepoTest(TestCase):
                 )
 
         get_vcs_backend.return_value = vcs_backend
+        vcs_backend.get_branches_for_revisions.side_effect = lambda revisions: dict(
+            (r.id, r.branches) for r in revisions)
         vcs_backend.log.side_effect = log
 
         repo = self.create_repo(
@@ -75,6 +77,8 @@ class SyncRepoTest(TestCase):
         """
         vcs_backend = mock.MagicMock(spec=Vcs)
         get_vcs_backend.return_value = vcs_backend
+        vcs_backend.get_branches_for_revisions.side_effect = lambda revisions: dict(
+            (r.id, r.branches) for r in revisions)
         repo = self.create_repo(backend=RepositoryBackend.git)
 
         existing_revision_branch_changed = RevisionResult(
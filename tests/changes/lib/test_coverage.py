@@ -0,0 +1,78 @@
+from changes.config import db
+from changes.constants import Status
+from changes.lib.coverage import (
+    get_coverage_stats, get_merged_coverage_by_build, merge_coverage,
+    merged_coverage_data
+)
+from changes.models import FileCoverage
+from changes.testutils import TestCase
+
+
+def test_merge_coverage():
+    assert merge_coverage('NNUC', 'NUCN') == 'NUCC'
+    assert merge_coverage('CU', 'NNNU') == 'CUNU'
+    assert merge_coverage(u'UNC', '') == 'UNC'
+    assert merge_coverage('', '') == ''
+
+
+def test_merged_coverage_data():
+    coverages = [
+        FileCoverage(filename='foo.py', data='NNUC'),
+        FileCoverage(filename='bar.py', data='CNNU'),
+        FileCoverage(filename='foo.py', data='NUCN'),
+        FileCoverage(filename='foo.py', data='UNNNU'),
+    ]
+    assert merged_coverage_data(coverages) == {
+        'foo.py': 'UUCCU',
+        'bar.py': 'CNNU',
+    }
+
+
+def test_get_coverage_stats():
+    stats = get_coverage_stats(set([1, 2, 4, 10]), 'CUNUC')
+    assert stats.lines_covered == 2
+    assert stats.lines_uncovered == 2
+    assert stats.diff_lines_covered == 1
+    assert stats.diff_lines_uncovered == 2
+
+
+class GetMergedCoverageByBuildTestCase(TestCase):
+    def create_coverage(self, build, filename, data):
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase)
+        coverage = FileCoverage(
+            step_id=jobstep.id,
+            job_id=job.id,
+            project_id=build.project_id,
+            filename=filename,
+            data=data,
+        )
+        db.session.add(coverage)
+        db.session.commit()
+        return coverage
+
+    def test_in_progress(self):
+        project = self.create_project()
+        build = self.create_build(project, status=Status.in_progress)
+        self.create_coverage(build, 'foo.py', 'NNUC')
+
+        assert get_merged_coverage_by_build(build) == {'foo.py': 'NNUC'}
+
+        self.create_coverage(build, 'foo.py', 'NUCN')
+
+        assert get_merged_coverage_by_build(build) == {'foo.py': 'NUCC'}
+
+    def test_finished(self):
+        project = self.create_project()
+        build = self.create_build(project, status=Status.finished)
+        coverage = self.create_coverage(build, 'foo.py', 'NNUC')
+
+        assert get_merged_coverage_by_build(build) == {'foo.py': 'NNUC'}
+
+        coverage.data = 'CCCC'
+        db.session.add(coverage)
+        db.session.commit()
+
+        # served from the cache
+        assert get_merged_coverage_by_build(build) == {'foo.py': 'NNUC'}
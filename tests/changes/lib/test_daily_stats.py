@@ -0,0 +1,106 @@
+from __future__ import absolute_import
+
+import mock
+import pytest
+
+from datetime import date, datetime, timedelta
+
+from changes.config import db, redis
+from changes.ext.redis import UnableToGetLock
+from changes.constants import Result
+from changes.lib.daily_stats import (
+    get_failure_counts, get_project_stats, get_slow_tests, update_daily_stats
+)
+from changes.models import FailureReason
+from changes.testutils import TestCase
+
+
+class DailyStatsTestCase(TestCase):
+    def create_failure(self, build, reason):
+        job = self.create_job(build)
+        step = self.create_jobstep(self.create_jobphase(job))
+        db.session.add(FailureReason(
+            project_id=build.project_id,
+            build_id=build.id,
+            job_id=job.id,
+            step_id=step.id,
+            reason=reason,
+        ))
+        db.session.commit()
+
+    def test_simple(self):
+        day = date(2015, 6, 1)
+        when = datetime(2015, 6, 1, 12)
+
+        project = self.create_project()
+        project2 = self.create_project()
+
+        self.create_finished_build(
+            project, result=Result.passed, duration=1000, date_created=when)
+        green_build = self.create_finished_build(
+            project, result=Result.passed, duration=2000,
+            date_created=when + timedelta(hours=1))
+        failed_build = self.create_finished_build(
+            project, result=Result.failed, duration=5000, date_created=when)
+        self.create_failure(failed_build, 'test_failures')
+        self.create_failure(failed_build, 'test_failures')
+        self.create_finished_build(
+            project2, result=Result.passed, duration=4000,
+            date_created=when - timedelta(days=1))
+
+        job = self.create_job(green_build)
+        self.create_test(job, name='foo.test_slow', duration=500)
+        self.create_test(job, name='foo.test_fast', duration=5)
+        self.create_test(job, name='foo.test_failed', duration=900,
+                         result=Result.failed)
+
+        update_daily_stats(day)
+        update_daily_stats(day - timedelta(days=1))
+        # rolling up the same day again replaces what was there
+        update_daily_stats(day)
+
+        project_ids = [project.id, project2.id]
+
+        stats = get_project_stats(project_ids, day, day + timedelta(days=1))
+        assert stats == {
+            project.id: {
+                'total_builds': 3,
+                'green_builds': 2,
+                'avg_duration': 1500,
+            },
+        }
+
+        stats = get_project_stats(project_ids, day - timedelta(days=1), day + timedelta(days=1))
+        assert stats[project.id]['total_builds'] == 3
+        assert stats[project2.id] == {
+            'total_builds': 1,
+            'green_builds': 1,
+            'avg_duration': 4000,
+        }
+
+        assert get_failure_counts(project_ids, day, day + timedelta(days=1)) == {
+            'test_failures': 1,
+        }
+
+        slow_tests = get_slow_tests(project_ids, day, day + timedelta(days=1), 10)
+        assert [(t.name, t.short_name, t.package, t.duration) for t in slow_tests] == [
+            ('foo.test_slow', 'test_slow', 'foo', 500),
+            ('foo.test_fast', 'test_fast', 'foo', 5),
+        ]
+        assert slow_tests[0].build_id == green_build.id
+
+    def test_day_is_locked(self):
+        day = date(2015, 6, 1)
+        project = self.create_project()
+        self.create_finished_build(
+            project, result=Result.passed, date_created=datetime(2015, 6, 1, 12))
+
+        # another rollup of the same day is still rewriting it
+        with redis.lock('daily_stats:2015-06-01', expire=5, nowait=True):
+            with mock.patch('changes.lib.daily_stats.LOCK_TIMEOUT', 0.1):
+                with pytest.raises(UnableToGetLock):
+                    update_daily_stats(day)
+
+        update_daily_stats(day)
+        stats = get_project_stats([project.id], day, day + timedelta(days=1))
+        assert stats[project.id]['total_builds'] == 1
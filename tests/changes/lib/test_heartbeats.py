@@ -0,0 +1,68 @@
+import mock
+
+from datetime import datetime
+from flask import current_app
+
+from changes.config import db, redis
+from changes.lib.heartbeats import (
+    HEARTBEAT_KEY, flush_heartbeats, get_last_heartbeat, get_last_heartbeats,
+    record_heartbeat,
+)
+from changes.models import JobStep
+from changes.testutils import TestCase
+
+
+class HeartbeatsTestCase(TestCase):
+    def setUp(self):
+        super(HeartbeatsTestCase, self).setUp()
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        self.jobphase = self.create_jobphase(job)
+
+    def test_without_write_behind(self):
+        jobstep = self.create_jobstep(self.jobphase)
+
+        record_heartbeat(jobstep, datetime(2013, 9, 19, 22, 15, 22))
+
+        assert jobstep.last_heartbeat == datetime(2013, 9, 19, 22, 15, 22)
+        assert get_last_heartbeat(jobstep) == datetime(2013, 9, 19, 22, 15, 22)
+        assert redis.zcard(HEARTBEAT_KEY) == 0
+
+    def test_write_behind(self):
+        with mock.patch.dict(current_app.config, {'JOBSTEP_HEARTBEAT_WRITE_BEHIND': True}):
+            jobstep = self.create_jobstep(self.jobphase)
+            jobstep_2 = self.create_jobstep(self.jobphase)
+            jobstep_3 = self.create_jobstep(
+                self.jobphase, last_heartbeat=datetime(2013, 9, 19, 22, 15, 30))
+
+            record_heartbeat(jobstep, datetime(2013, 9, 19, 22, 15, 22))
+            record_heartbeat(jobstep, datetime(2013, 9, 19, 22, 15, 25, 500000))
+            record_heartbeat(jobstep_3, datetime(2013, 9, 19, 22, 15, 20))
+
+            assert jobstep.last_heartbeat is None
+            assert get_last_heartbeats([jobstep, jobstep_2, jobstep_3]) == {
+                jobstep.id: datetime(2013, 9, 19, 22, 15, 25, 500000),
+                jobstep_2.id: None,
+                jobstep_3.id: datetime(2013, 9, 19, 22, 15, 30),
+            }
+
+            assert flush_heartbeats() == 2
+            assert redis.zcard(HEARTBEAT_KEY) == 0
+
+            db.session.expire_all()
+            assert JobStep.query.get(jobstep.id).last_heartbeat == datetime(2013, 9, 19, 22, 15, 25, 500000)
+            assert JobStep.query.get(jobstep_2.id).last_heartbeat is None
+            # heartbeats never go backwards
+            assert JobStep.query.get(jobstep_3.id).last_heartbeat == datetime(2013, 9, 19, 22, 15, 30)
+
+            assert flush_heartbeats() == 0
+
+    def test_flush_leaves_later_heartbeats(self):
+        with mock.patch.dict(current_app.config, {'JOBSTEP_HEARTBEAT_WRITE_BEHIND': True}):
+            jobstep = self.create_jobstep(self.jobphase)
+
+            record_heartbeat(jobstep, datetime(2099, 1, 1))
+
+            assert flush_heartbeats() == 0
+            assert redis.zcard(HEARTBEAT_KEY) == 1
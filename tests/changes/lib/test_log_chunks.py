@@ -0,0 +1,161 @@
+from changes.config import redis
+from changes.models import LogArchive, LogChunk
+from changes.lib.log_chunks import (
+    append_chunks, compact_logsource, get_archived_chunks,
+    get_tail_channel, iter_log_text_reversed, notify_append, ARCHIVE_BLOCK_SIZE,
+)
+from changes.testutils import TestCase
+
+
+class AppendChunksTestCase(TestCase):
+    def test_simple(self):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase)
+        logsource = self.create_logsource(step=jobstep, name='console')
+
+        result = append_chunks(logsource, 0, ['hello\n', 'world!\n'])
+
+        assert [(c['offset'], c['size']) for c in result] == [(0, 6), (6, 7)]
+
+        chunks = list(LogChunk.query.filter(
+            LogChunk.source_id == logsource.id,
+        ).order_by(LogChunk.offset.asc()))
+        assert [c.id for c in chunks] == [c['id'] for c in result]
+        assert [c.text for c in chunks] == ['hello\n', 'world!\n']
+        assert all(c.job_id == job.id for c in chunks)
+        assert all(c.project_id == project.id for c in chunks)
+
+    def test_existing_offsets_are_skipped(self):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase)
+        logsource = self.create_logsource(step=jobstep, name='console')
+        existing = self.create_logchunk(logsource, text='hello\n', offset=0)
+
+        result = append_chunks(logsource, 0, ['HELLO\n', 'world!\n'])
+
+        assert result[0]['id'] == existing.id
+        assert result[1]['offset'] == 6
+
+        chunks = list(LogChunk.query.filter(
+            LogChunk.source_id == logsource.id,
+        ).order_by(LogChunk.offset.asc()))
+        assert [c.text for c in chunks] == ['hello\n', 'world!\n']
+
+    def test_no_chunks(self):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase)
+        logsource = self.create_logsource(step=jobstep, name='console')
+
+        assert append_chunks(logsource, 0, []) == []
+
+
+class NotifyAppendTestCase(TestCase):
+    def test_simple(self):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        logsource = self.create_logsource(job=job, name='console')
+
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(get_tail_channel(logsource.id))
+        try:
+            notify_append(logsource, 42)
+            message = pubsub.get_message(timeout=1)
+        finally:
+            pubsub.close()
+
+        assert message['data'] == '42'
+
+
+class CompactLogSourceTestCase(TestCase):
+    def test_simple(self):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase)
+        logsource = self.create_logsource(step=jobstep, name='console')
+
+        texts = []
+        offset = 0
+        for i in range(40):
+            text = u'line {0} \u2603\n'.format(i) * 500
+            self.create_logchunk(logsource, text=text, offset=offset)
+            texts.append(text)
+            offset += len(text)
+        full_text = u''.join(texts)
+        assert len(full_text) > ARCHIVE_BLOCK_SIZE
+
+        archive = compact_logsource(logsource)
+
+        assert archive.size == len(full_text)
+        assert len(archive.block_index['blocks']) > 1
+        assert LogChunk.query.filter(LogChunk.source_id == logsource.id).count() == 0
+        assert LogArchive.query.get(logsource.id) == archive
+
+        assert u''.join(reversed(list(iter_log_text_reversed(logsource)))) == full_text
+
+        # compacting again is a no-op
+        assert compact_logsource(logsource) == archive
+
+    def test_range_reads(self):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase)
+        logsource = self.create_logsource(step=jobstep, name='console')
+
+        offset = 0
+        for i in range(40):
+            text = 'x' * 8191 + '\n'
+            self.create_logchunk(logsource, text=text, offset=offset)
+            offset += len(text)
+
+        archive = compact_logsource(logsource)
+        first_block_size = archive.block_index['blocks'][0][1]
+
+        chunks = get_archived_chunks(archive, archive.size - 10)
+        assert chunks[-1].offset + chunks[-1].size == archive.size
+        assert chunks[0].offset >= first_block_size
+
+        chunks = get_archived_chunks(archive, 0, 1)
+        assert chunks[0].offset == 0
+        assert chunks[-1].offset + chunks[-1].size == first_block_size
+
+    def test_gap(self):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase)
+        logsource = self.create_logsource(step=jobstep, name='console')
+
+        self.create_logchunk(logsource, text='hello\n', offset=0)
+        self.create_logchunk(logsource, text='world\n', offset=10)
+
+        archive = compact_logsource(logsource)
+
+        assert [b[:2] for b in archive.block_index['blocks']] == [[0, 6], [10, 6]]
+        chunks = get_archived_chunks(archive)
+        assert [(c.offset, c.text) for c in chunks] == [(0, 'hello\n'), (10, 'world\n')]
+
+    def test_empty(self):
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase)
+        logsource = self.create_logsource(step=jobstep, name='console')
+
+        assert compact_logsource(logsource) is None
+        assert list(iter_log_text_reversed(logsource)) == []
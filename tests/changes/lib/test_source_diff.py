@@ -0,0 +1,49 @@
+from uuid import uuid4
+
+from mock import patch
+
+from changes.lib.source_diff import (
+    get_changed_files, get_lines_by_file, get_patch_changed_files
+)
+from changes.models import Source
+from changes.testutils import TestCase
+from changes.testutils.fixtures import SAMPLE_DIFF
+from changes.utils.diff_parser import DiffParser
+
+
+class SourceDiffTestCase(TestCase):
+    @patch.object(Source, 'generate_diff')
+    def test_cached(self, generate_diff):
+        project = self.create_project()
+        source = self.create_source(project)
+        generate_diff.return_value = SAMPLE_DIFF
+
+        parser = DiffParser(SAMPLE_DIFF)
+        assert get_changed_files(source) == parser.get_changed_files()
+        assert get_lines_by_file(source) == parser.get_lines_by_file()
+        assert get_lines_by_file(source) == parser.get_lines_by_file()
+        assert generate_diff.call_count == 1
+
+    @patch.object(Source, 'generate_diff')
+    def test_no_diff(self, generate_diff):
+        project = self.create_project()
+        source = self.create_source(project)
+        generate_diff.return_value = None
+
+        assert get_changed_files(source) == set()
+        assert get_lines_by_file(source) == {}
+
+        # not cached, in case the diff just couldn't be exported this time
+        generate_diff.return_value = SAMPLE_DIFF
+        assert get_changed_files(source) == DiffParser(SAMPLE_DIFF).get_changed_files()
+
+    def test_patch_cached(self):
+        patch_id = uuid4()
+        changed_files = DiffParser(SAMPLE_DIFF).get_changed_files()
+
+        assert get_patch_changed_files(patch_id, SAMPLE_DIFF) == changed_files
+        with patch('changes.lib.source_diff.DiffParser') as parser:
+            assert get_patch_changed_files(patch_id, SAMPLE_DIFF) == changed_files
+        assert not parser.called
+
+        assert get_patch_changed_files(uuid4(), '') == set()
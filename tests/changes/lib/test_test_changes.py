@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import mock
+
+from changes.lib.test_changes import (
+    find_previous_build, get_test_changes, update_test_changes
+)
+from changes.listeners.build_test_changes import build_finished_handler
+from changes.models import BuildTestChanges, Job
+from changes.models.test import TestCase as TestCaseModel
+from changes.testutils import TestCase
+
+
+class TestChangesTestCase(TestCase):
+    def get_test_ids(self, build):
+        tests = TestCaseModel.query.join(
+            Job, Job.id == TestCaseModel.job_id,
+        ).filter(Job.build_id == build.id)
+        return dict((t.name, t.id.hex) for t in tests)
+
+    def test_update(self):
+        project = self.create_project()
+        previous_build = self.create_finished_build(
+            project, ['foo.same', 'foo.removed'])
+        build = self.create_finished_build(
+            project, ['foo.same', 'foo.added', 'foo.added_too'])
+        previous_tests = self.get_test_ids(previous_build)
+        tests = self.get_test_ids(build)
+
+        test_changes = update_test_changes(build, previous_build)
+
+        assert test_changes.build_id == build.id
+        assert test_changes.previous_build_id == previous_build.id
+        assert test_changes.num_added == 2
+        assert test_changes.num_removed == 1
+        assert test_changes.total == 3
+        assert sorted(test_changes.changes['tests']) == sorted([
+            ['+', tests['foo.added']],
+            ['+', tests['foo.added_too']],
+            ['-', previous_tests['foo.removed']],
+        ])
+
+    @mock.patch('changes.lib.test_changes.MAX_CHANGES', 2)
+    def test_update_limit(self):
+        project = self.create_project()
+        previous_build = self.create_finished_build(project, ['foo.removed'])
+        build = self.create_finished_build(project, ['foo.a', 'foo.b', 'foo.c'])
+
+        test_changes = update_test_changes(build, previous_build)
+
+        assert test_changes.num_added == 3
+        assert test_changes.num_removed == 1
+        assert len(test_changes.changes['tests']) == 2
+
+    def test_update_without_jobs(self):
+        project = self.create_project()
+        previous_build = self.create_build(project)
+        build = self.create_finished_build(project, ['foo.added'])
+
+        assert update_test_changes(build, previous_build) is None
+        assert BuildTestChanges.query.get(build.id) is None
+
+    def test_get(self):
+        project = self.create_project()
+        previous_build = self.create_finished_build(project, ['foo.removed'])
+        other_build = self.create_finished_build(project, ['foo.added'])
+        build = self.create_finished_build(project, ['foo.added'])
+
+        # computed on first access
+        test_changes = get_test_changes(build, previous_build)
+        assert test_changes.num_removed == 1
+
+        # and looked up after that
+        with mock.patch('changes.lib.test_changes.compute_test_changes') as compute:
+            assert get_test_changes(build, previous_build) == test_changes
+        assert not compute.called
+
+        # unless we're comparing against a different build
+        test_changes = get_test_changes(build, other_build)
+        assert test_changes.previous_build_id == other_build.id
+        assert test_changes.total == 0
+
+    def test_build_finished(self):
+        project = self.create_project()
+        self.create_finished_build(
+            project, ['foo.removed'], date_created=datetime(2013, 9, 19, 22, 15, 22))
+        previous_build = self.create_finished_build(
+            project, ['foo.same'], date_created=datetime(2013, 9, 19, 22, 15, 23))
+        build = self.create_finished_build(
+            project, ['foo.same', 'foo.added'], date_created=datetime(2013, 9, 19, 22, 15, 24))
+
+        assert find_previous_build(build) == previous_build
+
+        build_finished_handler(build_id=build.id.hex)
+
+        test_changes = BuildTestChanges.query.get(build.id)
+        assert test_changes.previous_build_id == previous_build.id
+        assert test_changes.num_added == 1
+        assert test_changes.num_removed == 0
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from changes.lib.test_durations import update_test_duration_index
+from changes.testutils import TestCase
+
+
+class UpdateTestDurationIndexTestCase(TestCase):
+    def test_simple(self):
+        project = self.create_project()
+        now = datetime.utcnow()
+
+        build = self.create_finished_build(project, {
+            'foo.bar.test_baz': 50,
+            'foo.bar.test_bar': 25,
+        }, date_created=now - timedelta(hours=2))
+        index = update_test_duration_index(build)
+
+        test_stats, avg_test_time = index.get_test_stats()
+        assert avg_test_time == 37
+        assert test_stats[('foo', 'bar')] == 75
+        assert test_stats[('foo', 'bar', 'test_baz')] == 50
+        assert test_stats[('foo', 'bar', 'test_bar')] == 25
+        assert index.num_builds == 1
+        assert index.last_build_id == build.id
+
+        # test_bar went away, and test_baz got slower
+        build = self.create_finished_build(project, {
+            'foo.bar.test_baz': 150,
+        }, date_created=now - timedelta(hours=1))
+        index = update_test_duration_index(build)
+
+        test_stats, avg_test_time = index.get_test_stats()
+        assert test_stats[('foo', 'bar')] == 98
+        assert test_stats[('foo', 'bar', 'test_baz')] == 80
+        assert ('foo', 'bar', 'test_bar') not in test_stats
+        assert avg_test_time == 71
+        assert index.num_builds == 2
+
+        # the same build finishing again isn't counted twice
+        index = update_test_duration_index(build)
+
+        assert index.get_test_stats()[0][('foo', 'bar', 'test_baz')] == 80
+        assert index.num_builds == 2
+
+        # builds older than the last one indexed are ignored
+        old_build = self.create_finished_build(project, {
+            'foo.bar.test_baz': 1000,
+        }, date_created=now - timedelta(hours=3))
+        index = update_test_duration_index(old_build)
+
+        assert index.get_test_stats()[0][('foo', 'bar', 'test_baz')] == 80
+        assert index.last_build_id == build.id
+
+    def test_no_tests(self):
+        project = self.create_project()
+        build = self.create_finished_build(project, {})
+
+        assert update_test_duration_index(build) is None
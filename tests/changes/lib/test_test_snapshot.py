@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from changes.lib.test_snapshot import build_test_groups, update_project_test_snapshot
+from changes.models import ProjectTestSnapshotCase
+from changes.testutils import TestCase
+
+
+def test_build_test_groups():
+    groups = build_test_groups({
+        'foo.bar': 50,
+        'foo.baz': 70,
+        'blah.blah': 10,
+    }, '.')
+    assert groups == {
+        '': [['foo', 2, 120], ['blah.blah', 1, 10]],
+        'foo': [['foo.baz', 1, 70], ['foo.bar', 1, 50]],
+    }
+
+
+class UpdateProjectTestSnapshotTestCase(TestCase):
+    def get_cases(self, project):
+        return sorted(
+            (c.name, c.package, c.duration)
+            for c in ProjectTestSnapshotCase.query.filter(
+                ProjectTestSnapshotCase.project_id == project.id,
+            )
+        )
+
+    def test_simple(self):
+        project = self.create_project()
+        now = datetime.utcnow()
+
+        build = self.create_finished_build(project, {
+            'foo.bar.test_baz': 50,
+            'foo.bar.test_bar': 25,
+        }, date_created=now - timedelta(hours=2))
+        snapshot = update_project_test_snapshot(build)
+
+        assert snapshot.build_id == build.id
+        assert snapshot.num_tests == 2
+        assert snapshot.sep == '.'
+        assert snapshot.groups[''] == [['foo.bar', 2, 75]]
+        assert self.get_cases(project) == [
+            ('foo.bar.test_bar', 'foo.bar', 25),
+            ('foo.bar.test_baz', 'foo.bar', 50),
+        ]
+
+        # test_bar went away
+        build = self.create_finished_build(project, {
+            'foo.bar.test_baz': 60,
+        }, date_created=now - timedelta(hours=1))
+        snapshot = update_project_test_snapshot(build)
+
+        assert snapshot.build_id == build.id
+        assert snapshot.num_tests == 1
+        assert self.get_cases(project) == [
+            ('foo.bar.test_baz', 'foo.bar', 60),
+        ]
+
+        # an older build is ignored
+        old_build = self.create_finished_build(project, {
+            'foo.bar.test_old': 10,
+        }, date_created=now - timedelta(hours=3))
+        snapshot = update_project_test_snapshot(old_build)
+
+        assert snapshot.build_id == build.id
+        assert self.get_cases(project) == [
+            ('foo.bar.test_baz', 'foo.bar', 60),
+        ]
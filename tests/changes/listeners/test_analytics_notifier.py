@@ -189,7 +189,7 @@ class AnalyticsNotifierTest(TestCase):
         build = self.create_build(project, result=Result.failed, source=source, message=None)
         self.assertEquals(_get_phabricator_revision_url(build), None)
 
-    @mock.patch('changes.listeners.analytics_notifier.categorize.categorize')
+    @mock.patch('changes.listeners.analytics_notifier.categorize.categorize_stream')
     @mock.patch('changes.listeners.analytics_notifier._get_rules')
     def test_tagged_log(self, get_rules_fn, categorize_fn):
         project = self.create_project(name='test', slug='project-slug')
@@ -218,10 +218,12 @@ class AnalyticsNotifierTest(TestCase):
             incr.assert_any_call("failing-log-category-tag1")
             incr.assert_any_call("failing-log-category-tag2")
 
-        categorize_fn.assert_called_with('project-slug', fake_rules, ''.join(chunks))
+        categorize_fn.assert_called_with('project-slug', fake_rules, mock.ANY)
+        logdata = categorize_fn.call_args[0][2]
+        self.assertEqual(list(logdata), list(reversed(chunks)))
         self.assertSetEqual(tags_by_step[step.id], {'tag1', 'tag2'})
 
-    @mock.patch('changes.listeners.analytics_notifier.categorize.categorize')
+    @mock.patch('changes.listeners.analytics_notifier.categorize.categorize_stream')
     @mock.patch('changes.listeners.analytics_notifier._get_rules')
     def test_no_tags(self, get_rules_fn, categorize_fn):
         project = self.create_project(name='test', slug='project-slug')
@@ -247,7 +249,9 @@ class AnalyticsNotifierTest(TestCase):
                 warn.assert_any_call(mock.ANY, extra=mock.ANY)
                 incr.assert_any_call("failing-log-uncategorized")
 
-        categorize_fn.assert_called_with('project-slug', fake_rules, 'Some log text')
+        categorize_fn.assert_called_with('project-slug', fake_rules, mock.ANY)
+        logdata = categorize_fn.call_args[0][2]
+        self.assertEqual(''.join(logdata), 'Some log text')
         self.assertSetEqual(tags_by_step[step.id], set())
 
     def test_get_job_failure_reasons_by_jobstep_passed(self):
@@ -1,10 +1,13 @@
 from base64 import b64encode
+from cStringIO import StringIO
 
 import mock
 
+from changes.artifacts.xunit import XunitHandler
 from changes.constants import Result
 from changes.models import FailureReason, ItemStat
 from changes.models.testresult import TestResult, TestResultManager, logger
+from changes.testutils import SAMPLE_XUNIT_DOUBLE_CASES
 from changes.testutils.cases import TestCase
 
 
@@ -356,3 +359,118 @@ class TestResultManagerTestCase(TestCase):
         failures = FailureReason.query.filter_by(step_id=jobstep2.id).all()
         assert len(failures) == 1
         assert failures[0].reason == 'duplicate_test_name'
+
+    def test_save_batches(self):
+        from changes.models.test import TestCase
+
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase, label='STEP1')
+
+        batches = [
+            [
+                TestResult(
+                    step=jobstep,
+                    name='test_foo',
+                    package='project.tests',
+                    result=Result.passed,
+                    duration=12,
+                    artifacts=[{
+                        'name': 'artifact_name',
+                        'type': 'text',
+                        'base64': b64encode('sample content')}]
+                ),
+                TestResult(
+                    step=jobstep,
+                    name='test_bar',
+                    package='project.tests',
+                    result=Result.failed,
+                    duration=13,
+                    reruns=1,
+                ),
+            ],
+            [],
+            [
+                TestResult(
+                    step=jobstep,
+                    name='test_foo',
+                    package='project.tests',
+                    result=Result.passed,
+                    duration=11,
+                ),
+                TestResult(
+                    step=jobstep,
+                    name='test_baz',
+                    package='project.tests',
+                    result=Result.passed,
+                    duration=18,
+                ),
+            ],
+        ]
+        manager = TestResultManager(jobstep)
+        manager.save_batches(iter(batches))
+
+        testcase_list = sorted(TestCase.query.all(), key=lambda x: x.name)
+
+        assert len(testcase_list) == 3
+
+        for test in testcase_list:
+            assert test.job_id == job.id
+            assert test.step_id == jobstep.id
+            assert test.project_id == project.id
+
+        assert testcase_list[0].name == 'project.tests.test_bar'
+        assert testcase_list[0].result == Result.failed
+        assert testcase_list[0].duration == 13
+        assert testcase_list[0].reruns == 1
+
+        assert testcase_list[1].name == 'project.tests.test_baz'
+        assert testcase_list[1].result == Result.passed
+        assert testcase_list[1].duration == 18
+
+        # A duplicate which isn't next to the other case of its test is
+        # flagged rather than merged, like one from another artifact.
+        assert testcase_list[2].name == 'project.tests.test_foo'
+        assert testcase_list[2].result == Result.failed
+        assert testcase_list[2].message.startswith('Error: Duplicate Test')
+        assert testcase_list[2].duration == 12
+
+        testartifacts = testcase_list[2].artifacts
+        assert len(testartifacts) == 1
+        assert testartifacts[0].file.get_file().read() == 'sample content'
+
+        assert _stat(jobstep, 'test_count') == 3
+        assert _stat(jobstep, 'test_failures') == 2
+        assert _stat(jobstep, 'test_duration') == 43
+        assert _stat(jobstep, 'test_rerun_count') == 1
+
+        failures = FailureReason.query.filter_by(step_id=jobstep.id).all()
+        assert len(failures) == 1
+        assert failures[0].reason == 'duplicate_test_name'
+
+    def test_save_batches_case_pair_across_batches(self):
+        from changes.models.test import TestCase
+
+        project = self.create_project()
+        build = self.create_build(project)
+        job = self.create_job(build)
+        jobphase = self.create_jobphase(job)
+        jobstep = self.create_jobstep(jobphase, label='STEP1')
+
+        # test_falsehood's failure and tear-down error straddle the boundary
+        handler = XunitHandler(jobstep)
+        manager = TestResultManager(jobstep)
+        manager.save_batches(handler.iter_test_batches(
+            StringIO(SAMPLE_XUNIT_DOUBLE_CASES), 1))
+
+        testcase_list = sorted(TestCase.query.all(), key=lambda x: x.name)
+
+        assert len(testcase_list) == 2
+        assert testcase_list[0].name == 'test_simple.SampleTest.test_falsehood'
+        assert testcase_list[0].result == Result.failed
+        assert testcase_list[0].duration == 750
+        assert testcase_list[1].name == 'test_simple.SampleTest.test_truth'
+
+        assert FailureReason.query.filter_by(step_id=jobstep.id).count() == 0
@@ -21,6 +21,11 @@ def unfinished_task(foo='bar'):
     raise unfinished_task.NotFinished
 
 
+@tracked_task
+def unqueued_task(foo='bar'):
+    raise unqueued_task.NotFinished(requeue=False)
+
+
 @tracked_task
 def error_task(foo='bar'):
     raise Exception
@@ -301,6 +306,33 @@ class RunTest(TestCase):
             countdown=5,
         )
 
+    @mock.patch('changes.config.queue.delay')
+    @mock.patch('changes.config.queue.retry')
+    def test_unfinished_without_requeue(self, queue_retry, queue_delay):
+        task_id = UUID('33846695b2774b29a71795a009e8168a')
+        parent_task_id = UUID('659974858dcf4aa08e73a940e1066328')
+
+        self.create_task(
+            task_name='unqueued_task',
+            task_id=task_id,
+            parent_id=parent_task_id,
+        )
+
+        unqueued_task(
+            foo='bar',
+            task_id=task_id.hex,
+            parent_task_id=parent_task_id.hex,
+        )
+
+        task = Task.query.filter(
+            Task.task_id == task_id,
+            Task.task_name == 'unqueued_task'
+        ).first()
+
+        assert task
+        assert task.status == Status.in_progress
+        assert not queue_delay.called
+
     @mock.patch('changes.config.queue.delay')
     @mock.patch('changes.config.queue.retry')
     def test_error(self, queue_retry, queue_delay):
@@ -0,0 +1,26 @@
+from changes.testutils import TestCase
+from changes.utils.cache import LRUCache
+
+
+class LRUCacheTest(TestCase):
+    def test_simple(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+
+        # 'b' is now the least recently used
+        cache.set('c', 3)
+        assert len(cache) == 2
+        assert 'b' not in cache
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+
+        cache.set('a', 4)
+        cache.set('d', 5)
+        assert cache.get('c') is None
+        assert cache.get('a') == 4
+
+        cache.clear()
+        assert len(cache) == 0
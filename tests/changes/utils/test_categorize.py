@@ -1,7 +1,16 @@
+import os
+import shutil
+import tempfile
 import textwrap
 import unittest
 
-from changes.experimental.categorize import parse_rules, _parse_rule, categorize, ParseError
+import mock
+
+from changes.experimental import categorize as categorize_module
+from changes.experimental.categorize import (
+    parse_rules, _parse_rule, categorize, categorize_stream, compile_rules, ParseError,
+    RuleCache
+)
 
 
 class TestCategorize(unittest.TestCase):
@@ -96,6 +105,55 @@ class TestCategorize(unittest.TestCase):
                                      'file.ext, line 1: unexpected end of regular expression'):
             parse_rules('foo::[x', path='file.ext')
 
+    def test_categorize_stream(self):
+        rules = compile_rules([('tag', '', '^error$'),
+                               ('tag2', '', 'line1.*line2'),
+                               ('tag3', 'proj2', 'error')])
+        chunks = ['ok\nerr', 'or\r\nline1\n', 'ok\nline2\n']
+        self.assertEqual(categorize_stream('proj', rules, reversed(chunks)),
+                         ({'tag', 'tag2'}, {'tag', 'tag2'}))
+        self.assertEqual(categorize_stream('proj', rules, []), (set(), {'tag', 'tag2'}))
+
+    def test_categorize_stream_segments(self):
+        rules = [('tag', '', '^error$'), ('tag2', '', 'line1\nline2')]
+        chunks = ['x' * 7 + '\n' for _ in range(20)]
+        chunks[3] = 'error\n'
+        chunks[10:12] = ['line1\n', 'line2\n']
+        with mock.patch.object(categorize_module, 'SEGMENT_SIZE', 16), \
+                mock.patch.object(categorize_module, 'SEGMENT_OVERLAP', 8):
+            self.assertEqual(categorize_stream('proj', rules, reversed(chunks)),
+                             ({'tag', 'tag2'}, {'tag', 'tag2'}))
+            # only the end of the log is looked at
+            self.assertEqual(categorize_stream('proj', rules, reversed(chunks), max_size=100),
+                             ({'tag2'}, {'tag', 'tag2'}))
+
+    def test_categorize_stream_stops_early(self):
+        rules = [('tag', '', 'error')]
+        chunks = iter(['ok\n', 'error\n'] + ['ok\n'] * 10)
+        with mock.patch.object(categorize_module, 'SEGMENT_SIZE', 4):
+            categorize_stream('proj', rules, chunks)
+        # we stopped reading once the rule matched
+        self.assertEqual(len(list(chunks)), 8)
+
+    def test_rule_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'rules')
+            with open(path, 'w') as fp:
+                fp.write('tag::error\n')
+            cache = RuleCache()
+            rules = cache.get(path)
+            self.assertEqual([(t, p, r.pattern) for t, p, r in rules], [('tag', '', 'error')])
+            self.assertIs(cache.get(path), rules)
+
+            with open(path, 'w') as fp:
+                fp.write('tag2::fail\n')
+            os.utime(path, (0, 0))
+            rules = cache.get(path)
+            self.assertEqual([(t, p, r.pattern) for t, p, r in rules], [('tag2', '', 'fail')])
+        finally:
+            shutil.rmtree(tmpdir)
+
 
 def dedent(string):
     return textwrap.dedent(string)
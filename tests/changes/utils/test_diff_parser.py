@@ -113,6 +113,25 @@ class DiffParserTest(TestCase):
         assert lines_by_file['ci/server-collect'] == {24, 31, 39, 46}
         assert lines_by_file['ci/run_with_retries.py'] == {2, 45} | set(range(53, 63)) | set(range(185, 192))
 
+    def test_iter_files_compact(self):
+        parser = DiffParser(SIMPLE_DIFF)
+        files = list(parser.iter_files(compact=True))
+        assert files == [
+            {
+                'old_filename': 'a/changes/utils/diff_parser.py',
+                'new_filename': 'b/changes/utils/diff_parser.py',
+                'chunk_markers': ['@@ -71,6 +71,7 @@ class DiffParser(object):'],
+                'added_ranges': [(74, 75)],
+            },
+        ]
+
+        parser = DiffParser(COMPLEX_DIFF)
+        files = dict(
+            (f['new_filename'], f['added_ranges'])
+            for f in parser.iter_files(compact=True)
+        )
+        assert files['b/ci/run_with_retries.py'] == [(2, 3), (45, 46), (53, 63), (185, 192)]
+
     def test_reconstruct_file_diff_simple_diff(self):
         parser = DiffParser(SIMPLE_DIFF)
         files = parser.parse()
@@ -2,8 +2,9 @@ from datetime import datetime
 
 import pytest
 
-from changes.models import Revision
-from changes.vcs.base import InvalidDiffError, RevisionResult, Vcs
+from changes.models import Author, Revision, Source
+from changes.vcs.base import InvalidDiffError, RevisionResult, Vcs, save_revisions
+from changes.config import db
 from changes.testutils.cases import TestCase
 
 
@@ -37,6 +38,57 @@ class RevisionResultTestCase(TestCase):
         assert revision.date_committed == datetime(2013, 9, 19, 22, 15, 23)
 
 
+class SaveRevisionsTestCase(TestCase):
+    def _result(self, sha, **kwargs):
+        kwargs.setdefault('author', 'Foo Bar <foo@example.com>')
+        kwargs.setdefault('author_date', datetime(2013, 9, 19, 22, 15, 22))
+        kwargs.setdefault('message', 'Hello world!')
+        kwargs.setdefault('branches', ['master'])
+        return RevisionResult(id=sha, **kwargs)
+
+    def test_simple(self):
+        repo = self.create_repo()
+        self.create_author(email='foo@example.com', name='Foo Bar')
+        self._result('a' * 40, branches=[]).save(repo)
+
+        created = save_revisions(repo, [
+            self._result('a' * 40),
+            self._result('b' * 40, parents=['a' * 40]),
+            self._result('c' * 40, committer='Biz Baz <baz@example.com>',
+                         committer_date=datetime(2013, 9, 19, 22, 15, 23),
+                         parents=['b' * 40]),
+        ])
+        db.session.commit()
+
+        assert created == set(['b' * 40, 'c' * 40])
+
+        assert Author.query.filter(Author.email == 'foo@example.com').count() == 1
+        assert Author.query.filter(Author.email == 'baz@example.com').one().name == 'Biz Baz'
+
+        revisions = dict((r.sha, r) for r in Revision.query.filter(
+            Revision.repository_id == repo.id,
+        ))
+        assert sorted(revisions) == ['a' * 40, 'b' * 40, 'c' * 40]
+        # existing revisions are updated
+        assert revisions['a' * 40].branches == ['master']
+
+        revision = revisions['c' * 40]
+        assert revision.message == 'Hello world!'
+        assert revision.author.email == 'foo@example.com'
+        assert revision.committer.email == 'baz@example.com'
+        assert revision.parents == ['b' * 40]
+        assert revision.date_created == datetime(2013, 9, 19, 22, 15, 22)
+        assert revision.date_committed == datetime(2013, 9, 19, 22, 15, 23)
+
+        assert Source.query.filter(
+            Source.repository_id == repo.id,
+            Source.patch_id == None,  # NOQA
+        ).count() == 3
+
+        assert save_revisions(repo, [self._result('c' * 40)]) == set()
+        assert save_revisions(repo, []) == set()
+
+
 class SelectivelyApplyDiffTest(TestCase):
     PATCH_TEMPLATE = """diff --git a/{path} b/{path}
 index e69de29..d0c77a5 100644
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+import mock
 import pytest
 
 from subprocess import check_call
@@ -7,6 +8,7 @@ from subprocess import check_call
 from changes.testutils import TestCase
 from changes.vcs.base import CommandError
 from changes.vcs.git import GitVcs
+from changes.vcs.readers import reader_pool
 
 from tests.changes.vcs.asserts import VcsAsserts
 
@@ -35,6 +37,7 @@ class GitVcsTest(TestCase, VcsAsserts):
     def setUp(self):
         self.reset()
         self.addCleanup(check_call, ['rm', '-rf', self.root],)
+        self.addCleanup(reader_pool.close_all)
 
     def reset(self):
         check_call(['rm', '-rf', self.root])
@@ -341,3 +344,122 @@ index e69de29..d0c77a5 100644
         vcs.update()
 
         assert vcs.read_file('HEAD', 'FOO', diff=PATCH) == 'blah\n'
+
+    def test_read_file_without_command(self):
+        vcs = self.get_vcs()
+        vcs.clone()
+        vcs.update()
+        sha = vcs.log(parent='HEAD', limit=1).next().id
+
+        with mock.patch.object(vcs, 'run', side_effect=AssertionError):
+            assert vcs.read_file('HEAD', 'FOO') == ''
+            assert vcs.read_file(sha, 'BAR') == ''
+
+    def test_read_file_caches_full_sha(self):
+        vcs = self.get_vcs()
+        vcs.clone()
+        vcs.update()
+        sha = vcs.log(parent='HEAD', limit=1).next().id
+
+        with mock.patch.object(vcs, '_read_file', return_value='foo') as read_file:
+            assert vcs.read_file(sha, 'doesnotexist') == 'foo'
+            assert vcs.read_file(sha, 'doesnotexist') == 'foo'
+            assert read_file.call_count == 1
+
+            # branch names can move, so are always read again
+            vcs.read_file('HEAD', 'doesnotexist')
+            vcs.read_file('HEAD', 'doesnotexist')
+            assert read_file.call_count == 3
+
+    def test_log_single_commit_without_command(self):
+        vcs = self.get_vcs()
+        vcs.clone()
+        vcs.update()
+        revisions = list(vcs.log())
+
+        with mock.patch.object(vcs, 'run', side_effect=AssertionError):
+            for expected in revisions:
+                revision = vcs.log(parent=expected.id, limit=1).next()
+                assert revision.id == expected.id
+                assert revision.message == expected.message
+                assert revision.author == expected.author
+                assert revision.committer == expected.committer
+                assert revision.author_date == expected.author_date
+                assert revision.committer_date == expected.committer_date
+                assert revision.parents == expected.parents
+
+        # unknown revisions still get git's error
+        with pytest.raises(CommandError):
+            vcs.log(parent='a' * 40, limit=1).next()
+
+    def test_reader_survives_reclone(self):
+        vcs = self.get_vcs()
+        vcs.clone()
+        vcs.update()
+        assert vcs.read_file('HEAD', 'FOO') == ''
+
+        self.reset()
+        check_call(['rm', '-rf', self.path])
+        self._add_file('BAZ', self.remote_path, commit_msg='bazzy')
+        vcs.clone()
+
+        assert vcs.read_file('HEAD', 'BAZ') == ''
+        assert vcs.log(parent='HEAD', limit=1).next().message == 'bazzy\n'
+
+    def test_log_after(self):
+        vcs = self.get_vcs()
+        self._add_file('BAZ', self.remote_path, commit_msg='bazzy')
+        vcs.clone()
+        vcs.update()
+
+        revisions = list(vcs.log(branch='master'))
+        assert len(revisions) == 3
+
+        page = list(vcs.log(branch='master', limit=1))
+        assert [r.id for r in page] == [revisions[0].id]
+        page = list(vcs.log(branch='master', limit=1, after=page[-1].id))
+        assert [r.id for r in page] == [revisions[1].id]
+        page = list(vcs.log(branch='master', limit=2, after=page[-1].id))
+        assert [r.id for r in page] == [revisions[2].id]
+        assert list(vcs.log(branch='master', after=page[-1].id)) == []
+
+        with pytest.raises(ValueError):
+            vcs.log(after=revisions[0].id).next()
+
+        with pytest.raises(ValueError):
+            vcs.log(branch='master', after='--output=/tmp/foo').next()
+
+    def test_get_branches_for_revisions(self):
+        vcs = self.get_vcs()
+        for n in xrange(4):
+            self._add_file('FILE{}'.format(n), self.remote_path, commit_msg='commit {}'.format(n))
+        check_call('git branch B2 HEAD~3'.split(), cwd=self.remote_path)
+        check_call('git branch B3 HEAD~1'.split(), cwd=self.remote_path)
+        for n in xrange(4, 8):
+            self._add_file('FILE{}'.format(n), self.remote_path, commit_msg='commit {}'.format(n))
+        vcs.clone()
+        vcs.update()
+
+        revisions = list(vcs.log(branch='master'))
+        assert len(revisions) == 10
+
+        with mock.patch.object(vcs, 'branches_for_commit', wraps=vcs.branches_for_commit) as lookup:
+            branches = vcs.get_branches_for_revisions(revisions)
+        assert lookup.call_count < len(revisions)
+
+        for revision in revisions:
+            assert sorted(branches[revision.id]) == sorted(vcs.branches_for_commit(revision.id))
+        assert sorted(branches[revisions[0].id]) == ['master']
+        assert sorted(branches[revisions[-1].id]) == ['B2', 'B3', 'master']
+
+    def test_log_stops_early(self):
+        vcs = self.get_vcs()
+        vcs.clone()
+        vcs.update()
+
+        log = vcs.log()
+        assert log.next().subject == 'biz'
+        log.close()
+
+        with pytest.raises(CommandError):
+            vcs.log(parent='doesnotexist', limit=2).next()